@@ -0,0 +1 @@
+"""Micro benchmarks of the hot paths of the bot, run with `python -m benchmarks.<name>`."""
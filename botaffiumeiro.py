@@ -2,20 +2,28 @@
 
 from __future__ import annotations
 
+import asyncio
 import logging
-import re
-import secrets
 import threading
 from typing import TYPE_CHECKING
-from urllib.parse import parse_qs, urlparse
+from urllib.parse import urlsplit
 
 from config import ConfigurationManager
 from handlers.aliexpress_api_handler import AliexpressAPIHandler
-from handlers.aliexpress_handler import ALIEXPRESS_PATTERN, AliexpressHandler
+from handlers.aliexpress_handler import AliexpressHandler
 from handlers.pattern_handler import PatternHandler
-from handlers.patterns import PATTERNS
-from publicsuffix2 import get_sld
-import requests  # type: ignore[import-untyped]
+from handlers.patterns import PATTERNS, detect_platform
+from handlers.registry import HandlerRegistry
+from links.domains import registrable_domain
+from links.expander import URLExpander
+from links.parser import (
+    URL_PATTERN,
+    ParsedMessage,
+    has_link_entities,
+    parse_message,
+    parse_message_entities,
+)
+from telegram import MessageEntity, Update
 from telegram.ext import (
     Application,
     CallbackContext,
@@ -26,12 +34,25 @@ from telegram.ext import (
 )
 
 if TYPE_CHECKING:
-    from telegram import Message, Update, User
-
-DOMAIN_PATTERNS = {
-    "aliexpress": ALIEXPRESS_PATTERN,
+    from config import ConfigSnapshot, UserConfig
+    from handlers.base_handler import BaseHandler
+    from links.advertisers import AdvertiserIndex
+    from telegram import Message, User
+
+# Handler of each platform, in the order the handlers run
+PLATFORM_HANDLERS: dict[str, type[BaseHandler]] = {
+    "amazon": PatternHandler,
+    "awin": PatternHandler,
+    "admitad": PatternHandler,
+    "tradedoubler": PatternHandler,
+    "aliexpress": AliexpressAPIHandler,
 }
 
+# Group messages with URLs or hyperlinks; stickers, media and chatter never reach Python
+LINK_MESSAGES = filters.ChatType.GROUPS & (
+    filters.Entity(MessageEntity.URL) | filters.Entity(MessageEntity.TEXT_LINK)
+)
+
 logger = logging.getLogger(__name__)
 logging.getLogger("httpx").setLevel(
     logger.getEffectiveLevel() + 10
@@ -40,133 +61,236 @@ logging.getLogger("httpx").setLevel(
 )
 
 config_manager = ConfigurationManager()
+url_expander = URLExpander(config_manager)
+handler_registry = HandlerRegistry(config_manager)
 
 
-def is_user_excluded(user: User) -> bool:
+def is_user_excluded(user: User, config: ConfigSnapshot) -> bool:
     """Check if the user is in the list of excluded users."""
     user_id = user.id
     username = user.username
     logger.debug("Checking if user %s (ID: %s) is excluded.", username, user_id)
-    excluded_users = config_manager.excluded_users
+    excluded_users = config.excluded_users
     excluded = user_id in excluded_users or (username and username in excluded_users)
     logger.debug("User %s (ID: %s) is excluded: %s", username, user_id, excluded)
     return excluded
 
 
-def expand_shortened_url(url: str) -> str:
-    """Expand shortened URLs by following redirects using a HEAD request."""
-    logger.info("Try expanding shortened URL: %s", url)
-    # Strip trailing punctuation if present
-    stripped_url = url.rstrip(".,")
-    try:
-        response = requests.get(
-            stripped_url, allow_redirects=True, timeout=config_manager.TIMEOUT
+def message_has_links(message: Message) -> bool:
+    """Check if a message has links, using its entities when Telegram sent them.
+
+    Args:
+    ----
+        message: The Telegram message.
+
+    Returns:
+    -------
+        True if the message has url or text_link entities, or URLs in its text when it has no entities.
+
+    """
+    if message.entities:
+        return has_link_entities(message.entities)
+    return URL_PATTERN.search(message.text) is not None
+
+
+async def expand_shortened_url(url: str) -> str:
+    """Expand shortened URLs by following redirects on the shared HTTP client."""
+    return await url_expander.expand(url)
+
+
+async def expand_message_urls(urls: list[str]) -> dict[str, str]:
+    """Expand all the URLs of a message concurrently within the message deadline.
+
+    Args:
+    ----
+        urls: The URLs found in the message.
+
+    Returns:
+    -------
+        A mapping of each URL to its expanded form, or to itself if it was not expanded in time.
+
+    """
+    tasks = {
+        url: asyncio.create_task(expand_shortened_url(url))
+        for url in dict.fromkeys(urls)
+    }
+    if not tasks:
+        return {}
+
+    _, pending = await asyncio.wait(
+        tasks.values(), timeout=config_manager.expansion_message_deadline
+    )
+    for task in pending:
+        task.cancel()
+    if pending:
+        logger.warning(
+            "%d URLs not expanded within %s seconds. Using them unexpanded.",
+            len(pending),
+            config_manager.expansion_message_deadline,
         )
-    except requests.RequestException:
-        logger.exception("Error expanding shortened URL: %s", url)
-        return url
-    else:
-        expanded_url = response.url
-        logger.info("Expanded URL %s to full link: %s", stripped_url, expanded_url)
-        return expanded_url
+
+    return {
+        url: url if task in pending else task.result() for url, task in tasks.items()
+    }
 
 
-def extract_embedded_url(query_params: dict[str, list[str]]) -> set[str]:
-    """Extract any valid URLs embedded in query parameters.
+async def expand_parsed_message(parsed_message: ParsedMessage) -> ParsedMessage:
+    """Expand the URLs of a parsed message, replacing them in the message.
 
     Args:
     ----
-        query_params: A dictionary of query parameters from a URL.
+        parsed_message: The parsed message.
 
     Returns:
     -------
-        A set of embedded domains found in the query parameters.
+        The parsed message with the expanded URLs.
 
     """
-    embedded_domains = set()
-    for values in query_params.values():
-        for value in values:
-            parsed_url = urlparse(value)
-            if parsed_url.scheme in ["http", "https"]:  # Check if it's a valid URL
-                domain = get_sld(parsed_url.netloc)
-                embedded_domains.add(domain)
-    return embedded_domains
+    expanded_urls = await expand_message_urls(
+        [parsed_url.url for parsed_url in parsed_message.urls]
+    )
+    return parsed_message.replace_urls(expanded_urls)
 
 
-def extract_domains_from_message(message_text: str) -> tuple[set, str]:
-    """Extract domains from a message using domain patterns and searches for embedded URLs.
+def detect_domains(
+    parsed_message: ParsedMessage, advertiser_index: AdvertiserIndex | None = None
+) -> set[str]:
+    """Return the domains of the http URLs of a message, to select a user for each.
 
-    Additionally, expands short URLs and replaces them in the message text.
+    Store links embedded in a query parameter of a URL that is not unwrapped
+    add their store domain too, as the handlers convert them.
 
     Args:
     ----
-    message_text: The text of the message to search for domains.
+        parsed_message: The parsed message.
+        advertiser_index: The index of the advertiser stores, by default the published one.
 
     Returns:
     -------
-    A tuple containing:
-        - A set of domains found in the message.
-        - The modified message text with expanded URLs.
+        The set of domains found in the message.
 
     """
+    if advertiser_index is None:
+        advertiser_index = config_manager.snapshot.advertiser_index
+
     domains = set()
+    for parsed_url in parsed_message.urls:
+        if parsed_url.domain and parsed_url.parts.scheme in ("http", "https"):
+            domains.add(parsed_url.domain)
+        for values in parsed_url.query.values():
+            for value in values:
+                if any(
+                    advertiser_index.find_url(value, platform) for platform in PATTERNS
+                ):
+                    domains.add(registrable_domain(urlsplit(value).hostname))
+    return domains
+
+
+def detect_platforms(
+    parsed_message: ParsedMessage, advertiser_index: AdvertiserIndex
+) -> set[str]:
+    """Return the platforms with links in a message, to run only their handlers.
+
+    Args:
+    ----
+        parsed_message: The parsed message.
+        advertiser_index: The index of the advertiser stores.
+
+    Returns:
+    -------
+        The set of platforms found in the message.
+
+    """
+    platforms = set()
+    for parsed_url in parsed_message.urls:
+        if detect_platform(parsed_url.target) == "aliexpress":
+            platforms.add("aliexpress")
+        for platform in PATTERNS:
+            if advertiser_index.find(parsed_url.parts.hostname, platform) or any(
+                advertiser_index.find_url(value, platform)
+                for values in parsed_url.query.values()
+                for value in values
+            ):
+                platforms.add(platform)
+
+    return platforms
+
+
+async def expand_and_detect_domains(
+    parsed_message: ParsedMessage,
+    advertiser_index: AdvertiserIndex | None = None,
+) -> tuple[set[str], ParsedMessage]:
+    """Expand the URLs of a parsed message and detect the domains handled by any platform.
 
-    urls_in_message = re.findall(r"https?://[^\s]+", message_text)
+    Args:
+    ----
+        parsed_message: The parsed message.
+        advertiser_index: The index of the advertiser stores, by default the published one.
 
-    for url in urls_in_message:
-        expanded_url = expand_shortened_url(url)
-        message_text = message_text.replace(url, expanded_url)
-        parsed_url = urlparse(expanded_url)
-        domain = get_sld(parsed_url.netloc)
-        query_params = parse_qs(parsed_url.query)
-        embedded_domains = extract_embedded_url(query_params)
+    Returns:
+    -------
+        A tuple containing the set of domains and the parsed message with expanded URLs.
 
-        if embedded_domains:
-            domains.update(embedded_domains)
-        else:
-            for pattern in DOMAIN_PATTERNS.values():
-                if re.match(pattern, expanded_url):
-                    domains.add(domain)
-            for config in PATTERNS.values():
-                if re.match(config["pattern"], expanded_url):
-                    domains.add(domain)
-                    break
+    """
+    parsed_message = await expand_parsed_message(parsed_message)
+    return detect_domains(parsed_message, advertiser_index), parsed_message
 
-    return domains, message_text
 
+async def extract_domains_from_message(message_text: str) -> tuple[set, str]:
+    """Extract domains from a message using domain patterns.
 
-def select_user_for_domain(domain: str) -> dict | None:
-    """Select a user for the given domain based on percentages in domain_percentage_table."""
-    domain_data = config_manager.domain_percentage_table.get(domain, [])
+    Additionally, expands short URLs and unwraps wrapper URLs, replacing them in the message text.
 
-    if not domain_data:
-        return None
+    Args:
+    ----
+    message_text: The text of the message to search for domains.
 
-    choices = [(entry["user"], entry["percentage"]) for entry in domain_data]
+    Returns:
+    -------
+    A tuple containing:
+        - A set of domains found in the message.
+        - The modified message text with expanded URLs.
 
-    rand_choice = secrets.SystemRandom().uniform(0, 100)
-    current = 0
+    """
+    domains, parsed_message = await expand_and_detect_domains(
+        parse_message(message_text)
+    )
+    return domains, parsed_message.text
 
-    for user, percentage in choices:
-        current += percentage
-        if rand_choice <= current:
-            return config_manager.all_users_configurations.get(user, {})
 
-    return config_manager.all_users_configurations.get(choices[0][0], None)
+def select_user_for_domain(domain: str, config: ConfigSnapshot) -> UserConfig | None:
+    """Select a user for the given domain based on percentages in domain_percentage_table."""
+    domain_users = config.domain_users.get(domain)
+
+    if domain_users is None:
+        return None
+
+    user = domain_users.select(config.user_random)
+    return config.all_users_configurations.get(user)
 
 
-def choose_users(domains: set[str]) -> dict:
+def choose_users(domains: set[str], config: ConfigSnapshot) -> dict:
     """Handle the domains and selects users randomly based on domain configurations."""
     selected_users = {}
     for domain in domains:
-        selected_user_data = select_user_for_domain(domain)
+        selected_user_data = select_user_for_domain(domain, config)
         if selected_user_data:
             selected_users[domain] = selected_user_data
     return selected_users
 
 
-def prepare_message(message: Message, default_domains: set[str] | None = None) -> dict:
-    """Prepare the message by extracting domains, selecting users, and returning a processing context."""
+async def prepare_message(
+    message: Message,
+    default_domains: set[str] | None = None,
+    config: ConfigSnapshot | None = None,
+) -> dict:
+    """Prepare the message by extracting domains, selecting users, and returning a processing context.
+
+    The whole processing uses the configuration snapshot of the update, or the
+    snapshot published when the message arrives, even if a reload ends meanwhile.
+    """
+    if config is None:
+        config = config_manager.snapshot
     if not message or not message.text:
         return {
             "message": message,
@@ -174,30 +298,56 @@ def prepare_message(message: Message, default_domains: set[str] | None = None) -
             "selected_users": {},
         }
 
-    message_text = message.text
+    if message.entities:
+        parsed_message = parse_message_entities(message.text, message.entities)
+    else:
+        parsed_message = parse_message(message.text)
     if default_domains:
         domains = default_domains
-        modified_message = message_text
     else:
-        domains, modified_message = extract_domains_from_message(message_text)
+        domains, parsed_message = await expand_and_detect_domains(
+            parsed_message, config.advertiser_index
+        )
 
-    selected_users = choose_users(domains)
+    selected_users = choose_users(domains, config)
     return {
         "message": message,
-        "modified_message": modified_message,
+        "modified_message": parsed_message.text,
+        "parsed_message": parsed_message,
+        "config": config,
+        "advertiser_index": config.advertiser_index,
+        "affiliate_templates": config.affiliate_templates,
+        "platforms": detect_platforms(parsed_message, config.advertiser_index),
         "selected_users": selected_users,
     }
 
 
-async def process_link_handlers(message: Message) -> None:
-    """Process all link handlers for Amazon, Awin, Admitad, and AliExpress."""
+async def process_link_handlers(
+    message: Message, config: ConfigSnapshot | None = None
+) -> None:
+    """Process the link handlers of the platforms found in the message."""
     logger.info("Processing link handlers for message ID: %s...", message.message_id)
-    context = prepare_message(message)
-    processed = await PatternHandler(config_manager).handle_links(context)
-    processed |= await AliexpressAPIHandler(config_manager).handle_links(context)
+    context = await prepare_message(message, config=config)
+    platforms = context["platforms"]
+    if not platforms:
+        logger.info("%s: No affiliate platform links found.", message.message_id)
+        return
 
-    if not processed:
-        await AliexpressHandler(config_manager).handle_links(context)
+    handler_types = dict.fromkeys(
+        handler_type
+        for platform, handler_type in PLATFORM_HANDLERS.items()
+        if platform in platforms
+    )
+    handlers = [handler_registry.get(handler_type) for handler_type in handler_types]
+    processed = False
+    for handler in handlers:
+        processed |= await handler.handle_links(context)
+
+    if processed:
+        # Send the edits of all the handlers in a single message
+        await handlers[0].apply_edits(context)
+    elif "aliexpress" in platforms:
+        await handler_registry.get(AliexpressHandler).handle_links(context)
 
     logger.info(
         "Finished processing link handlers for message ID: %s.", message.message_id
@@ -207,6 +357,8 @@ async def process_link_handlers(message: Message) -> None:
 async def modify_link(update: Update, _: CallbackContext) -> None:
     """Modify Amazon, AliExpress, Awin, and Admitad links in messages."""
     logger.info("Received new update (ID: %s).", update.update_id)
+    # The update is processed with the configuration published when it arrived
+    config = config_manager.snapshot
 
     if not update.message or not update.message.text:
         logger.info(
@@ -214,11 +366,26 @@ async def modify_link(update: Update, _: CallbackContext) -> None:
         )
         return
 
+    if not message_has_links(update.message):
+        logger.info(
+            "%s: Update with a message without links. Skipping.", update.update_id
+        )
+        return
+
+    if config.prefilter_links and not config.link_prefilter.matches_message(
+        update.message.text, update.message.entities
+    ):
+        logger.info(
+            "%s: Update with a message without handled domains. Skipping.",
+            update.update_id,
+        )
+        return
+
     if not update.effective_user:
         logger.info("%s: Update without user. Skipping.", update.update_id)
         return
 
-    if is_user_excluded(update.effective_user):
+    if is_user_excluded(update.effective_user, config):
         logger.info(
             "%s: Update with a message from excluded user %s (ID: %s). Skipping.",
             update.update_id,
@@ -234,7 +401,7 @@ async def modify_link(update: Update, _: CallbackContext) -> None:
         update.message.message_id,
     )
 
-    await process_link_handlers(message)
+    await process_link_handlers(message, config)
     logger.info("%s: Update processed.", update.update_id)
 
 
@@ -244,16 +411,32 @@ def reload_config_periodically(interval: int) -> None:
     threading.Timer(interval, reload_config_periodically, [interval]).start()
 
 
+def compact_expansion_store_periodically(interval: int) -> None:
+    """Remove expired expansions from the persistent store every `interval` seconds."""
+    store = url_expander.store
+    if store is None:
+        return
+    store.compact()
+    timer = threading.Timer(interval, compact_expansion_store_periodically, [interval])
+    timer.daemon = True
+    timer.start()
+
+
 async def handle_discount_command(update: Update, context: dict) -> None:
     """Manage discount codes calling 'show_discount_codes' of AliexpressHandler."""
     logger.info("Processing discount command: %s", update.message.text)
 
-    context = prepare_message(update.message, {"aliexpress.com"})
-    await AliexpressHandler(config_manager).show_discount_codes(context)
+    context = await prepare_message(update.message, {"aliexpress.com"})
+    await handler_registry.get(AliexpressHandler).show_discount_codes(context)
 
     logger.info("Discount code shown for command: %s", update.message.text)
 
 
+async def close_http_clients(_: Application) -> None:
+    """Close the pooled HTTP clients when the application shuts down."""
+    await url_expander.aclose()
+
+
 def register_discount_handlers(application: Application) -> None:
     """Registry dinamically bot discount commands."""
     for keyword in config_manager.discount_keywords:
@@ -277,18 +460,26 @@ def main() -> None:
     )
     reload_thread.start()
 
+    # Schedule a job to remove expired expansions every hour
+    compact_thread = threading.Thread(
+        target=compact_expansion_store_periodically, args=(60 * 60,), daemon=True
+    )
+    compact_thread.start()
+
     defaults = Defaults(parse_mode="HTML")
     application = (
-        Application.builder().token(config_manager.bot_token).defaults(defaults).build()
+        Application.builder()
+        .token(config_manager.bot_token)
+        .defaults(defaults)
+        .post_shutdown(close_http_clients)
+        .build()
     )
 
     register_discount_handlers(application)
-    application.add_handler(
-        MessageHandler(filters.ALL & filters.ChatType.GROUPS, modify_link)
-    )
+    application.add_handler(MessageHandler(LINK_MESSAGES, modify_link))
 
     logger.info("Starting the bot")
-    application.run_polling()
+    application.run_polling(allowed_updates=[Update.MESSAGE])
 
 
 if __name__ == "__main__":
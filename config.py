@@ -2,19 +2,253 @@
 
 from __future__ import annotations
 
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
 from datetime import datetime, timedelta, timezone
+from http import HTTPStatus
 import logging
 from pathlib import Path
-from typing import Any
-
+import random
+import time
+from types import MappingProxyType
+from typing import TYPE_CHECKING, Any
+from urllib.parse import urlsplit
+
+from handlers.patterns import AFFILIATE_TEMPLATES, PATTERNS, PLATFORM_DOMAINS
+from links.advertisers import AdvertiserIndex
+from links.limits import HostLimiter
+from links.prefilter import LinkPrefilter
+from links.shorteners import DEFAULT_SHORTENER_HOSTS
 import requests  # type: ignore[import-untyped]
 import yaml  # type: ignore[import-untyped]
 
+if TYPE_CHECKING:
+    from collections.abc import Iterator, Mapping
+
+    from links.templates import PrefilledTemplate
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+# Affiliate platforms with a configuration in every user, in loading order
+AFFILIATE_PLATFORMS = ("amazon", "awin", "admitad", "tradedoubler")
+
+
+@dataclass(frozen=True, slots=True)
+class PlatformConfig:
+    """Affiliate IDs of a user in an affiliate platform."""
+
+    publisher_id: str | None = None
+    advertisers: Mapping[str, str | None] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        """Keep a read-only copy of the advertisers, so the configuration is immutable."""
+        object.__setattr__(
+            self, "advertisers", MappingProxyType(dict(self.advertisers))
+        )
+
+
+@dataclass(frozen=True, slots=True)
+class AliexpressCredentials:
+    """AliExpress discount codes and API credentials of a user."""
+
+    discount_codes: str | None = None
+    app_key: str | None = None
+    app_secret: str | None = None
+    tracking_id: str | None = None
+
+
+NO_PLATFORM = PlatformConfig()
+
+
+@dataclass(frozen=True, slots=True)
+class UserConfig:
+    """Affiliate configuration of a user, built once when the configuration is loaded."""
+
+    user: str | None = None
+    percentage: int = 0
+    amazon: PlatformConfig = NO_PLATFORM
+    awin: PlatformConfig = NO_PLATFORM
+    admitad: PlatformConfig = NO_PLATFORM
+    tradedoubler: PlatformConfig = NO_PLATFORM
+    aliexpress: AliexpressCredentials = field(default_factory=AliexpressCredentials)
+
+    def platform(self, name: str) -> PlatformConfig:
+        """Return the configuration of the user in an affiliate platform.
+
+        Args:
+        ----
+            name (str): The platform name (e.g., "awin").
+
+        Returns:
+        -------
+            PlatformConfig: The configuration, empty for an unknown platform.
+
+        """
+        return getattr(self, name) if name in AFFILIATE_PLATFORMS else NO_PLATFORM
+
+    def platforms(self) -> Iterator[tuple[str, PlatformConfig]]:
+        """Iterate over the affiliate platforms of the user.
+
+        Returns
+        -------
+            Iterator[tuple[str, PlatformConfig]]: The name and configuration of each platform.
+
+        """
+        return ((name, getattr(self, name)) for name in AFFILIATE_PLATFORMS)
+
+
+def build_platform_config(data: Mapping[str, Any] | None) -> PlatformConfig:
+    """Build the configuration of a platform from its publisher and advertisers.
+
+    Args:
+    ----
+        data (Mapping[str, Any] | None): The platform section, with publisher_id and advertisers.
+
+    Returns:
+    -------
+        PlatformConfig: The platform configuration.
+
+    """
+    data = data or {}
+    return PlatformConfig(
+        publisher_id=data.get("publisher_id"),
+        advertisers=data.get("advertisers") or {},
+    )
+
+
+def build_aliexpress_credentials(
+    data: Mapping[str, Any] | None,
+) -> AliexpressCredentials:
+    """Build the AliExpress discount codes and API credentials of a user.
+
+    Args:
+    ----
+        data (Mapping[str, Any] | None): The aliexpress section of the user configuration.
+
+    Returns:
+    -------
+        AliexpressCredentials: The AliExpress configuration.
+
+    """
+    data = data or {}
+    return AliexpressCredentials(
+        discount_codes=data.get("discount_codes"),
+        app_key=data.get("app_key"),
+        app_secret=data.get("app_secret"),
+        tracking_id=data.get("tracking_id"),
+    )
+
+
+def build_user_config(data: Mapping[str, Any]) -> UserConfig:
+    """Build a user configuration from its nested dictionary form.
+
+    Args:
+    ----
+        data (Mapping[str, Any]): User ID, percentage and the section of every platform.
+
+    Returns:
+    -------
+        UserConfig: The user configuration.
+
+    """
+    return UserConfig(
+        user=data.get("user"),
+        percentage=data.get("percentage", 0),
+        amazon=build_platform_config(data.get("amazon")),
+        awin=build_platform_config(data.get("awin")),
+        admitad=build_platform_config(data.get("admitad")),
+        tradedoubler=build_platform_config(data.get("tradedoubler")),
+        aliexpress=build_aliexpress_credentials(data.get("aliexpress")),
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class DomainUsers:
+    """Users of a domain with their cumulative percentages, to select one at random."""
+
+    users: tuple[str, ...]
+    cumulative_percentages: tuple[float, ...]
+
+    def select(self, rng: random.Random) -> str:
+        """Select a user, each with the probability of its percentage.
+
+        Args:
+        ----
+            rng (random.Random): The random number generator.
+
+        Returns:
+        -------
+            str: The selected user ID, or the first user if the percentages add up to less than 100.
+
+        """
+        index = bisect_left(self.cumulative_percentages, rng.uniform(0, 100))
+        return self.users[index] if index < len(self.users) else self.users[0]
+
+
+def build_domain_users(
+    domain_percentage_table: dict[str, list[dict[str, Any]]],
+) -> dict[str, DomainUsers]:
+    """Build the cumulative percentages of the users of every domain.
+
+    Args:
+    ----
+        domain_percentage_table (dict[str, list[dict[str, Any]]]): Users and percentages of each domain.
+
+    Returns:
+    -------
+        dict[str, DomainUsers]: The users of each domain that has any.
+
+    """
+    domain_users = {}
+    for domain, entries in domain_percentage_table.items():
+        if not entries:
+            continue
+        cumulative_percentages = []
+        current = 0
+        for entry in entries:
+            current += entry["percentage"]
+            cumulative_percentages.append(current)
+        domain_users[domain] = DomainUsers(
+            tuple(entry["user"] for entry in entries), tuple(cumulative_percentages)
+        )
+    return domain_users
+
+
+@dataclass(frozen=True, slots=True)
+class CachedConfiguration:
+    """A creator configuration downloaded before, with the validators to revalidate it."""
+
+    etag: str | None
+    last_modified: str | None
+    configuration: dict
+
+
+@dataclass(frozen=True, slots=True)
+class ConfigSnapshot:
+    """The configuration of one load, read by the updates while it is published.
+
+    A reload builds its tables apart and publishes a new snapshot with one
+    reference swap, so an update keeps using the snapshot it started with.
+    """
+
+    delete_messages: bool
+    excluded_users: tuple[str | int, ...]
+    prefilter_links: bool
+    msg_affiliate_link_modified: str
+    msg_reply_provided_by_user: str
+    all_users_configurations: Mapping[str, UserConfig]
+    domain_users: Mapping[str, DomainUsers]
+    user_random: random.Random
+    advertiser_index: AdvertiserIndex
+    affiliate_templates: Mapping[tuple[str, str, str], PrefilledTemplate]
+    link_prefilter: LinkPrefilter
+    loaded_at: datetime | None
+
+
 class ConfigurationManager:
     """Class to manage bot configuration and affiliate link processing."""
 
@@ -29,6 +263,7 @@ class ConfigurationManager:
         self.delete_messages: bool = True
         self.excluded_users: list[str] = []
         self.discount_keywords: list[str] = []
+        self.prefilter_links: bool = True
 
         # Messages
         self.msg_affiliate_link_modified: str = ""
@@ -36,18 +271,46 @@ class ConfigurationManager:
 
         # Affiliate settings
         self.creator_percentage: int = 10
+        self.random_seed: int | None = None
+
+        # URL expansion
+        self.expansion_message_deadline: float = 5.0
+        self.expansion_cache_size: int = 4096
+        self.expansion_cache_ttl: float = 24 * 60 * 60
+        self.expansion_negative_cache_ttl: float = 5 * 60
+        self.expansion_store_path: str = ""
+        self.expansion_store_ttl: float = 7 * 24 * 60 * 60
+        self.expansion_max_hops: int = 10
+        self.expansion_max_bytes: int = 64 * 1024
+        self.expansion_shorteners: list[str] = []
+        self.expansion_learned_hosts_ttl: float = 24 * 60 * 60
+        self.expansion_hedging: bool = False
+        self.expansion_hedge_percentile: float = 0.9
+        self.expansion_hedge_budget: float = 0.05
+
+        # Network
+        self.host_limiter = HostLimiter(max_timeout=self.TIMEOUT)
+        self.creators_deadline: float = 30
+        self.creator_load_times: dict[str, float] = {}
+        self._cached_configurations: dict[str, CachedConfiguration] = {}
 
         # Logging
         self.log_level: str = "INFO"
 
         # Internal data
         self.domain_percentage_table: dict[str, list[dict[str, Any]]] = {}
-        self.all_users_configurations: dict[str, dict] = {}
+        self.domain_users: dict[str, DomainUsers] = {}
+        self.user_random = random.Random()  # noqa: S311 # Selects affiliates, not secrets
+        self.advertiser_index = AdvertiserIndex()
+        self.affiliate_templates: dict[tuple[str, str, str], PrefilledTemplate] = {}
+        self.all_users_configurations: dict[str, UserConfig] = {}
+        self.link_prefilter = self._build_link_prefilter()
         self.last_load_time: datetime | None = None
+        self.snapshot = self._take_snapshot()
 
     def _load_user_configuration(
         self, user: str, creator_percentage: int, user_data: dict
-    ) -> dict:
+    ) -> UserConfig:
         """Load user-specific configuration for affiliate programs and settings.
 
         Args:
@@ -58,42 +321,22 @@ class ConfigurationManager:
 
         Returns:
         -------
-            dict: Processed user configuration.
+            UserConfig: Processed user configuration.
 
         """
-        return {
-            "user": user,
-            "percentage": creator_percentage,
-            "amazon": {
-                "advertisers": user_data.get("amazon", {}),
-            },
-            "awin": {
-                "publisher_id": user_data.get("awin", {}).get("publisher_id", None),
-                "advertisers": user_data.get("awin", {}).get("advertisers", {}),
-            },
-            "admitad": {
-                "publisher_id": user_data.get("admitad", {}).get("publisher_id", None),
-                "advertisers": user_data.get("admitad", {}).get("advertisers", {}),
-            },
-            "tradedoubler": {
-                "publisher_id": user_data.get("tradedoubler", {}).get(
-                    "publisher_id", None
-                ),
-                "advertisers": user_data.get("tradedoubler", {}).get("advertisers", {}),
-            },
-            "aliexpress": {
-                "discount_codes": user_data.get("aliexpress", {}).get(
-                    "discount_codes", None
-                ),
-                "app_key": user_data.get("aliexpress", {}).get("app_key", None),
-                "app_secret": user_data.get("aliexpress", {}).get("app_secret", None),
-                "tracking_id": user_data.get("aliexpress", {}).get("tracking_id", None),
-            },
-        }
+        return build_user_config(
+            {
+                **user_data,
+                "user": user,
+                "percentage": creator_percentage,
+                # Amazon has no publisher ID, its section holds the advertisers
+                "amazon": {"advertisers": user_data.get("amazon")},
+            }
+        )
 
     def _load_user_configuration_from_url(
         self, user_id: str, percentage: int, url: str
-    ) -> dict | None:
+    ) -> UserConfig | None:
         """Load user-specific configuration from a URL.
 
         Args:
@@ -104,20 +347,169 @@ class ConfigurationManager:
 
         Returns:
         -------
-            dict | None: User configuration data or None if an error occurs.
+            UserConfig | None: User configuration or None if an error occurs.
 
         """
+        host = urlsplit(url).hostname or ""
+        timeout = self.host_limiter.timeout_for(host)
+        cached = self._cached_configurations.get(url)
+        headers = {}
+        if cached and cached.etag:
+            headers["If-None-Match"] = cached.etag
+        if cached and cached.last_modified:
+            headers["If-Modified-Since"] = cached.last_modified
         try:
-            response = requests.get(url, timeout=self.TIMEOUT)
+            response = requests.get(url, headers=headers, timeout=timeout)
+            self.host_limiter.record(host, response.elapsed.total_seconds())
             response.raise_for_status()
-            user_data = yaml.safe_load(response.text)
-            return self._load_user_configuration(
-                user_id, percentage, user_data.get("configuration", {})
-            )
+            if cached and response.status_code == HTTPStatus.NOT_MODIFIED:
+                logger.debug("Configuration of %s not modified", user_id)
+                configuration = cached.configuration
+            else:
+                user_data = yaml.safe_load(response.text)
+                configuration = user_data.get("configuration", {})
+                self._cache_configuration(url, response, configuration)
+            return self._load_user_configuration(user_id, percentage, configuration)
+        except requests.Timeout:
+            self.host_limiter.record(host, timeout)
+            logger.exception("Error loading configuration for %s from %s", user_id, url)
+            return None
         except requests.RequestException:
             logger.exception("Error loading configuration for %s from %s", user_id, url)
             return None
 
+    def _cache_configuration(
+        self, url: str, response: requests.Response, configuration: dict
+    ) -> None:
+        """Keep a downloaded configuration, if it has validators to revalidate it later.
+
+        Args:
+        ----
+            url (str): URL of the configuration.
+            response (requests.Response): The response the configuration came in.
+            configuration (dict): The parsed configuration section.
+
+        """
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if etag or last_modified:
+            self._cached_configurations[url] = CachedConfiguration(
+                etag, last_modified, configuration
+            )
+        else:
+            self._cached_configurations.pop(url, None)
+
+    def _take_snapshot(self) -> ConfigSnapshot:
+        """Take a snapshot of the loaded configuration, to publish it.
+
+        Returns
+        -------
+            ConfigSnapshot: The configuration read by the updates.
+
+        """
+        return ConfigSnapshot(
+            delete_messages=self.delete_messages,
+            excluded_users=tuple(self.excluded_users),
+            prefilter_links=self.prefilter_links,
+            msg_affiliate_link_modified=self.msg_affiliate_link_modified,
+            msg_reply_provided_by_user=self.msg_reply_provided_by_user,
+            all_users_configurations=MappingProxyType(self.all_users_configurations),
+            domain_users=MappingProxyType(self.domain_users),
+            user_random=self.user_random,
+            advertiser_index=self.advertiser_index,
+            affiliate_templates=MappingProxyType(self.affiliate_templates),
+            link_prefilter=self.link_prefilter,
+            loaded_at=self.last_load_time,
+        )
+
+    def _load_creator_configuration(
+        self, creator: dict
+    ) -> tuple[UserConfig | None, float]:
+        """Load the configuration of a creator from its URL, timing the load.
+
+        Args:
+        ----
+            creator (dict): Creator with its ID, percentage and configuration URL.
+
+        Returns:
+        -------
+            tuple[UserConfig | None, float]: The creator configuration, or None if it failed, and the seconds taken.
+
+        """
+        start = time.perf_counter()
+        user_config = self._load_user_configuration_from_url(
+            creator.get("id"), creator.get("percentage", 0), creator["url"]
+        )
+        return user_config, time.perf_counter() - start
+
+    def _load_creators_configurations(self, creators: list[dict]) -> None:
+        """Load the configuration of every creator from its URL, in parallel.
+
+        The downloads share a pool of max_requests_per_host threads, so no host
+        gets more parallel requests than allowed. The creators not loaded before
+        the deadline are left out until the next load.
+
+        Args:
+        ----
+            creators (list[dict]): Creators with their ID, percentage and configuration URL.
+
+        """
+        # Assuming you have a field 'url' for each creator
+        creators = [creator for creator in creators if creator.get("url")]
+        self.creator_load_times = {}
+        urls = {creator["url"] for creator in creators}
+        self._cached_configurations = {
+            url: cached
+            for url, cached in self._cached_configurations.items()
+            if url in urls
+        }
+        if not creators:
+            return
+
+        pool = ThreadPoolExecutor(
+            max_workers=self.host_limiter.max_per_host,
+            thread_name_prefix="creators",
+        )
+        futures = [
+            pool.submit(self._load_creator_configuration, creator)
+            for creator in creators
+        ]
+        wait(futures, timeout=self.creators_deadline)
+        pool.shutdown(wait=False, cancel_futures=True)
+
+        # In the order of the creators file, as the percentage tables depend on it
+        for creator, future in zip(creators, futures):
+            creator_id = creator.get("id")
+            if not future.done():
+                logger.warning(
+                    "Configuration of %s not loaded within %s seconds. Skipping.",
+                    creator_id,
+                    self.creators_deadline,
+                )
+                continue
+            user_config, elapsed = future.result()
+            self.creator_load_times[creator_id] = elapsed
+            logger.info("Configuration of %s fetched in %.3f s", creator_id, elapsed)
+            if user_config:
+                self.all_users_configurations[creator_id] = user_config
+
+    def _build_link_prefilter(self) -> LinkPrefilter:
+        """Build the prefilter of the domains whose links the bot can handle.
+
+        Returns
+        -------
+            LinkPrefilter: The prefilter of the store, platform and shortener domains.
+
+        """
+        return LinkPrefilter(
+            [
+                *self.advertiser_index,
+                *PLATFORM_DOMAINS,
+                *DEFAULT_SHORTENER_HOSTS,
+                *self.expansion_shorteners,
+            ]
+        )
+
     def _add_to_domain_table(
         self, domain: str, user_id: str, affiliate_id: str | None, percentage: int
     ) -> None:
@@ -146,7 +538,7 @@ class ConfigurationManager:
     def _add_affiliate_stores_domains(
         self,
         user_id: str,
-        advertisers: dict[str, str],
+        advertisers: Mapping[str, str | None],
         platform_key: str,
         percentage: int,
     ) -> None:
@@ -155,7 +547,7 @@ class ConfigurationManager:
         Args:
         ----
             user_id (str): User ID.
-            advertisers (dict[str, str]): Advertiser data.
+            advertisers (Mapping[str, str | None]): Advertiser data.
             platform_key (str): Platform key (e.g., "awin").
             percentage (int): User's percentage share.
 
@@ -167,22 +559,52 @@ class ConfigurationManager:
         for domain, affiliate_id in advertisers.items():
             if affiliate_id:
                 self._add_to_domain_table(domain, user_id, affiliate_id, percentage)
+                self.advertiser_index.add(domain, platform_key, user_id, affiliate_id)
+
+    def _prefill_affiliate_templates(
+        self, users: dict[str, UserConfig]
+    ) -> dict[tuple[str, str, str], PrefilledTemplate]:
+        """Prefill the affiliate template of every platform with the IDs of each user and store.
+
+        Args:
+        ----
+            users (dict[str, UserConfig]): User configurations by user ID.
+
+        Returns:
+        -------
+            dict[tuple[str, str, str], PrefilledTemplate]: Templates by platform, user ID and store domain.
+
+        """
+        affiliate_templates = {}
+        for user_id, user_config in users.items():
+            for platform, template in AFFILIATE_TEMPLATES.items():
+                platform_config = user_config.platform(platform)
+                for domain, advertiser_id in platform_config.advertisers.items():
+                    if advertiser_id:
+                        affiliate_templates[(platform, user_id, domain.lower())] = (
+                            template.prefill(
+                                PATTERNS[platform]["affiliate_tag"],
+                                platform_config.publisher_id,
+                                advertiser_id,
+                            )
+                        )
+        return affiliate_templates
 
     def _add_user_to_domain_percentage_table(
-        self, user_id: str, user_data: dict, percentage: int
+        self, user_id: str, user_config: UserConfig, percentage: int
     ) -> None:
         """Add a user to the domain percentage table based on their affiliate configurations.
 
         Args:
         ----
             user_id (str): User ID (e.g., "HectorziN").
-            user_data (dict): User-specific configuration data.
+            user_config (UserConfig): User-specific configuration.
             percentage (int): Percentage of user influence.
 
         """
         logger.debug("Adding %s with percentage %s", user_id, percentage)
 
-        if user_data.get("aliexpress", {}).get("discount_codes", None):
+        if user_config.aliexpress.discount_codes:
             self._add_to_domain_table(
                 "aliexpress.com",
                 user_id,
@@ -192,33 +614,16 @@ class ConfigurationManager:
         self._add_to_domain_table(
             "aliexpress.com",
             user_id,
-            user_data.get("aliexpress", {}).get("app_key", None),
-            percentage,
-        )
-        self._add_affiliate_stores_domains(
-            user_id,
-            user_data.get("amazon", {}).get("advertisers", {}),
-            "amazon",
-            percentage,
-        )
-        self._add_affiliate_stores_domains(
-            user_id,
-            user_data.get("awin", {}).get("advertisers", {}),
-            "awin",
-            percentage,
-        )
-        self._add_affiliate_stores_domains(
-            user_id,
-            user_data.get("admitad", {}).get("advertisers", {}),
-            "admitad",
-            percentage,
-        )
-        self._add_affiliate_stores_domains(
-            user_id,
-            user_data.get("tradedoubler", {}).get("advertisers", {}),
-            "tradedoubler",
+            user_config.aliexpress.app_key,
             percentage,
         )
+        for platform, platform_config in user_config.platforms():
+            self._add_affiliate_stores_domains(
+                user_id,
+                platform_config.advertisers,
+                platform,
+                percentage,
+            )
 
     def _adjust_domain_affiliate_percentages(
         self, domain: str, creator_percentage: int
@@ -300,8 +705,10 @@ class ConfigurationManager:
         if not self._should_reload_configuration():
             return
         logger.info("Loading configuration")
-        self.domain_percentage_table.clear()
-        self.all_users_configurations.clear()
+        # New tables, so the published snapshot keeps the previous ones until the swap
+        self.domain_percentage_table = {}
+        self.all_users_configurations = {}
+        self.advertiser_index = AdvertiserIndex()
         with self.CONFIG_PATH.open(encoding="utf-8") as file:
             config_file_data = yaml.safe_load(file)
 
@@ -314,6 +721,7 @@ class ConfigurationManager:
         self.delete_messages = telegram_config.get("delete_messages", True)
         self.excluded_users = telegram_config.get("excluded_users", [])
         self.discount_keywords = telegram_config.get("discount_keywords", [])
+        self.prefilter_links = telegram_config.get("prefilter_links", True)
 
         # Messages
         messages_config = config_file_data.get("messages", {})
@@ -330,6 +738,37 @@ class ConfigurationManager:
         self.creator_percentage = affiliate_settings.get(
             "creator_affiliate_percentage", 10
         )
+        self.random_seed = affiliate_settings.get("random_seed", None)
+        self.user_random = random.Random(self.random_seed)  # noqa: S311
+
+        # URL expansion
+        expansion_config = config_file_data.get("expansion", {})
+        self.expansion_message_deadline = expansion_config.get("message_deadline", 5.0)
+        self.expansion_cache_size = expansion_config.get("cache_size", 4096)
+        self.expansion_cache_ttl = expansion_config.get("cache_ttl", 24 * 60 * 60)
+        self.expansion_negative_cache_ttl = expansion_config.get(
+            "negative_cache_ttl", 5 * 60
+        )
+        self.expansion_store_path = expansion_config.get("store_path", "")
+        self.expansion_store_ttl = expansion_config.get("store_ttl", 7 * 24 * 60 * 60)
+        self.expansion_max_hops = expansion_config.get("max_hops", 10)
+        self.expansion_max_bytes = expansion_config.get("max_bytes", 64 * 1024)
+        self.expansion_shorteners = expansion_config.get("shorteners", [])
+        self.expansion_learned_hosts_ttl = expansion_config.get(
+            "learned_hosts_ttl", 24 * 60 * 60
+        )
+        self.expansion_hedging = expansion_config.get("hedging", False)
+        self.expansion_hedge_percentile = expansion_config.get("hedge_percentile", 0.9)
+        self.expansion_hedge_budget = expansion_config.get("hedge_budget", 0.05)
+
+        # Network
+        network_config = config_file_data.get("network", {})
+        self.host_limiter.configure(
+            max_per_host=network_config.get("max_requests_per_host", 4),
+            min_timeout=network_config.get("min_timeout", 1),
+            max_timeout=network_config.get("max_timeout", self.TIMEOUT),
+        )
+        self.creators_deadline = network_config.get("creators_deadline", 30)
 
         # Logging
         self.log_level = config_file_data.get("log_level", "INFO")
@@ -338,27 +777,21 @@ class ConfigurationManager:
         self.all_users_configurations["main"] = self._load_user_configuration(
             "main", 100 - self.creator_percentage, config_file_data
         )
-        for creator in creators_file_data.get("users", []):
-            creator_id = creator.get("id")
-            creator_percentage = creator.get("percentage", 0)
-            creator_url = creator.get(
-                "url"
-            )  # Assuming you have a field 'url' for each creator
-            if creator_url:
-                user_data = self._load_user_configuration_from_url(
-                    creator_id, creator_percentage, creator_url
-                )
-                if user_data:
-                    self.all_users_configurations[creator_id] = user_data
+        self._load_creators_configurations(creators_file_data.get("users", []))
 
         # Add users to the domain percentage table
-        for user_id, user_data in self.all_users_configurations.items():
-            user_percentage = user_data.get("percentage", 0)
+        for user_id, user_config in self.all_users_configurations.items():
             self._add_user_to_domain_percentage_table(
-                user_id, user_data, user_percentage
+                user_id, user_config, user_config.percentage
             )
+        self.affiliate_templates = self._prefill_affiliate_templates(
+            self.all_users_configurations
+        )
 
         # Adjust percentages for each domain
         for domain in self.domain_percentage_table:
             self._adjust_domain_affiliate_percentages(domain, self.creator_percentage)
+        self.domain_users = build_domain_users(self.domain_percentage_table)
+        self.link_prefilter = self._build_link_prefilter()
         self.last_load_time = datetime.now(timezone.utc)
+        self.snapshot = self._take_snapshot()
@@ -64,6 +64,9 @@ config = {
             [code.get("line", "") for code in data.get("aliexpress_discount_codes", [])]
         ),
     },
+    "expansion": {
+        "store_path": "/data/expansion_cache.sqlite3",
+    },
     "log_level": data.get("log_level", "INFO"),
     "affiliate_settings": {
         "creator_affiliate_percentage": int(
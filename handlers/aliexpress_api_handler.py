@@ -4,20 +4,19 @@ from __future__ import annotations
 
 import hashlib
 import hmac
-import re
 import time
 from typing import TYPE_CHECKING
-from urllib.parse import parse_qs, unquote, urlparse, urlunparse
+from urllib.parse import urlparse, urlunparse
 
 from config import ConfigurationManager
 import httpx
 from requests.exceptions import RequestException  # type: ignore[import-untyped]
 
-from handlers.aliexpress_handler import ALIEXPRESS_PATTERN
 from handlers.base_handler import BaseHandler
+from handlers.patterns import detect_platform
 
 if TYPE_CHECKING:
-    from config import ConfigurationManager
+    from config import ConfigurationManager, UserConfig
 
 # API endpoint for generating affiliate links
 ALIEXPRESS_API_URL = "https://api-sg.aliexpress.com/sync"
@@ -65,12 +64,15 @@ class AliexpressAPIHandler(BaseHandler):
         self.logger.debug("Generated signature: %s", signature)
         return signature
 
-    async def _convert_to_aliexpress_affiliate(self, source_url: str) -> str | None:
+    async def _convert_to_aliexpress_affiliate(
+        self, source_url: str, user_config: UserConfig
+    ) -> str | None:
         """Convert AliExpress link into affiliate link using the AliExpress API.
 
         Args:
         ----
             source_url (str): The original AliExpress link.
+            user_config (UserConfig): Configuration of the user selected for AliExpress.
 
         Returns:
         -------
@@ -84,13 +86,10 @@ class AliexpressAPIHandler(BaseHandler):
         )
         timestamp = str(int(time.time() * 1000))  # Current timestamp in milliseconds
 
-        # Get AliExpress-specific configuration from self.selected_users
-        aliexpress_config = self.selected_users.get("aliexpress.com", {}).get(
-            "aliexpress", {}
-        )
-        app_key = aliexpress_config.get("app_key")
-        app_secret = aliexpress_config.get("app_secret")
-        tracking_id = aliexpress_config.get("tracking_id")
+        # Get AliExpress-specific configuration of the selected user
+        app_key = user_config.aliexpress.app_key
+        app_secret = user_config.aliexpress.app_secret
+        tracking_id = user_config.aliexpress.tracking_id
 
         # Ensure required AliExpress configurations are present
         if not all([app_key, app_secret, tracking_id]):
@@ -113,8 +112,7 @@ class AliexpressAPIHandler(BaseHandler):
 
         # Make the request to the Aliexpress API
         try:
-            user = self.selected_users.get("aliexpress.com", {}).get("user", {})
-            self.logger.info("User choosen: %s", user)
+            self.logger.info("User choosen: %s", user_config.user)
             async with httpx.AsyncClient() as client:
                 response = await client.get(ALIEXPRESS_API_URL, params=params)
 
@@ -147,50 +145,6 @@ class AliexpressAPIHandler(BaseHandler):
 
         return None
 
-    def _get_real_url(self, link: str) -> str:
-        """Check for a 'redirectUrl' parameter in the given link and extracts its value if present.
-
-        If no 'redirectUrl' is found, returns the original link.
-
-        Args:
-        ----
-          link: The original URL to analyze.
-
-        Returns:
-        -------
-          A string representing the resolved URL or the original link if no redirect exists.
-
-        """
-        parsed_url = urlparse(link)
-        query_params = parse_qs(parsed_url.query)
-
-        # Check if the 'redirectUrl' parameter exists in the query
-        if "redirectUrl" in query_params:
-            redirect_url = query_params["redirectUrl"][0]  # Extract the first value
-            return unquote(redirect_url)  # Decode the URL
-        return link  # Return the original link if no redirectUrl exists
-
-    def _resolve_redirects(self, message_text: str) -> dict[str, str]:
-        """Resolve redirected URLs from a message.
-
-        Args:
-        ----
-            message_text (str): The message containing URLs.
-
-        Returns:
-        -------
-            dict[str, str]: A mapping of original URLs to resolved URLs.
-
-        """
-        urls_in_message = re.findall(r"https?://[^\s]+", message_text)
-
-        original_to_resolved = {}
-        for url in urls_in_message:
-            resolved_url = self._get_real_url(url)  # Resolve redirectUrl if present
-            original_to_resolved[url] = resolved_url
-
-        return original_to_resolved
-
     async def handle_links(self, context: dict) -> bool:
         """Handle AliExpress links and convert them to affiliate links using the API.
 
@@ -203,17 +157,13 @@ class AliexpressAPIHandler(BaseHandler):
             bool: True if any links were modified, False otherwise.
 
         """
-        message, modified_text, self.selected_users = self._unpack_context(context)
+        message, _, selected_users = self._unpack_context(context)
 
-        # Retrieve the AliExpress configuration from self.selected_users
-        aliexpress_config = self.selected_users.get("aliexpress.com", {}).get(
-            "aliexpress", {}
-        )
-        app_key = aliexpress_config.get("app_key")
-        discount_codes = aliexpress_config.get("discount_codes", "")
+        # Retrieve the AliExpress configuration of the selected user
+        user_config = selected_users.get("aliexpress.com")
 
         # Check if the AliExpress API key is set
-        if not app_key:
+        if user_config is None or not user_config.aliexpress.app_key:
             self.logger.info("AliExpress API key is not set. Skipping processing.")
             return False
 
@@ -222,14 +172,11 @@ class AliexpressAPIHandler(BaseHandler):
             message.message_id,
         )
 
-        # Map original links (with redirectUrl) to resolved links
-        original_to_resolved = self._resolve_redirects(modified_text)
-
-        # Extract resolved URLs that match the pattern
+        # Extract the links whose resolved URLs (without redirectUrl) match the pattern
         aliexpress_links = [
-            resolved
-            for original, resolved in original_to_resolved.items()
-            if re.match(ALIEXPRESS_PATTERN, resolved)
+            parsed_url
+            for parsed_url in self._parsed_message(context).urls
+            if detect_platform(parsed_url.target) == "aliexpress"
         ]
 
         if not aliexpress_links:
@@ -245,34 +192,34 @@ class AliexpressAPIHandler(BaseHandler):
             len(aliexpress_links),
         )
 
-        # Map original links to their affiliate counterparts
-        updated_links = {}
-
-        # Convert the resolved links to affiliate links
-        for original, resolved in original_to_resolved.items():
-            if resolved in aliexpress_links:
-                affiliate_link = await self._convert_to_aliexpress_affiliate(resolved)
-                if affiliate_link:
-                    updated_links[original] = (
-                        affiliate_link  # Replace the original link
-                    )
-
-        # Replace original links with their affiliate counterparts
-        new_text = modified_text
-        for original, affiliate in updated_links.items():
-            new_text = new_text.replace(original, affiliate)
+        # Convert the resolved links to affiliate links, replacing the original links
+        edits = self._message_edits(context)
+        edited = False
+        affiliate_links: dict[str, str | None] = {}
+        for parsed_url in aliexpress_links:
+            if parsed_url.target not in affiliate_links:
+                affiliate_links[
+                    parsed_url.target
+                ] = await self._convert_to_aliexpress_affiliate(
+                    parsed_url.target, user_config
+                )
+            affiliate_link = affiliate_links[parsed_url.target]
+            if affiliate_link:
+                edited |= edits.replace(
+                    parsed_url.start, parsed_url.end, affiliate_link
+                )
 
         # Add discount codes if they are configured
+        discount_codes = user_config.aliexpress.discount_codes
         if discount_codes:
-            new_text += f"\n\n{discount_codes}"
+            edits.add_footer(discount_codes)
+            edited = True
             self.logger.debug(
                 "%s: Appended AliExpress discount codes.",
                 message.message_id,
             )
 
-        # Process the message if modifications were made
-        if new_text != modified_text:
-            await self._process_message(message, new_text)
+        if edited:
             return True
 
         self.logger.info(
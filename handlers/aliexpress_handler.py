@@ -1,16 +1,9 @@
 """Handler for managing AliExpress links and discount codes."""
 
-import re
-
 from config import ConfigurationManager
 
-from handlers.base_handler import PATTERN_URL_QUERY, BaseHandler
-
-ALIEXPRESS_PATTERN = (
-    r"(https?://(?:[a-z]{2,3}\.)?aliexpress\.[a-z]{2,3}(?:\.[a-z]{2,3})?"
-    + PATTERN_URL_QUERY
-    + ")"
-)
+from handlers.base_handler import BaseHandler
+from handlers.patterns import detect_platform
 
 
 class AliexpressHandler(BaseHandler):
@@ -35,15 +28,11 @@ class AliexpressHandler(BaseHandler):
 
         """
         # Retrieve AliExpress-specific data
-        message, modified_text, self.selected_users = self._unpack_context(context)
-        aliexpress_data = self.selected_users.get("aliexpress.com", {})
+        message, _, selected_users = self._unpack_context(context)
+        user_config = selected_users.get("aliexpress.com")
 
         # Check if there are any discount codes available for AliExpress
-        aliexpress_discount_codes = aliexpress_data.get("aliexpress", {}).get(
-            "discount_codes", None
-        )
-
-        if not aliexpress_discount_codes:
+        if user_config is None or not user_config.aliexpress.discount_codes:
             self.logger.info(
                 "%s: Discount codes are empty. Skipping reply.",
                 message.message_id,
@@ -52,15 +41,14 @@ class AliexpressHandler(BaseHandler):
 
         # Send the discount codes as a response to the original message
         await message.chat.send_message(
-            f"{aliexpress_discount_codes}",
+            f"{user_config.aliexpress.discount_codes}",
             reply_to_message_id=message.message_id,
         )
         self.logger.info(
             "%s: Sent AliExpress discount codes.",
             message.message_id,
         )
-        user = aliexpress_data.get("user", {})
-        self.logger.info("User chosen: %s", user)
+        self.logger.info("User chosen: %s", user_config.user)
 
     async def handle_links(self, context: dict) -> bool:
         """Handle both long and short AliExpress links in the message.
@@ -74,11 +62,13 @@ class AliexpressHandler(BaseHandler):
             bool: True if links were handled, False otherwise.
 
         """
-        message, modified_text, self.selected_users = self._unpack_context(context)
-        # Extraemos self.selected_users.get("aliexpress.com", {}) a una variable
-        self.selected_users.get("aliexpress.com", {})
+        message = context["message"]
 
-        aliexpress_links = re.findall(ALIEXPRESS_PATTERN, modified_text)
+        aliexpress_links = [
+            parsed_url.url
+            for parsed_url in self._parsed_message(context).urls
+            if detect_platform(parsed_url.url) == "aliexpress"
+        ]
 
         if aliexpress_links:
             self.logger.info(
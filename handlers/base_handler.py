@@ -4,19 +4,23 @@ from __future__ import annotations
 
 from abc import ABC, abstractmethod
 import logging
-import re
 from typing import TYPE_CHECKING
-from urllib.parse import parse_qs, urlencode, urlparse
+from urllib.parse import urlsplit
 
-from publicsuffix2 import get_sld
+from links.advertisers import AdvertiserIndex, build_advertiser_index
+from links.domains import registrable_domain
+from links.parser import ParsedMessage, parse_message
+from links.templates import PrefilledTemplate, compile_template
+
+from handlers.message_edits import MessageEdits
 
 if TYPE_CHECKING:
-    from config import ConfigurationManager
+    from config import ConfigSnapshot, ConfigurationManager
     from telegram import Message
 
-# Known short URL domains for expansion
-PATTERN_URL_QUERY = r"?[^\s]+"
-PATTERN_AFFILIATE_URL_QUERY = r"/[a-zA-Z0-9\-\._~:/?#\[\]@!$&'()*+,;=%]+"
+# Rest of a URL after its host or path: the host or path must end there, so
+# aliexpress.com does not match aliexpress.com.evil.example
+PATTERN_URL_QUERY = r"(?![\w.\-])[^\s]*"
 
 
 class BaseHandler(ABC):
@@ -31,7 +35,6 @@ class BaseHandler(ABC):
 
         """
         self.logger = logging.getLogger(__name__)
-        self.selected_users: dict[str, dict] = {}
         self.config_manager = config_manager
 
     def _unpack_context(self, context: dict) -> tuple[Message, str, dict]:
@@ -52,6 +55,64 @@ class BaseHandler(ABC):
             context["selected_users"],
         )
 
+    def _parsed_message(self, context: dict) -> ParsedMessage:
+        """Return the parsed modified message of the context, parsing it only if needed.
+
+        Args:
+        ----
+            context (dict): Context dictionary with message data.
+
+        Returns:
+        -------
+            ParsedMessage: The parsed modified message, shared with the other handlers.
+
+        """
+        text = context["modified_message"] or ""
+        parsed_message = context.get("parsed_message")
+        if parsed_message is None or parsed_message.text != text:
+            parsed_message = parse_message(text)
+            context["parsed_message"] = parsed_message
+        return parsed_message
+
+    def _message_edits(self, context: dict) -> MessageEdits:
+        """Return the edits of the message shared by all the handlers of the context.
+
+        Args:
+        ----
+            context (dict): Context dictionary with message data.
+
+        Returns:
+        -------
+            MessageEdits: The edits of the parsed modified message.
+
+        """
+        edits = context.get("edits")
+        if edits is None:
+            edits = MessageEdits(self._parsed_message(context).text)
+            context["edits"] = edits
+        return edits
+
+    async def apply_edits(self, context: dict) -> bool:
+        """Send the message with the edits of all the handlers, once.
+
+        Args:
+        ----
+            context (dict): Context dictionary with message data.
+
+        Returns:
+        -------
+            bool: True if the message was edited and sent.
+
+        """
+        edits = context.get("edits")
+        if not edits:
+            return False
+
+        await self._process_message(
+            context["message"], edits.apply(), context.get("config")
+        )
+        return True
+
     def _generate_affiliate_url(
         self,
         original_url: str,
@@ -71,72 +132,35 @@ class BaseHandler(ABC):
             str: The URL with the affiliate tag and advertiser ID added according to the template.
 
         """
-        affiliate_tag = affiliate_data.get("affiliate_tag", "")
-        affiliate_id = affiliate_data.get("affiliate_id", "")
-        advertiser_id = affiliate_data.get("advertiser_id", "")
-
-        # Parse the original URL
-        parsed_url = urlparse(original_url)
-
-        # Extract domain, path before the query, and full URL
-        domain = f"{parsed_url.scheme}://{parsed_url.netloc}"
-        path_before_query = parsed_url.path
-        full_url = f"{domain}{parsed_url.path}"
-
-        # Parse existing query parameters
-        query_params = parse_qs(parsed_url.query)
-
-        # Add or update affiliate tag
-        query_params[affiliate_tag] = [affiliate_id]
-
-        # Add or update advertiser ID if provided
-        if advertiser_id != "":
-            query_params["advertiser_id"] = [advertiser_id]
-
-        # Build the new query string
-        new_query = urlencode(query_params, doseq=True)
-
-        # Substitute any placeholders {param_name} in the format_template with actual values from query_params
-        for param_name, values in query_params.items():
-            if f"{{{param_name}}}" in format_template:
-                format_template = format_template.replace(
-                    f"{{{param_name}}}", values[0]
-                )
-
-        # Format the output using the provided format_template
-        affiliate_url = format_template.format(
-            domain=domain,
-            path_before_query=path_before_query,
-            full_url=full_url,
-            affiliate_tag=affiliate_tag,
-            affiliate_id=affiliate_id,
-            advertiser_id=advertiser_id,
+        template = compile_template(format_template).prefill(
+            affiliate_data.get("affiliate_tag"),
+            affiliate_data.get("affiliate_id"),
+            affiliate_data.get("advertiser_id"),
         )
+        return template.render(original_url)
 
-        # Check if query params (affiliate tag or additional) are missing from the format_template
-        if "{affiliate_id}" not in format_template and affiliate_tag:
-            if "?" not in affiliate_url:
-                affiliate_url += f"?{new_query}"
-            else:
-                affiliate_url += f"&{new_query}"
-
-        return affiliate_url
-
-    async def _process_message(self, message: Message, new_text: str) -> None:
+    async def _process_message(
+        self,
+        message: Message,
+        new_text: str,
+        config: ConfigSnapshot | None = None,
+    ) -> None:
         """Send a polite affiliate message, either by deleting the original message or replying to it.
 
         Args:
         ----
             message (telegram.Message): The message to modify.
             new_text (str): The modified text with affiliate links.
+            config (ConfigSnapshot | None): The configuration of the update, or None to use the configuration manager.
 
         """
+        settings = config or self.config_manager
         # Get user information
         user_first_name = message.from_user.first_name
         user_username = message.from_user.username
-        polite_message = f"{self.config_manager.msg_reply_provided_by_user} @{user_username if user_username else user_first_name}:\n\n{new_text}\n\n{self.config_manager.msg_affiliate_link_modified}"
+        polite_message = f"{settings.msg_reply_provided_by_user} @{user_username if user_username else user_first_name}:\n\n{new_text}\n\n{settings.msg_affiliate_link_modified}"
 
-        if self.config_manager.delete_messages:
+        if settings.delete_messages:
             # Delete original message and send a new one
             reply_to_message_id = (
                 message.reply_to_message.message_id
@@ -161,89 +185,88 @@ class BaseHandler(ABC):
                 "%s: Replied to message with affiliate links.", message.message_id
             )
 
-    def _build_affiliate_url_pattern(self, advertiser_key: str) -> str | None:
-        """Build a URL pattern for a given affiliate platform (e.g., Admitad, Awin) by gathering all the advertiser domains.
+    def _advertiser_index(self, context: dict) -> AdvertiserIndex:
+        """Return the advertiser index of the context, building it from the selected users if missing.
 
         Args:
         ----
-          advertiser_key: The key in selected_users that holds advertisers (e.g., 'admitad', 'awin').
+            context (dict): Context dictionary with message data.
 
         Returns:
         -------
-          A regex pattern string that matches any of the advertiser domains.
+            AdvertiserIndex: The index of the advertiser stores.
 
         """
-        affiliate_domains = set()
-
-        # Loop through selected users to gather all advertiser domains for the given platform
-        advertisers = {}
-
-        # extract all domains handled by the current adversiter_key
-        for user_data in self.selected_users.values():
-            advertisers_n = user_data.get(advertiser_key, {}).get("advertisers", {})
-            advertisers.update(advertisers_n)
-
-        # Add each domain, properly escaped for regex, to the affiliate_domains set
-        for domain in advertisers:
-            affiliate_domains.add(domain.replace(".", r"\."))
+        advertiser_index = context.get("advertiser_index")
+        if advertiser_index is None:
+            advertiser_index = build_advertiser_index(
+                context["selected_users"].values()
+            )
+            context["advertiser_index"] = advertiser_index
+        return advertiser_index
 
-        # If no domains were found, return None
-        if not affiliate_domains:
-            return None
+    def _affiliate_template(
+        self,
+        context: dict,
+        key: tuple[str, str | None, str],
+        format_template: str,
+        affiliate_ids: tuple[str | None, str | None, str | None],
+    ) -> PrefilledTemplate:
+        """Return the affiliate template prefilled for a user and store, prefilling it only if needed.
 
-        # Join all the domains into a regex pattern
-        domain_pattern = "|".join(affiliate_domains)
+        Args:
+        ----
+            context (dict): Context dictionary with message data.
+            key (tuple[str, str, str]): The platform, user ID and store domain.
+            format_template (str): The affiliate URL format template of the platform.
+            affiliate_ids (tuple[str | None, str | None, str | None]): The affiliate tag, publisher ID and advertiser ID.
 
-        # Return the complete URL pattern
-        url_pattern_template = (
-            r"(https?://(?:[\w\-]+\.)?({})" + PATTERN_AFFILIATE_URL_QUERY + ")"
-        )
+        Returns:
+        -------
+            PrefilledTemplate: The template with the IDs of the user filled in.
 
-        return url_pattern_template.format(
-            domain_pattern,
-        )
+        """
+        template = context.get("affiliate_templates", {}).get(key)
+        if template is None:
+            template = compile_template(format_template).prefill(*affiliate_ids)
+        return template
 
-    def _extract_store_urls(self, message_text: str, url_pattern: str) -> list:
-        """Extract store URLs directly from the message text or from URLs embedded in query parameters.
+    def _extract_store_urls(
+        self,
+        parsed_message: ParsedMessage,
+        advertiser_index: AdvertiserIndex,
+        affiliate_platform: str,
+    ) -> list:
+        """Extract store URLs directly from the message URLs or from URLs embedded in query parameters.
 
         Args:
         ----
-          message_text: The text of the message.
-          url_pattern: The regex pattern to match store URLs.
+          parsed_message: The parsed message.
+          advertiser_index: The index of the advertiser stores.
+          affiliate_platform: The platform whose stores are extracted (e.g., 'admitad', 'awin').
 
         Returns:
         -------
-        : A list of tuples (original_url, extracted_url, domain) matching the store pattern.
+        : A list of tuples (parsed_url, extracted_url, domain) for the links to the stores.
 
         """
         extracted_urls = []
 
-        def _extract_and_append(original: str, extracted: str) -> None:
-            """Parse and append URL and domain."""
-            parsed_url = urlparse(extracted)
-            domain = get_sld(
-                parsed_url.netloc
-            )  # Use get_sld to extract domain (handles cases like .co.uk)
-            extracted_urls.append((original, extracted, domain))
-
-        # Find all URLs in the message text
-        urls_in_message = re.findall(r"https?://[^\s]+", message_text)
-
         # Process each URL found in the message
-        for url in urls_in_message:
-            # If the URL matches the store pattern directly, add it to the list
-            if re.match(url_pattern, url):
-                _extract_and_append(url, url)
-            else:
-                # Parse the URL to extract query parameters
-                parsed_url = urlparse(url)
-                query_params = parse_qs(parsed_url.query)
-
-                # Check if any of the query parameters contains a URL matching the store pattern
-                for values in query_params.values():
-                    for value in values:
-                        if re.match(url_pattern, value):
-                            _extract_and_append(url, value)
+        for parsed_url in parsed_message.urls:
+            # If the URL is a link to a store of the platform, add it to the list
+            if advertiser_index.find(parsed_url.parts.hostname, affiliate_platform):
+                extracted_urls.append((parsed_url, parsed_url.url, parsed_url.domain))
+                continue
+
+            # Check if any of the query parameters contains a link to a store of the platform
+            for values in parsed_url.query.values():
+                for value in values:
+                    if advertiser_index.find_url(value, affiliate_platform):
+                        domain = registrable_domain(
+                            urlsplit(value).hostname
+                        )  # Handles cases like .co.uk
+                        extracted_urls.append((parsed_url, value, domain))
 
         return extracted_urls
 
@@ -254,19 +277,22 @@ class BaseHandler(ABC):
         format_template: str,
         affiliate_tag: str | None,
     ) -> bool:
-        """Handle affiliate links for different platforms."""
-        message, text, self.selected_users = self._unpack_context(context)
-        url_pattern = self._build_affiliate_url_pattern(affiliate_platform)
+        """Add the edits converting the store links of a platform into affiliate links."""
+        message, _, selected_users = self._unpack_context(context)
+        advertiser_index = self._advertiser_index(context)
 
-        if not url_pattern:
+        if not advertiser_index.has_platform(affiliate_platform):
             self.logger.info("%s: No affiliate list", message.message_id)
             return False
 
-        store_links = self._extract_store_urls(text, url_pattern)
+        store_links = self._extract_store_urls(
+            self._parsed_message(context), advertiser_index, affiliate_platform
+        )
 
         requires_publisher = "{affiliate_id}" in format_template
         requires_advertiser = "{advertiser_id}" in format_template
-        new_text = text
+        edits = self._message_edits(context)
+        edited = False
         if store_links:
             self.logger.info(
                 "%s: Found %d store links. Processing...",
@@ -274,14 +300,18 @@ class BaseHandler(ABC):
                 len(store_links),
             )
 
-            for original_url, link, store_domain in store_links:
-                selected_affiliate_data = self.selected_users.get(store_domain, {}).get(
-                    affiliate_platform, {}
-                )
-                publisher_id = selected_affiliate_data.get("publisher_id", None)
-                advertiser_id = selected_affiliate_data.get("advertisers", {}).get(
-                    store_domain, None
-                )
+            for parsed_url, link, store_domain in store_links:
+                user_config = selected_users.get(store_domain)
+                if user_config is None:
+                    self.logger.info(
+                        "%s: No user selected for %s. Skipping processing.",
+                        message.message_id,
+                        store_domain,
+                    )
+                    continue
+                platform_config = user_config.platform(affiliate_platform)
+                publisher_id = platform_config.publisher_id
+                advertiser_id = platform_config.advertisers.get(store_domain)
                 if (requires_publisher and not publisher_id) or (
                     requires_advertiser and not advertiser_id
                 ):
@@ -290,33 +320,31 @@ class BaseHandler(ABC):
                         message.message_id,
                     )
                     continue
-                user = self.selected_users.get(store_domain, {}).get("user", {})
-                self.logger.info("User chosen: %s", user)
-
-                affiliate_data = {
-                    "affiliate_tag": affiliate_tag,
-                    "affiliate_id": publisher_id,
-                    "advertiser_id": advertiser_id,
-                }
-                affiliate_link = self._generate_affiliate_url(
-                    link,
+                self.logger.info("User chosen: %s", user_config.user)
+
+                template = self._affiliate_template(
+                    context,
+                    (affiliate_platform, user_config.user, store_domain),
                     format_template,
-                    affiliate_data,
+                    (affiliate_tag, publisher_id, advertiser_id),
                 )
-                new_text = new_text.replace(original_url, affiliate_link)
-
-                aliexpress_discount_codes = (
-                    self.selected_users.get(store_domain, {})
-                    .get("aliexpress", {})
-                    .get("discount_codes", None)
+                affiliate_link = (
+                    template.render_parts(parsed_url.parts, parsed_url.query)
+                    if link == parsed_url.url
+                    else template.render(link)
                 )
+                edited |= edits.replace(
+                    parsed_url.start, parsed_url.end, affiliate_link
+                )
+
+                aliexpress_discount_codes = user_config.aliexpress.discount_codes
                 if "aliexpress" in store_domain and aliexpress_discount_codes:
-                    new_text += f"\n\n{aliexpress_discount_codes}"
+                    edits.add_footer(aliexpress_discount_codes)
+                    edited = True
                     self.logger.debug(
                         "%s: Appended AliExpress discount codes.", message.message_id
                     )
-        if new_text != text:
-            await self._process_message(message, new_text)
+        if edited:
             return True
 
         self.logger.info("%s: No links found in the message.", message.message_id)
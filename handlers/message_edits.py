@@ -0,0 +1,78 @@
+"""Edits of a message collected from all the handlers and applied at once."""
+
+from __future__ import annotations
+
+
+class MessageEdits:
+    """Span replacements and footers for a message text.
+
+    Every handler adds its edits, and the resulting text is built once, so a
+    message with links of several platforms is sent only once.
+    """
+
+    def __init__(self, text: str) -> None:
+        """Initialize the MessageEdits.
+
+        Args:
+        ----
+            text (str): The text the edit spans refer to.
+
+        """
+        self.text = text
+        self._replacements: dict[tuple[int, int], str] = {}
+        self._footers: list[str] = []
+
+    def __bool__(self) -> bool:
+        """Return True if there is any edit."""
+        return bool(self._replacements or self._footers)
+
+    def replace(self, start: int, end: int, replacement: str) -> bool:
+        """Replace a span of the text, unless it overlaps a span already replaced.
+
+        Args:
+        ----
+            start (int): Start offset of the span.
+            end (int): End offset of the span.
+            replacement (str): The new text for the span.
+
+        Returns:
+        -------
+            bool: True if the replacement was added.
+
+        """
+        if any(
+            start < other_end and other_start < end
+            for other_start, other_end in self._replacements
+        ):
+            return False
+        self._replacements[(start, end)] = replacement
+        return True
+
+    def add_footer(self, footer: str) -> None:
+        """Add a footer after the text, once even if several handlers add it.
+
+        Args:
+        ----
+            footer (str): The footer text.
+
+        """
+        if footer not in self._footers:
+            self._footers.append(footer)
+
+    def apply(self) -> str:
+        """Return the text with all the replacements and footers.
+
+        Returns
+        -------
+            str: The edited text.
+
+        """
+        pieces = []
+        position = 0
+        for (start, end), replacement in sorted(self._replacements.items()):
+            pieces.append(self.text[position:start])
+            pieces.append(replacement)
+            position = end
+        pieces.append(self.text[position:])
+        pieces.extend(f"\n\n{footer}" for footer in self._footers)
+        return "".join(pieces)
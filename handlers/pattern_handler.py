@@ -45,6 +45,8 @@ class PatternHandler(BaseHandler):
     async def handle_links(self, context: dict) -> bool:
         """Handle links based on platform-specific patterns.
 
+        Only the platforms listed in the context, if any, are processed.
+
         Args:
         ----
             context (dict): The context containing the message and user data.
@@ -54,8 +56,10 @@ class PatternHandler(BaseHandler):
             bool: True if any links were processed, False otherwise.
 
         """
+        platforms = context.get("platforms", PATTERNS.keys())
         processed = False
         for platform, data in PATTERNS.items():
-            processed |= await self.process_affiliate_link(context, platform, data)
+            if platform in platforms:
+                processed |= await self.process_affiliate_link(context, platform, data)
 
         return processed
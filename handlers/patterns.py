@@ -2,10 +2,19 @@
 
 from __future__ import annotations
 
+import re
 from typing import TypedDict
 
+from links.templates import AffiliateTemplate, compile_template
+
 from handlers.base_handler import PATTERN_URL_QUERY
 
+ALIEXPRESS_PATTERN = (
+    r"(https?://(?:[a-z]{2,3}\.)?aliexpress\.[a-z]{2,3}(?:\.[a-z]{2,3})?"
+    + PATTERN_URL_QUERY
+    + ")"
+)
+
 
 class PatternConfig(TypedDict):
     """Defines patterns and configurations for handling affiliate links."""
@@ -27,7 +36,7 @@ PATTERNS: dict[str, PatternConfig] = {
     },
     "awin": {
         "pattern": (
-            r"(https?://(?:[\w\-]+\.)?awin1\.com/cread\.php\?" + PATTERN_URL_QUERY + ")"
+            r"(https?://(?:[\w\-]+\.)?awin1\.com/cread\.php" + PATTERN_URL_QUERY + ")"
         ),
         "format_template": "https://www.awin1.com/cread.php?awinmid={advertiser_id}&awinaffid={affiliate_id}&ued={full_url}",
         "affiliate_tag": "awinaffid",
@@ -39,7 +48,7 @@ PATTERNS: dict[str, PatternConfig] = {
     },
     "tradedoubler": {
         "pattern": (
-            r"(https?://(?:[\w\-]+\.)?tradedoubler\.com/cread\.php\?"
+            r"(https?://(?:[\w\-]+\.)?tradedoubler\.com/cread\.php"
             + PATTERN_URL_QUERY
             + ")"
         ),
@@ -47,3 +56,47 @@ PATTERNS: dict[str, PatternConfig] = {
         "affiliate_tag": "a",
     },
 }
+
+# Parts of the hosts matched by the platform patterns, to skip messages without them
+PLATFORM_DOMAINS = (
+    "aliexpress.",
+    "amazon.",
+    "amzn.",
+    "awin1.com",
+    "wextap.com",
+    "tradedoubler.com",
+)
+
+# The format template of every platform, compiled once
+AFFILIATE_TEMPLATES: dict[str, AffiliateTemplate] = {
+    platform: compile_template(data["format_template"])
+    for platform, data in PATTERNS.items()
+}
+
+PLATFORM_PATTERNS: dict[str, str] = {
+    "aliexpress": ALIEXPRESS_PATTERN,
+    **{platform: data["pattern"] for platform, data in PATTERNS.items()},
+}
+
+# Every platform pattern in a single regex, with one named group per platform
+PLATFORM_MATCHER = re.compile(
+    "|".join(
+        f"(?P<{platform}>{pattern})" for platform, pattern in PLATFORM_PATTERNS.items()
+    )
+)
+
+
+def detect_platform(url: str) -> str | None:
+    """Return the platform whose pattern matches a URL, in a single regex match.
+
+    Args:
+    ----
+        url (str): The URL to check.
+
+    Returns:
+    -------
+        str | None: The name of the platform, or None if no pattern matches.
+
+    """
+    match = PLATFORM_MATCHER.match(url)
+    return match.lastgroup if match else None
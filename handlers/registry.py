@@ -0,0 +1,56 @@
+"""Handler instances shared by all the updates."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, TypeVar
+
+if TYPE_CHECKING:
+    from datetime import datetime
+
+    from config import ConfigurationManager
+
+    from handlers.base_handler import BaseHandler
+
+HandlerT = TypeVar("HandlerT", bound="BaseHandler")
+
+
+class HandlerRegistry:
+    """Build each handler once and share it between updates.
+
+    Handlers keep no per-message state, so concurrent updates can use the same
+    instances. They are built again after the configuration is reloaded.
+    """
+
+    def __init__(self, config_manager: ConfigurationManager) -> None:
+        """Initialize the HandlerRegistry.
+
+        Args:
+        ----
+            config_manager (ConfigurationManager): The configuration manager instance.
+
+        """
+        self.config_manager = config_manager
+        self._handlers: dict[type[BaseHandler], BaseHandler] = {}
+        self._loaded_at: datetime | None = None
+
+    def get(self, handler_type: type[HandlerT]) -> HandlerT:
+        """Return the shared instance of a handler, building it if needed.
+
+        Args:
+        ----
+            handler_type (type[HandlerT]): The handler class.
+
+        Returns:
+        -------
+            HandlerT: The handler instance for the current configuration.
+
+        """
+        if self._loaded_at != self.config_manager.last_load_time:
+            self._handlers = {}
+            self._loaded_at = self.config_manager.last_load_time
+
+        handler = self._handlers.get(handler_type)
+        if handler is None:
+            handler = handler_type(self.config_manager)
+            self._handlers[handler_type] = handler
+        return handler  # type: ignore[return-value]
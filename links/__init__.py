@@ -0,0 +1 @@
+"""Package containing the URL expansion and parsing helpers used by the bot."""
@@ -0,0 +1,126 @@
+"""Host index of the advertiser stores of every affiliate platform."""
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Iterator
+
+    from config import UserConfig
+
+
+class AdvertiserIndex:
+    """Index mapping each store domain to its platforms and the advertiser id of each user.
+
+    Lookups walk the suffixes of a host, so subdomains like www.amazon.es
+    find the amazon.es store with one dictionary lookup per label.
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty AdvertiserIndex."""
+        self._domains: dict[str, dict[str, dict[str, str]]] = {}
+        self._platforms: set[str] = set()
+
+    def __len__(self) -> int:
+        """Return the number of indexed store domains."""
+        return len(self._domains)
+
+    def __iter__(self) -> Iterator[str]:
+        """Iterate over the indexed store domains."""
+        return iter(self._domains)
+
+    def add(self, domain: str, platform: str, user_id: str, advertiser_id: str) -> None:
+        """Add the advertiser id of a user for a store domain.
+
+        Args:
+        ----
+            domain (str): The store domain (e.g., "pccomponentes.com").
+            platform (str): The affiliate platform (e.g., "awin").
+            user_id (str): The user ID.
+            advertiser_id (str): The advertiser ID of the store for the user.
+
+        """
+        platforms = self._domains.setdefault(domain.lower(), {})
+        platforms.setdefault(platform, {})[user_id] = advertiser_id
+        self._platforms.add(platform)
+
+    def has_platform(self, platform: str) -> bool:
+        """Check if any store is indexed for a platform.
+
+        Args:
+        ----
+            platform (str): The affiliate platform.
+
+        Returns:
+        -------
+            bool: True if the platform has advertisers.
+
+        """
+        return platform in self._platforms
+
+    def find(self, host: str | None, platform: str) -> str | None:
+        """Find the indexed store domain of a host for a platform.
+
+        Args:
+        ----
+            host (str | None): The host name (e.g., "www.amazon.es").
+            platform (str): The affiliate platform.
+
+        Returns:
+        -------
+            str | None: The store domain, or None if the host is not a store of the platform.
+
+        """
+        if not host:
+            return None
+
+        labels = host.lower().split(".")
+        for position in range(len(labels) - 1):
+            domain = ".".join(labels[position:])
+            if platform in self._domains.get(domain, {}):
+                return domain
+        return None
+
+    def find_url(self, url: str, platform: str) -> str | None:
+        """Find the indexed store domain of a URL for a platform.
+
+        Args:
+        ----
+            url (str): The URL.
+            platform (str): The affiliate platform.
+
+        Returns:
+        -------
+            str | None: The store domain, or None if the URL is not a link to a store of the platform.
+
+        """
+        if not url.startswith(("http://", "https://")):
+            return None
+        try:
+            host = urlsplit(url).hostname
+        except ValueError:
+            return None
+        return self.find(host, platform)
+
+
+def build_advertiser_index(users: Iterable[UserConfig]) -> AdvertiserIndex:
+    """Build an advertiser index from user configurations.
+
+    Args:
+    ----
+        users (Iterable[UserConfig]): User configurations, with the advertisers of each platform.
+
+    Returns:
+    -------
+        AdvertiserIndex: The index of the advertisers of the users.
+
+    """
+    index = AdvertiserIndex()
+    for user_config in users:
+        for platform, platform_config in user_config.platforms():
+            for domain, advertiser_id in platform_config.advertisers.items():
+                if advertiser_id:
+                    index.add(domain, platform, user_config.user, advertiser_id)
+    return index
@@ -0,0 +1,108 @@
+"""Bounded in-memory cache for short URL expansions."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+class ExpansionCache:
+    """TTL and LRU bounded cache mapping URLs to their expanded form.
+
+    Failed expansions are cached too, with their own (usually shorter) TTL, so a
+    dead shortener is not requested again for every message.
+    """
+
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float,
+        negative_ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize the ExpansionCache.
+
+        Args:
+        ----
+            max_size (int): Maximum number of entries kept in the cache.
+            ttl (float): Seconds a successful expansion is kept.
+            negative_ttl (float): Seconds a failed expansion is kept.
+            clock (Callable[[], float]): Monotonic clock, mainly used in tests.
+
+        """
+        self.max_size = max_size
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._entries: OrderedDict[str, tuple[float, str | None]] = OrderedDict()
+
+    def __len__(self) -> int:
+        """Return the number of entries in the cache, including expired ones."""
+        return len(self._entries)
+
+    def lookup(self, url: str) -> tuple[bool, str | None]:
+        """Look up the expansion of a URL.
+
+        Args:
+        ----
+            url (str): The URL to look up.
+
+        Returns:
+        -------
+            tuple[bool, str | None]: Whether the URL was found, and its expanded URL,
+            which is None when the cached result is a failed expansion.
+
+        """
+        entry = self._entries.get(url)
+        if entry is None:
+            self.misses += 1
+            return False, None
+
+        expires_at, expanded_url = entry
+        if expires_at <= self._clock():
+            del self._entries[url]
+            self.misses += 1
+            return False, None
+
+        self._entries.move_to_end(url)
+        self.hits += 1
+        return True, expanded_url
+
+    def store(
+        self, url: str, expanded_url: str | None, *, partial: bool = False
+    ) -> None:
+        """Store the expansion of a URL, evicting the least recently used entries if full.
+
+        Args:
+        ----
+            url (str): The expanded URL key.
+            expanded_url (str | None): The expanded URL, or None for a failed expansion.
+            partial (bool): True if the expansion stopped at a limit, to keep it as briefly as a failed one.
+
+        """
+        if self.max_size <= 0:
+            return
+
+        ttl = (
+            self.ttl if expanded_url is not None and not partial else self.negative_ttl
+        )
+        self._entries[url] = (self._clock() + ttl, expanded_url)
+        self._entries.move_to_end(url)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict[str, int]:
+        """Return the cache counters.
+
+        Returns
+        -------
+            dict[str, int]: Hits, misses and current size of the cache.
+
+        """
+        return {"hits": self.hits, "misses": self.misses, "size": len(self)}
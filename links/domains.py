@@ -0,0 +1,31 @@
+"""Registrable domain of a host, resolved once per host."""
+
+from __future__ import annotations
+
+from functools import lru_cache
+
+from publicsuffix2 import PublicSuffixList
+
+# Hosts whose registrable domain is remembered
+REGISTRABLE_DOMAIN_CACHE_SIZE = 8192
+
+# The public suffix trie is built once, when the module is imported
+PUBLIC_SUFFIX_LIST = PublicSuffixList()
+
+
+@lru_cache(maxsize=REGISTRABLE_DOMAIN_CACHE_SIZE)
+def registrable_domain(host: str | None) -> str | None:
+    """Return the registrable domain of a host, like amazon.co.uk for www.amazon.co.uk.
+
+    Args:
+    ----
+        host (str | None): The host name.
+
+    Returns:
+    -------
+        str | None: The registrable domain, or None if there is no host.
+
+    """
+    if not host:
+        return None
+    return PUBLIC_SUFFIX_LIST.get_sld(host)
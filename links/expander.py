@@ -0,0 +1,247 @@
+"""Expansion of shortened URLs over a shared, pooled HTTP client."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+import httpx
+
+from links.cache import ExpansionCache
+from links.hedging import HedgeBudget, HedgePolicy
+from links.resolver import RedirectChain, resolve_redirects
+from links.shorteners import DEFAULT_SHORTENER_HOSTS, ShortenerRegistry
+from links.singleflight import SingleFlight
+from links.store import ExpansionStore
+from links.unwrap import unwrap_url
+
+if TYPE_CHECKING:
+    from datetime import datetime
+
+    from config import ConfigurationManager
+
+logger = logging.getLogger(__name__)
+
+# Connection pool sizing for the shared expansion client
+MAX_CONNECTIONS = 100
+MAX_KEEPALIVE_CONNECTIONS = 20
+KEEPALIVE_EXPIRY = 60
+
+
+class URLExpander:
+    """Expand shortened URLs reusing keep-alive connections between messages."""
+
+    def __init__(
+        self,
+        config_manager: ConfigurationManager,
+        transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        """Initialize the URLExpander.
+
+        Args:
+        ----
+            config_manager (ConfigurationManager): Configuration manager instance.
+            transport (httpx.AsyncBaseTransport | None): Optional transport, mainly used in tests.
+
+        """
+        self.config_manager = config_manager
+        self._transport = transport
+        self._shorteners: ShortenerRegistry | None = None
+        self._shorteners_loaded_at: datetime | None = None
+        self._client: httpx.AsyncClient | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._cache: ExpansionCache | None = None
+        self._store: ExpansionStore | None = None
+        self._inflight: SingleFlight[str | None] = SingleFlight()
+        self._hedge_budget: HedgeBudget | None = None
+
+    @property
+    def cache(self) -> ExpansionCache:
+        """Return the expansion cache, created from the loaded configuration on first use."""
+        if self._cache is None:
+            self._cache = ExpansionCache(
+                max_size=self.config_manager.expansion_cache_size,
+                ttl=self.config_manager.expansion_cache_ttl,
+                negative_ttl=self.config_manager.expansion_negative_cache_ttl,
+            )
+        return self._cache
+
+    @property
+    def shorteners(self) -> ShortenerRegistry:
+        """Return the shortener registry, kept up to date with the loaded configuration."""
+        if self._shorteners is None:
+            self._shorteners = ShortenerRegistry(
+                DEFAULT_SHORTENER_HOSTS.union(self.config_manager.expansion_shorteners),
+                learned_ttl=self.config_manager.expansion_learned_hosts_ttl,
+            )
+        elif self._shorteners_loaded_at == self.config_manager.last_load_time:
+            return self._shorteners
+
+        # Links to the configured stores are full links, never short ones
+        self._shorteners.direct_domains = frozenset(
+            self.config_manager.domain_percentage_table
+        )
+        self._shorteners_loaded_at = self.config_manager.last_load_time
+        return self._shorteners
+
+    @property
+    def store(self) -> ExpansionStore | None:
+        """Return the persistent expansion store, or None if it is not configured."""
+        if self._store is None and self.config_manager.expansion_store_path:
+            self._store = ExpansionStore(
+                Path(self.config_manager.expansion_store_path),
+                ttl=self.config_manager.expansion_store_ttl,
+            )
+        return self._store
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """Return the shared HTTP client, creating it for the running event loop if needed.
+
+        Returns
+        -------
+            httpx.AsyncClient: The pooled client bound to the current event loop.
+
+        """
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._client = httpx.AsyncClient(
+                timeout=self.config_manager.TIMEOUT,
+                limits=httpx.Limits(
+                    max_connections=MAX_CONNECTIONS,
+                    max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                    keepalive_expiry=KEEPALIVE_EXPIRY,
+                ),
+                transport=self._transport,
+            )
+            self._loop = loop
+        return self._client
+
+    @property
+    def hedge(self) -> HedgePolicy | None:
+        """Return when to hedge the requests to slow hosts, or None if hedging is disabled."""
+        if not self.config_manager.expansion_hedging:
+            return None
+        if self._hedge_budget is None:
+            self._hedge_budget = HedgeBudget(self.config_manager.expansion_hedge_budget)
+        return HedgePolicy(
+            self.config_manager.expansion_hedge_percentile, self._hedge_budget
+        )
+
+    async def resolve(self, url: str) -> RedirectChain:
+        """Resolve the redirect chain of a URL without downloading its destination.
+
+        Each hop is hedged separately when hedging is enabled.
+
+        Args:
+        ----
+            url (str): The URL to resolve.
+
+        Returns:
+        -------
+            RedirectChain: The URLs visited from the requested URL to the final one.
+
+        """
+        return await resolve_redirects(
+            self._get_client(),
+            url,
+            max_hops=self.config_manager.expansion_max_hops,
+            max_bytes=self.config_manager.expansion_max_bytes,
+            limiter=self.config_manager.host_limiter,
+            hedge=self.hedge,
+        )
+
+    async def expand(self, url: str) -> str:
+        """Expand a shortened URL by following its redirects.
+
+        Known wrapper URLs are unwrapped locally, without any request, and their
+        destination is expanded like any other URL.
+
+        Args:
+        ----
+            url (str): The URL to expand.
+
+        Returns:
+        -------
+            str: The expanded URL, or the original URL if it could not be expanded.
+
+        """
+        # Strip trailing punctuation if present
+        stripped_url = url.rstrip(".,")
+        unwrapped_url = unwrap_url(stripped_url)
+        if unwrapped_url != stripped_url:
+            # The destination of a wrapper may be a short URL too
+            logger.info("Unwrapped URL %s to %s", stripped_url, unwrapped_url)
+            url = unwrapped_url
+
+        if not self.shorteners.should_expand(unwrapped_url):
+            logger.debug("Skipping expansion of non redirecting URL: %s", url)
+            return url
+
+        found, cached_url = self.cache.lookup(unwrapped_url)
+        if found:
+            logger.debug("Expansion cache hit for %s: %s", unwrapped_url, cached_url)
+            return cached_url or url
+
+        expanded_url = await self._inflight.do(
+            unwrapped_url, lambda: self._fetch(unwrapped_url)
+        )
+        return expanded_url or url
+
+    async def _fetch(self, url: str) -> str | None:
+        """Expand a URL missing from the in-memory cache, and cache the result.
+
+        Args:
+        ----
+            url (str): The URL to expand, without trailing punctuation.
+
+        Returns:
+        -------
+            str | None: The expanded URL, or None if it could not be expanded.
+
+        """
+        store = self.store
+        stored_url = await store.aget(url) if store else None
+        if stored_url:
+            logger.debug("Expansion store hit for %s: %s", url, stored_url)
+            self.cache.store(url, stored_url)
+            return stored_url
+
+        logger.info("Try expanding shortened URL: %s", url)
+        try:
+            chain = await self.resolve(url)
+        except (httpx.HTTPError, httpx.InvalidURL):
+            logger.exception("Error expanding shortened URL: %s", url)
+            self.cache.store(url, None)
+            return None
+        self.shorteners.learn(chain)
+        # Only an error of the short URL itself is a failure: stores often answer
+        # automated requests to their pages with an error, after a good redirect
+        if len(chain.urls) == 1 and not chain.is_success:
+            logger.warning(
+                "Error status %s expanding shortened URL: %s", chain.status_code, url
+            )
+            self.cache.store(url, None)
+            return None
+        expanded_url = unwrap_url(chain.final_url)
+        if not chain.complete:
+            # Redirect loops and long tracking chains may resolve later, never persist them
+            logger.warning("Partially expanded URL %s to %s", url, expanded_url)
+            self.cache.store(url, expanded_url, partial=True)
+            return expanded_url
+        self.cache.store(url, expanded_url)
+        if store:
+            await store.aput(url, expanded_url)
+        logger.info("Expanded URL %s to full link: %s", url, expanded_url)
+        return expanded_url
+
+    async def aclose(self) -> None:
+        """Close the shared HTTP client and the persistent store."""
+        if self._client is not None and not self._client.is_closed:
+            await self._client.aclose()
+        self._client = None
+        self._loop = None
+        if self._store is not None:
+            self._store.close()
+            self._store = None
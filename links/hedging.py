@@ -0,0 +1,105 @@
+"""Hedged requests: a second try when the first one is slower than usual."""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass
+import logging
+from typing import TYPE_CHECKING, TypeVar
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Maximum number of hedges that can be saved up while traffic is fast
+MAX_HEDGE_TOKENS = 10.0
+
+
+class HedgeBudget:
+    """Token bucket limiting hedged requests to a share of all requests.
+
+    Each request earns `ratio` tokens and each hedge spends one, so over time
+    no more than `ratio` of the requests are hedged.
+    """
+
+    def __init__(self, ratio: float) -> None:
+        """Initialize the HedgeBudget.
+
+        Args:
+        ----
+            ratio (float): Maximum share of requests that can be hedged (e.g., 0.1).
+
+        """
+        self.ratio = ratio
+        self.requests = 0
+        self.hedges = 0
+        self._tokens = 0.0
+
+    def record_request(self) -> None:
+        """Record a request, earning hedge tokens."""
+        self.requests += 1
+        self._tokens = min(MAX_HEDGE_TOKENS, self._tokens + self.ratio)
+
+    def try_acquire(self) -> bool:
+        """Spend a token for a hedge if there is any left.
+
+        Returns
+        -------
+            bool: True if the hedge is allowed.
+
+        """
+        if self._tokens < 1:
+            return False
+        self._tokens -= 1
+        self.hedges += 1
+        return True
+
+
+@dataclass(frozen=True, slots=True)
+class HedgePolicy:
+    """When to hedge a request: once it is slower than a latency percentile of its host."""
+
+    percentile: float
+    budget: HedgeBudget
+
+
+async def hedged(
+    call: Callable[[], Awaitable[T]], delay: float, budget: HedgeBudget
+) -> T:
+    """Run a call, and run it again if it has not finished after delay seconds.
+
+    The first successful result is returned and the other call is cancelled.
+    The second call is only made if the budget allows it.
+
+    Args:
+    ----
+        call (Callable[[], Awaitable[T]]): The call to run.
+        delay (float): Seconds to wait before hedging.
+        budget (HedgeBudget): Budget limiting the number of hedges.
+
+    Returns:
+    -------
+        T: The result of the first successful call, or the error of the last one.
+
+    """
+    budget.record_request()
+    tasks = {asyncio.ensure_future(call())}
+    try:
+        done, _ = await asyncio.wait(tasks, timeout=delay)
+        if not done and budget.try_acquire():
+            logger.debug("Hedging request not answered after %.2f seconds", delay)
+            tasks.add(asyncio.ensure_future(call()))
+
+        while True:
+            done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            successful = [task for task in done if task.exception() is None]
+            if successful:
+                return successful[0].result()
+            if not tasks:
+                return done.pop().result()
+    finally:
+        for task in tasks:
+            task.cancel()
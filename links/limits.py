@@ -0,0 +1,165 @@
+"""Per host concurrency limits and adaptive timeouts for outbound requests."""
+
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+# Latencies kept per host to compute its timeout
+LATENCY_WINDOW = 50
+# Latencies needed before the timeout of a host is adapted
+MIN_SAMPLES = 5
+# Percentile of the observed latencies used to compute the timeout
+LATENCY_PERCENTILE = 0.95
+# Margin applied over the latency percentile
+LATENCY_MULTIPLIER = 2.0
+# Hosts whose latencies are kept, the least recently used ones are forgotten
+MAX_TRACKED_HOSTS = 1024
+
+
+class HostLimiter:
+    """Limit parallel requests per host and derive each host timeout from its latency.
+
+    The timeout of a host is a multiple of a high percentile of its recent
+    latencies, clamped between a floor and a ceiling. Hosts with too few
+    samples use the ceiling.
+    """
+
+    def __init__(
+        self,
+        max_per_host: int = 4,
+        min_timeout: float = 1,
+        max_timeout: float = 10,
+        max_hosts: int = MAX_TRACKED_HOSTS,
+    ) -> None:
+        """Initialize the HostLimiter.
+
+        Args:
+        ----
+            max_per_host (int): Maximum number of parallel requests to one host.
+            min_timeout (float): Lowest timeout given to any host, in seconds.
+            max_timeout (float): Highest timeout given to any host, in seconds.
+            max_hosts (int): Maximum number of hosts whose latencies are kept.
+
+        """
+        self.max_per_host = max_per_host
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+        self.max_hosts = max_hosts
+        self._latencies: OrderedDict[str, deque[float]] = OrderedDict()
+        # Semaphores only exist while a host has requests in flight or waiting
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+        self._users: dict[str, int] = {}
+
+    def configure(
+        self, max_per_host: int, min_timeout: float, max_timeout: float
+    ) -> None:
+        """Update the limits, keeping the latencies observed so far.
+
+        Args:
+        ----
+            max_per_host (int): Maximum number of parallel requests to one host.
+            min_timeout (float): Lowest timeout given to any host, in seconds.
+            max_timeout (float): Highest timeout given to any host, in seconds.
+
+        """
+        if max_per_host != self.max_per_host:
+            self._semaphores.clear()
+        self.max_per_host = max_per_host
+        self.min_timeout = min_timeout
+        self.max_timeout = max_timeout
+
+    def latency_percentile(self, host: str, percentile: float) -> float | None:
+        """Return a percentile of the recent latencies of a host.
+
+        Args:
+        ----
+            host (str): The host name.
+            percentile (float): The percentile, between 0 and 1.
+
+        Returns:
+        -------
+            float | None: The latency in seconds, or None without enough samples.
+
+        """
+        latencies = self._latencies.get(host)
+        if not latencies or len(latencies) < MIN_SAMPLES:
+            return None
+
+        ordered = sorted(latencies)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * percentile))]
+
+    def timeout_for(self, host: str) -> float:
+        """Return the timeout to use for a request to a host.
+
+        Args:
+        ----
+            host (str): The host name.
+
+        Returns:
+        -------
+            float: The timeout in seconds.
+
+        """
+        latency = self.latency_percentile(host, LATENCY_PERCENTILE)
+        if latency is None:
+            return self.max_timeout
+        return min(
+            self.max_timeout, max(self.min_timeout, latency * LATENCY_MULTIPLIER)
+        )
+
+    def record(self, host: str, latency: float) -> None:
+        """Record the latency of a request to a host.
+
+        Args:
+        ----
+            host (str): The host name.
+            latency (float): Seconds the host took to answer, or the timeout if it did not.
+
+        """
+        latencies = self._latencies.get(host)
+        if latencies is None:
+            latencies = self._latencies[host] = deque(maxlen=LATENCY_WINDOW)
+            while len(self._latencies) > self.max_hosts:
+                self._latencies.popitem(last=False)
+        else:
+            self._latencies.move_to_end(host)
+        latencies.append(latency)
+
+    @asynccontextmanager
+    async def limit(self, host: str) -> AsyncIterator[float]:
+        """Wait for a free request slot for a host, and time the request made in it.
+
+        Args:
+        ----
+            host (str): The host name.
+
+        Yields:
+        ------
+            float: The timeout to use for the request.
+
+        """
+        semaphore = self._semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._semaphores[host] = asyncio.Semaphore(self.max_per_host)
+        self._users[host] = self._users.get(host, 0) + 1
+
+        timeout = self.timeout_for(host)
+        try:
+            async with semaphore:
+                started = time.monotonic()
+                try:
+                    yield timeout
+                finally:
+                    self.record(host, min(time.monotonic() - started, timeout))
+        finally:
+            self._users[host] -= 1
+            if not self._users[host]:
+                del self._users[host]
+                self._semaphores.pop(host, None)
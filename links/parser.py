@@ -0,0 +1,205 @@
+"""Single pass parsing of the URLs of a message."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, replace
+import re
+from typing import TYPE_CHECKING
+from urllib.parse import SplitResult, parse_qs, urlsplit
+
+from links.domains import registrable_domain
+from links.unwrap import unwrap_url
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+    from telegram import MessageEntity
+
+URL_PATTERN = re.compile(r"https?://[^\s]+")
+URL_SCHEME_PATTERN = re.compile(r"https?://", re.IGNORECASE)
+
+# Telegram entities holding links: URLs written in the text and hyperlinks behind text
+URL_ENTITY = "url"
+TEXT_LINK_ENTITY = "text_link"
+LINK_ENTITY_TYPES = (URL_ENTITY, TEXT_LINK_ENTITY)
+
+
+@dataclass(frozen=True, slots=True)
+class ParsedURL:
+    """A URL found in a message, with its position and components."""
+
+    url: str
+    start: int
+    parts: SplitResult
+    query: dict[str, list[str]]
+    domain: str | None
+    target: str
+
+    @property
+    def end(self) -> int:
+        """Return the offset right after the URL in the message text."""
+        return self.start + len(self.url)
+
+
+def _parse_url(url: str, start: int) -> ParsedURL | None:
+    """Parse a URL found at a position of a message.
+
+    Args:
+    ----
+        url (str): The URL.
+        start (int): Offset of the URL in the message text.
+
+    Returns:
+    -------
+        ParsedURL | None: The parsed URL, or None if it is not valid.
+
+    """
+    try:
+        parts = urlsplit(url)
+    except ValueError:
+        return None
+    return ParsedURL(
+        url=url,
+        start=start,
+        parts=parts,
+        query=parse_qs(parts.query),
+        domain=registrable_domain(parts.hostname),
+        target=unwrap_url(url),
+    )
+
+
+@dataclass(frozen=True, slots=True)
+class ParsedMessage:
+    """A message text and the URLs found in it, in order of appearance."""
+
+    text: str
+    urls: tuple[ParsedURL, ...]
+
+    @property
+    def domains(self) -> set[str]:
+        """Return the registrable domains of the URLs of the message."""
+        return {parsed_url.domain for parsed_url in self.urls if parsed_url.domain}
+
+    def replace_urls(self, replacements: dict[str, str]) -> ParsedMessage:
+        """Return the message with some of its URLs replaced, without parsing it again.
+
+        Args:
+        ----
+            replacements (dict[str, str]): New URL for each URL to replace.
+
+        Returns:
+        -------
+            ParsedMessage: The message with the URLs replaced.
+
+        """
+        pieces = []
+        urls = []
+        position = 0
+        length = 0
+        for parsed_url in self.urls:
+            before = self.text[position : parsed_url.start]
+            pieces.append(before)
+            length += len(before)
+
+            new_url = replacements.get(parsed_url.url, parsed_url.url)
+            new_parsed_url = (
+                new_url != parsed_url.url and _parse_url(new_url, length)
+            ) or replace(parsed_url, start=length)
+            urls.append(new_parsed_url)
+            pieces.append(new_parsed_url.url)
+            length += len(new_parsed_url.url)
+            position = parsed_url.end
+
+        pieces.append(self.text[position:])
+        return ParsedMessage("".join(pieces), tuple(urls))
+
+
+def parse_message(text: str) -> ParsedMessage:
+    """Find and parse every URL of a message text in a single pass.
+
+    Args:
+    ----
+        text (str): The message text.
+
+    Returns:
+    -------
+        ParsedMessage: The text and its parsed URLs. Invalid URLs are left out.
+
+    """
+    parsed_urls = (
+        _parse_url(match.group(), match.start()) for match in URL_PATTERN.finditer(text)
+    )
+    return ParsedMessage(text, tuple(url for url in parsed_urls if url))
+
+
+def has_link_entities(entities: Sequence[MessageEntity]) -> bool:
+    """Check if any of the entities of a message is a link.
+
+    Args:
+    ----
+        entities (Sequence[MessageEntity]): The Telegram entities of the message.
+
+    Returns:
+    -------
+        bool: True if the message has url or text_link entities.
+
+    """
+    return any(entity.type in LINK_ENTITY_TYPES for entity in entities)
+
+
+def _utf16_to_index(encoded_text: bytes, offset: int) -> int:
+    """Convert a Telegram UTF-16 offset into an index of the Python string."""
+    return len(encoded_text[: offset * 2].decode("utf-16-le"))
+
+
+def parse_message_entities(
+    text: str, entities: Sequence[MessageEntity]
+) -> ParsedMessage:
+    """Parse the URLs of a message from its Telegram entities, without scanning the text.
+
+    Hyperlinks hidden behind text (text_link entities) are written after their
+    text, so they are kept when the message is sent again as plain text.
+
+    Args:
+    ----
+        text (str): The message text.
+        entities (Sequence[MessageEntity]): The Telegram entities of the message.
+
+    Returns:
+    -------
+        ParsedMessage: The message text, with hyperlinks written out, and its parsed URLs.
+
+    """
+    encoded_text = text.encode("utf-16-le")
+    pieces = []
+    urls = []
+    position = 0
+    length = 0
+    for entity in sorted(entities, key=lambda entity: entity.offset):
+        if entity.type not in LINK_ENTITY_TYPES:
+            continue
+        start = _utf16_to_index(encoded_text, entity.offset)
+        end = _utf16_to_index(encoded_text, entity.offset + entity.length)
+        if start < position:
+            continue
+
+        entity_text = text[start:end]
+        url = entity.url if entity.type == TEXT_LINK_ENTITY else entity_text
+        if not url or not URL_SCHEME_PATTERN.match(url):
+            continue
+        prefix = f"{entity_text} (" if url != entity_text else ""
+        suffix = ")" if prefix else ""
+
+        before = text[position:start]
+        parsed_url = _parse_url(url, length + len(before) + len(prefix))
+        if parsed_url is None:
+            continue
+
+        rendered = f"{before}{prefix}{url}{suffix}"
+        pieces.append(rendered)
+        length += len(rendered)
+        urls.append(parsed_url)
+        position = end
+
+    pieces.append(text[position:])
+    return ParsedMessage("".join(pieces), tuple(urls))
@@ -0,0 +1,98 @@
+"""Cheap check of whether a message can have links the bot handles, before parsing it."""
+
+from __future__ import annotations
+
+import re
+from typing import TYPE_CHECKING
+
+from links.parser import TEXT_LINK_ENTITY
+
+if TYPE_CHECKING:
+    from collections.abc import Iterable, Sequence
+
+    from telegram import MessageEntity
+
+
+def _keyword_pattern(keyword: str) -> str:
+    """Return the pattern of a keyword, anchored to the boundaries of a host name.
+
+    The keyword must start a host name or follow a dot, and must end it or be
+    followed by a dot, unless it is itself the start of a host (amazon.).
+    """
+    pattern = rf"(?<![\w\-]){re.escape(keyword)}"
+    return pattern if keyword.endswith(".") else rf"{pattern}(?![\w\-])"
+
+
+def _covers(shorter: str, keyword: str) -> bool:
+    """Check if a shorter keyword matches wherever a keyword does."""
+    # Surround the keyword by what any text matching it has, or by a worst case
+    context = f" {keyword}{'x' if keyword.endswith('.') else ' '}"
+    return re.search(_keyword_pattern(shorter), context) is not None
+
+
+class LinkPrefilter:
+    """Search of the domains of the stores, platforms and shorteners.
+
+    Each domain is only found as a whole part of a host name, so short ones like
+    t.co do not match reddit.com. A message mentioning none of them has no link
+    any handler could change, so it is skipped without parsing its links or
+    looking up any user.
+    """
+
+    def __init__(self, domains: Iterable[str]) -> None:
+        """Initialize the LinkPrefilter.
+
+        Args:
+        ----
+            domains (Iterable[str]): Domains, or parts of them like "amazon.", to look for.
+
+        """
+        keywords = sorted(
+            {domain.lower() for domain in domains if domain},
+            key=lambda keyword: (len(keyword), keyword),
+        )
+        # A keyword matching only where a shorter one does is not searched (amazon.es and amazon.)
+        needed: list[str] = []
+        for keyword in keywords:
+            if not any(_covers(shorter, keyword) for shorter in needed):
+                needed.append(keyword)
+        self.keywords = tuple(needed)
+        self._pattern = re.compile(
+            "|".join(_keyword_pattern(keyword) for keyword in self.keywords) or "(?!)",
+            re.IGNORECASE,
+        )
+
+    def matches(self, text: str | None) -> bool:
+        """Check if a text mentions any of the domains.
+
+        Args:
+        ----
+            text (str | None): The text to check.
+
+        Returns:
+        -------
+            bool: True if any domain appears in the text.
+
+        """
+        return bool(text) and self._pattern.search(text) is not None
+
+    def matches_message(
+        self, text: str | None, entities: Sequence[MessageEntity] = ()
+    ) -> bool:
+        """Check if a message mentions any of the domains, in its text or its hyperlinks.
+
+        Args:
+        ----
+            text (str | None): The message text.
+            entities (Sequence[MessageEntity]): The Telegram entities of the message.
+
+        Returns:
+        -------
+            bool: True if any domain appears in the text or behind a text_link entity.
+
+        """
+        return self.matches(text) or any(
+            self.matches(entity.url)
+            for entity in entities
+            if entity.type == TEXT_LINK_ENTITY
+        )
@@ -0,0 +1,223 @@
+"""Hop by hop redirect resolution that never downloads the destination page."""
+
+from __future__ import annotations
+
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+import logging
+from typing import TYPE_CHECKING
+
+import httpx
+
+from links.hedging import hedged
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    from links.hedging import HedgePolicy
+    from links.limits import HostLimiter
+
+logger = logging.getLogger(__name__)
+
+# Status codes answered by servers that do not accept HEAD requests
+HEAD_NOT_ALLOWED_CODES = {403, 404, 405, 501}
+
+
+@dataclass(frozen=True, slots=True)
+class RedirectChain:
+    """URLs visited while resolving a URL, from the requested one to the final one."""
+
+    urls: tuple[str, ...]
+    status_code: int | None = None
+    complete: bool = True
+
+    @property
+    def final_url(self) -> str:
+        """Return the last URL of the chain."""
+        return self.urls[-1]
+
+    @property
+    def is_success(self) -> bool:
+        """Return True if the last URL of the chain answered with a 2xx status."""
+        return self.status_code is not None and httpx.codes.is_success(self.status_code)
+
+
+@asynccontextmanager
+async def _host_slot(
+    limiter: HostLimiter | None, url: str
+) -> AsyncIterator[float | None]:
+    """Hold a request slot for the host of a URL, yielding its timeout if limited."""
+    if limiter is None:
+        yield None
+        return
+    async with limiter.limit(httpx.URL(url).host) as timeout:
+        yield timeout
+
+
+async def _send(
+    client: httpx.AsyncClient,
+    method: str,
+    url: str,
+    timeout: float | None,
+) -> httpx.Response:
+    """Send a request without following redirects nor reading the response body."""
+    request = (
+        client.build_request(method, url)
+        if timeout is None
+        else client.build_request(method, url, timeout=timeout)
+    )
+    return await client.send(request, stream=True, follow_redirects=False)
+
+
+async def _drain(response: httpx.Response, max_bytes: int) -> int:
+    """Read and discard a redirect body so its connection can be reused.
+
+    Args:
+    ----
+        response (httpx.Response): The streamed redirect response.
+        max_bytes (int): Maximum number of bytes to read.
+
+    Returns:
+    -------
+        int: Bytes read, which is greater than max_bytes when the body was too large.
+
+    """
+    if response.is_stream_consumed:
+        return 0
+
+    read_bytes = 0
+    async for chunk in response.aiter_raw():
+        read_bytes += len(chunk)
+        if read_bytes > max_bytes:
+            break
+    return read_bytes
+
+
+async def _request_hop(
+    client: httpx.AsyncClient,
+    url: str,
+    max_bytes: int,
+    limiter: HostLimiter | None,
+) -> tuple[int, str | None, int]:
+    """Request one hop of a redirect chain.
+
+    The slot of the host is held until the response is closed, so the per host
+    limit also covers draining the redirect body.
+
+    Args:
+    ----
+        client (httpx.AsyncClient): The HTTP client used to send the requests.
+        url (str): The URL of the hop.
+        max_bytes (int): Maximum number of redirect body bytes to read.
+        limiter (HostLimiter | None): Per host limits and timeouts.
+
+    Returns:
+    -------
+        tuple[int, str | None, int]: The status code, the absolute redirect location if any, and the body bytes read.
+
+    """
+    async with _host_slot(limiter, url) as timeout:
+        response = await _send(client, "HEAD", url, timeout)
+        if response.status_code in HEAD_NOT_ALLOWED_CODES:
+            await response.aclose()
+            response = await _send(client, "GET", url, timeout)
+
+        try:
+            location = response.headers.get("location")
+            if not response.is_redirect or not location:
+                return response.status_code, None, 0
+            read_bytes = await _drain(response, max_bytes)
+            return response.status_code, str(response.url.join(location)), read_bytes
+        finally:
+            await response.aclose()
+
+
+async def _request_hop_hedged(
+    client: httpx.AsyncClient,
+    url: str,
+    max_bytes: int,
+    limiter: HostLimiter | None,
+    hedge: HedgePolicy | None,
+) -> tuple[int, str | None, int]:
+    """Request one hop, hedging it when its host is slower than usual.
+
+    The hedge delay comes from the latencies the limiter recorded for the host,
+    which are latencies of single hops too.
+
+    Args:
+    ----
+        client (httpx.AsyncClient): The HTTP client used to send the requests.
+        url (str): The URL of the hop.
+        max_bytes (int): Maximum number of redirect body bytes to read.
+        limiter (HostLimiter | None): Per host limits, timeouts and latencies.
+        hedge (HedgePolicy | None): When to hedge the hop, or None to never hedge it.
+
+    Returns:
+    -------
+        tuple[int, str | None, int]: The status code, the absolute redirect location if any, and the body bytes read.
+
+    """
+    delay = (
+        limiter.latency_percentile(httpx.URL(url).host, hedge.percentile)
+        if limiter is not None and hedge is not None
+        else None
+    )
+    if hedge is None or delay is None:
+        return await _request_hop(client, url, max_bytes, limiter)
+    return await hedged(
+        lambda: _request_hop(client, url, max_bytes, limiter), delay, hedge.budget
+    )
+
+
+async def resolve_redirects(  # noqa: PLR0913
+    client: httpx.AsyncClient,
+    url: str,
+    max_hops: int,
+    max_bytes: int,
+    limiter: HostLimiter | None = None,
+    hedge: HedgePolicy | None = None,
+) -> RedirectChain:
+    """Follow the redirects of a URL one hop at a time without downloading any page.
+
+    Each hop is requested with HEAD, falling back to a streamed GET when the
+    server rejects HEAD. Bodies of redirect responses are drained up to
+    max_bytes in total so keep-alive connections can be reused; the body of the
+    final response is never read. With a hedge policy, a hop slower than usual
+    for its host is sent a second time.
+
+    Args:
+    ----
+        client (httpx.AsyncClient): The HTTP client used to send the requests.
+        url (str): The URL to resolve.
+        max_hops (int): Maximum number of redirects to follow.
+        max_bytes (int): Maximum number of body bytes read along the chain.
+        limiter (HostLimiter | None): Per host limits and timeouts applied to each hop.
+        hedge (HedgePolicy | None): When to hedge each hop, or None to never hedge.
+
+    Returns:
+    -------
+        RedirectChain: The visited URLs. It is marked as incomplete when a limit was reached.
+
+    """
+    urls = [url]
+    read_bytes = 0
+    while True:
+        status_code, location, hop_bytes = await _request_hop_hedged(
+            client,
+            urls[-1],
+            max_bytes - read_bytes,
+            limiter,
+            hedge,
+        )
+        if location is None:
+            return RedirectChain(tuple(urls), status_code)
+
+        if len(urls) > max_hops:
+            logger.warning("Too many redirects resolving %s", url)
+            return RedirectChain(tuple(urls), status_code, complete=False)
+
+        read_bytes += hop_bytes
+        urls.append(location)
+        if read_bytes > max_bytes:
+            logger.warning("Too many bytes read resolving %s", url)
+            return RedirectChain(tuple(urls), status_code, complete=False)
@@ -0,0 +1,150 @@
+"""Registry deciding which URLs are worth a network round trip to expand."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+import time
+from typing import TYPE_CHECKING
+from urllib.parse import urlsplit
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+    from links.resolver import RedirectChain
+
+# Hosts known to answer with a redirect
+DEFAULT_SHORTENER_HOSTS = frozenset(
+    {
+        "a.aliexpress.com",
+        "a.co",
+        "amzn.eu",
+        "amzn.to",
+        "bit.ly",
+        "bitly.com",
+        "buff.ly",
+        "click.aliexpress.com",
+        "cutt.ly",
+        "goo.gl",
+        "is.gd",
+        "ow.ly",
+        "rb.gy",
+        "rebrand.ly",
+        "s.click.aliexpress.com",
+        "shorturl.at",
+        "t.co",
+        "t.ly",
+        "tiny.cc",
+        "tinyurl.com",
+    }
+)
+
+# Maximum number of hosts remembered as not redirecting
+MAX_LEARNED_HOSTS = 10000
+
+
+class ShortenerRegistry:
+    """Decide whether a URL can redirect, using known shorteners and learned hosts.
+
+    URLs on a shortener host are always expanded. URLs on a store domain (full
+    store links) are never expanded. Any other host is expanded until it is
+    seen answering without a redirect; it is then skipped until that knowledge
+    ages out.
+    """
+
+    def __init__(
+        self,
+        shortener_hosts: Iterable[str],
+        learned_ttl: float,
+        direct_domains: Iterable[str] = (),
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Initialize the ShortenerRegistry.
+
+        Args:
+        ----
+            shortener_hosts (Iterable[str]): Hosts known to redirect.
+            learned_ttl (float): Seconds a host is remembered as not redirecting.
+            direct_domains (Iterable[str]): Store domains whose links never need expanding.
+            clock (Callable[[], float]): Monotonic clock, mainly used in tests.
+
+        """
+        self.shortener_hosts = frozenset(host.lower() for host in shortener_hosts)
+        self.learned_ttl = learned_ttl
+        self.direct_domains = frozenset(direct_domains)
+        self._clock = clock
+        self._learned_hosts: OrderedDict[str, float] = OrderedDict()
+
+    @staticmethod
+    def _in_domains(host: str, domains: frozenset[str]) -> bool:
+        """Check if a host, or any of its parent domains, is in a set of domains."""
+        labels = host.lower().split(".")
+        return any(
+            ".".join(labels[index:]) in domains for index in range(len(labels) - 1)
+        )
+
+    def is_shortener(self, host: str) -> bool:
+        """Check if a host, or any of its parent domains, is a known shortener.
+
+        Args:
+        ----
+            host (str): The host name.
+
+        Returns:
+        -------
+            bool: True if the host is a known shortener.
+
+        """
+        return self._in_domains(host, self.shortener_hosts)
+
+    def should_expand(self, url: str) -> bool:
+        """Check if a URL may redirect and is worth expanding.
+
+        Args:
+        ----
+            url (str): The URL to check.
+
+        Returns:
+        -------
+            bool: True if the URL should be expanded.
+
+        """
+        host = urlsplit(url).hostname
+        if not host:
+            return False
+        if self.is_shortener(host):
+            return True
+        if self._in_domains(host, self.direct_domains):
+            return False
+
+        expires_at = self._learned_hosts.get(host)
+        if expires_at is None:
+            return True
+        if expires_at <= self._clock():
+            del self._learned_hosts[host]
+            return True
+        return False
+
+    def learn(self, chain: RedirectChain) -> None:
+        """Learn from a resolved redirect chain whether its host redirects.
+
+        Only a successful answer without redirect marks a host as not redirecting.
+
+        Args:
+        ----
+            chain (RedirectChain): The resolved chain of a URL.
+
+        """
+        host = urlsplit(chain.urls[0]).hostname
+        if not host or self.is_shortener(host):
+            return
+        if len(chain.urls) > 1 or not chain.complete:
+            self._learned_hosts.pop(host, None)
+            return
+        # An error answer, like a 503 of a shortener under load, proves nothing
+        if not chain.is_success:
+            return
+
+        self._learned_hosts[host] = self._clock() + self.learned_ttl
+        self._learned_hosts.move_to_end(host)
+        while len(self._learned_hosts) > MAX_LEARNED_HOSTS:
+            self._learned_hosts.popitem(last=False)
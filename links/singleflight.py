@@ -0,0 +1,47 @@
+"""Coalescing of concurrent identical asynchronous calls."""
+
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING, Generic, TypeVar
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """Share one in-flight call among all the callers asking for the same key.
+
+    The call runs in its own task, so a caller giving up (for instance when
+    its message deadline expires) does not cancel it for the other callers.
+    """
+
+    def __init__(self) -> None:
+        """Initialize the SingleFlight with no calls in flight."""
+        self._calls: dict[str, asyncio.Task[T]] = {}
+
+    def __len__(self) -> int:
+        """Return the number of calls in flight."""
+        return len(self._calls)
+
+    async def do(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        """Run func for key, or wait for the call already in flight for that key.
+
+        Args:
+        ----
+            key (str): The key identifying identical calls.
+            func (Callable[[], Awaitable[T]]): The call to run if none is in flight.
+
+        Returns:
+        -------
+            T: The result of the shared call.
+
+        """
+        task = self._calls.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._calls[key] = task
+            task.add_done_callback(lambda _: self._calls.pop(key, None))
+        return await asyncio.shield(task)
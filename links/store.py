@@ -0,0 +1,148 @@
+"""Persistent SQLite store for short URL expansions."""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+
+class ExpansionStore:
+    """SQLite backed store keeping URL expansions across restarts.
+
+    Entries expire after a TTL. Expired rows are ignored on read and removed by
+    `compact`, which is meant to run periodically in the background. The
+    event loop uses `aget` and `aput`, which run the queries in a worker thread.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        ttl: float,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Initialize the ExpansionStore, creating the database if needed.
+
+        Args:
+        ----
+            path (Path): Path to the SQLite database file.
+            ttl (float): Seconds an expansion is kept.
+            clock (Callable[[], float]): Wall clock, mainly used in tests.
+
+        """
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            # With WAL, commits only wait for the log to be written, not synced
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS expansions ("
+                "url TEXT PRIMARY KEY, "
+                "expanded_url TEXT NOT NULL, "
+                "expires_at REAL NOT NULL)"
+            )
+
+    def get(self, url: str) -> str | None:
+        """Return the stored expansion of a URL.
+
+        Args:
+        ----
+            url (str): The URL to look up.
+
+        Returns:
+        -------
+            str | None: The expanded URL, or None if missing, expired or on error.
+
+        """
+        try:
+            with self._lock:
+                row = self._connection.execute(
+                    "SELECT expanded_url FROM expansions "
+                    "WHERE url = ? AND expires_at > ?",
+                    (url, self._clock()),
+                ).fetchone()
+        except sqlite3.Error:
+            logger.exception("Error reading expansion of %s from the store", url)
+            return None
+        return row[0] if row else None
+
+    def put(self, url: str, expanded_url: str) -> None:
+        """Store the expansion of a URL.
+
+        Args:
+        ----
+            url (str): The expanded URL key.
+            expanded_url (str): The expanded URL.
+
+        """
+        try:
+            with self._lock, self._connection:
+                self._connection.execute(
+                    "INSERT OR REPLACE INTO expansions (url, expanded_url, expires_at) "
+                    "VALUES (?, ?, ?)",
+                    (url, expanded_url, self._clock() + self.ttl),
+                )
+        except sqlite3.Error:
+            logger.exception("Error writing expansion of %s to the store", url)
+
+    async def aget(self, url: str) -> str | None:
+        """Return the stored expansion of a URL without blocking the event loop.
+
+        Args:
+        ----
+            url (str): The URL to look up.
+
+        Returns:
+        -------
+            str | None: The expanded URL, or None if missing, expired or on error.
+
+        """
+        return await asyncio.to_thread(self.get, url)
+
+    async def aput(self, url: str, expanded_url: str) -> None:
+        """Store the expansion of a URL without blocking the event loop.
+
+        Args:
+        ----
+            url (str): The expanded URL key.
+            expanded_url (str): The expanded URL.
+
+        """
+        await asyncio.to_thread(self.put, url, expanded_url)
+
+    def compact(self) -> int:
+        """Remove expired expansions from the store.
+
+        Returns
+        -------
+            int: The number of removed expansions.
+
+        """
+        try:
+            with self._lock, self._connection:
+                cursor = self._connection.execute(
+                    "DELETE FROM expansions WHERE expires_at <= ?", (self._clock(),)
+                )
+        except sqlite3.Error:
+            logger.exception("Error compacting the expansion store")
+            return 0
+        logger.info("Removed %d expired expansions from the store", cursor.rowcount)
+        return cursor.rowcount
+
+    def close(self) -> None:
+        """Close the underlying database connection."""
+        with self._lock:
+            self._connection.close()
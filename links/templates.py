@@ -0,0 +1,191 @@
+"""Affiliate URL templates compiled once and rendered by concatenation."""
+
+from __future__ import annotations
+
+from functools import lru_cache
+from string import Formatter
+from urllib.parse import SplitResult, parse_qs, urlencode, urlsplit
+
+
+class PrefilledTemplate:
+    """An affiliate URL template with the IDs of a user and advertiser already filled in.
+
+    Only the placeholders of the link are left, so rendering a link is a few
+    concatenations.
+    """
+
+    __slots__ = ("_pieces", "_query_params", "_appends_query")
+
+    def __init__(
+        self,
+        pieces: tuple[tuple[str, str | None], ...],
+        query_params: dict[str, list[str]],
+        *,
+        appends_query: bool,
+    ) -> None:
+        """Initialize the PrefilledTemplate.
+
+        Args:
+        ----
+            pieces (tuple[tuple[str, str | None], ...]): Literal text and the placeholder after it.
+            query_params (dict[str, list[str]]): Query parameters set by the affiliate IDs.
+            appends_query (bool): Whether the link query, with the affiliate IDs, goes after the URL.
+
+        """
+        self._pieces = pieces
+        self._query_params = query_params
+        self._appends_query = appends_query
+
+    def render(self, url: str) -> str:
+        """Render the affiliate URL of a link.
+
+        Args:
+        ----
+            url (str): The original product URL.
+
+        Returns:
+        -------
+            str: The affiliate URL.
+
+        """
+        parts = urlsplit(url)
+        return self.render_parts(parts, parse_qs(parts.query))
+
+    def render_parts(self, parts: SplitResult, query: dict[str, list[str]]) -> str:
+        """Render the affiliate URL of a link already split into its components.
+
+        Args:
+        ----
+            parts (SplitResult): The components of the original product URL.
+            query (dict[str, list[str]]): The parsed query parameters of the URL.
+
+        Returns:
+        -------
+            str: The affiliate URL.
+
+        Raises:
+        ------
+            KeyError: If a placeholder is neither known nor a query parameter of the URL.
+
+        """
+        domain = f"{parts.scheme}://{parts.netloc}"
+        pieces = []
+        for literal, field in self._pieces:
+            pieces.append(literal)
+            if field == "domain":
+                pieces.append(domain)
+            elif field == "path_before_query":
+                pieces.append(parts.path)
+            elif field == "full_url":
+                pieces.append(domain + parts.path)
+            elif field is not None:
+                pieces.append(query[field][0])
+        affiliate_url = "".join(pieces)
+
+        if self._appends_query:
+            query_params = {**query, **self._query_params}
+            separator = "&" if "?" in affiliate_url else "?"
+            affiliate_url += separator + urlencode(query_params, doseq=True)
+        return affiliate_url
+
+
+class AffiliateTemplate:
+    """An affiliate URL format template split into literal text and placeholders.
+
+    Placeholders are the link components (domain, path_before_query and
+    full_url), the affiliate IDs (affiliate_tag, affiliate_id and
+    advertiser_id) or the name of a query parameter of the link.
+    """
+
+    __slots__ = ("format_template", "_pieces")
+
+    def __init__(self, format_template: str) -> None:
+        """Compile a format template.
+
+        Args:
+        ----
+            format_template (str): The template, e.g., '{domain}{path_before_query}?{affiliate_tag}={affiliate_id}'.
+
+        Raises:
+        ------
+            ValueError: If the template has positional placeholders, conversions or format specs.
+
+        """
+        pieces = []
+        for literal, field, format_spec, conversion in Formatter().parse(
+            format_template
+        ):
+            if field == "" or format_spec or conversion:
+                msg = (
+                    f"Unsupported placeholder in affiliate template: {format_template}"
+                )
+                raise ValueError(msg)
+            pieces.append((literal, field))
+        self.format_template = format_template
+        self._pieces = tuple(pieces)
+
+    def prefill(
+        self,
+        affiliate_tag: str | None,
+        affiliate_id: str | None,
+        advertiser_id: str | None,
+    ) -> PrefilledTemplate:
+        """Fill in the affiliate IDs of a user and advertiser.
+
+        Args:
+        ----
+            affiliate_tag (str | None): The query parameter of the affiliate ID, if any.
+            affiliate_id (str | None): The publisher ID of the user.
+            advertiser_id (str | None): The advertiser ID of the store for the user.
+
+        Returns:
+        -------
+            PrefilledTemplate: The template with only the placeholders of the link left.
+
+        """
+        values = {
+            "affiliate_tag": affiliate_tag or "",
+            "affiliate_id": affiliate_id or "",
+            "advertiser_id": advertiser_id or "",
+        }
+        query_params = {}
+        if affiliate_tag:
+            query_params[affiliate_tag] = [values["affiliate_id"]]
+        if advertiser_id:
+            query_params["advertiser_id"] = [advertiser_id]
+
+        # The affiliate IDs win over a query parameter of the same name
+        filled = {name: value[0] for name, value in query_params.items()} | values
+        pieces = []
+        pending = ""
+        for literal, field in self._pieces:
+            if field in filled:
+                pending += literal + filled[field]
+            else:
+                pieces.append((pending + literal, field))
+                pending = ""
+        if pending:
+            pieces.append((pending, None))
+
+        return PrefilledTemplate(
+            tuple(pieces),
+            query_params,
+            appends_query=bool(affiliate_tag)
+            and "{affiliate_id}" not in self.format_template,
+        )
+
+
+@lru_cache(maxsize=64)
+def compile_template(format_template: str) -> AffiliateTemplate:
+    """Compile a format template, once for each distinct template.
+
+    Args:
+    ----
+        format_template (str): The affiliate URL format template.
+
+    Returns:
+    -------
+        AffiliateTemplate: The compiled template.
+
+    """
+    return AffiliateTemplate(format_template)
@@ -0,0 +1,112 @@
+"""Offline unwrapping of redirect and affiliate wrapper URLs."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from urllib.parse import SplitResult, parse_qs, unquote, urlsplit
+
+# Maximum number of nested wrappers removed from a URL
+MAX_UNWRAP_DEPTH = 5
+
+
+@dataclass(frozen=True, slots=True)
+class UnwrapRule:
+    """Query parameters holding the destination URL of a wrapper.
+
+    A rule without host suffix applies to every host, and a rule without path to
+    every path of its hosts.
+    """
+
+    params: tuple[str, ...]
+    host_suffix: str | None = None
+    path: str | None = None
+
+    def applies_to(self, host: str, path: str) -> bool:
+        """Check if the rule applies to a host and path."""
+        if self.path is not None and path != self.path:
+            return False
+        return (
+            self.host_suffix is None
+            or host == self.host_suffix
+            or host.endswith(f".{self.host_suffix}")
+        )
+
+
+UNWRAP_RULES = (
+    # AliExpress share links
+    UnwrapRule(("redirectUrl",), "aliexpress.com"),
+    # Admitad deep links, on any of its tracking domains
+    UnwrapRule(("ulp",)),
+    UnwrapRule(("ued",), "awin1.com"),
+    UnwrapRule(("url",), "tradedoubler.com"),
+    # Common click trackers
+    UnwrapRule(("murl",), "linksynergy.com"),
+    UnwrapRule(("url",), "redirectingat.com"),
+    UnwrapRule(("url",), "skimresources.com"),
+    UnwrapRule(("u",), "tradetracker.net"),
+    UnwrapRule(("urllink",), "shareasale.com"),
+    UnwrapRule(("u",), "l.facebook.com"),
+    UnwrapRule(("u",), "l.instagram.com"),
+    # Google search result redirects, not the searches themselves
+    UnwrapRule(("q", "url"), "google.com", "/url"),
+    UnwrapRule(("url",), "anrdoezrs.net"),
+    UnwrapRule(("url",), "dpbolvw.net"),
+    UnwrapRule(("url",), "jdoqocy.com"),
+    UnwrapRule(("url",), "kqzyfj.com"),
+    UnwrapRule(("url",), "tkqlhce.com"),
+)
+
+
+def _split(url: str) -> SplitResult | None:
+    """Split a URL, or return None if it is malformed (e.g. a broken IPv6 host)."""
+    try:
+        return urlsplit(url)
+    except ValueError:
+        return None
+
+
+def _destination(url: str) -> str | None:
+    """Return the destination of a wrapper URL, or None if it is not a known wrapper."""
+    parts = _split(url)
+    if parts is None or not parts.query or not parts.hostname:
+        return None
+
+    host = parts.hostname
+    query_params = parse_qs(parts.query)
+    for rule in UNWRAP_RULES:
+        if not rule.applies_to(host, parts.path):
+            continue
+        for param in rule.params:
+            for value in query_params.get(param, ()):
+                # Some wrappers encode their destination twice
+                destination = (
+                    unquote(value)
+                    if value.lower().startswith(("http%3a", "https%3a"))
+                    else value
+                )
+                if destination.startswith(("http://", "https://")) and _split(
+                    destination
+                ):
+                    return destination
+    return None
+
+
+def unwrap_url(url: str, max_depth: int = MAX_UNWRAP_DEPTH) -> str:
+    """Remove known redirect and affiliate wrappers from a URL without any request.
+
+    Args:
+    ----
+        url (str): The URL to unwrap.
+        max_depth (int): Maximum number of nested wrappers removed.
+
+    Returns:
+    -------
+        str: The innermost destination URL, or the URL itself if it is not a wrapper.
+
+    """
+    for _ in range(max_depth):
+        destination = _destination(url)
+        if destination is None:
+            break
+        url = destination
+    return url
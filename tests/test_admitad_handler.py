@@ -4,7 +4,7 @@ from typing import Any
 import unittest
 from unittest.mock import AsyncMock, MagicMock, patch
 
-from config import ConfigurationManager
+from config import ConfigurationManager, build_user_config
 from handlers.base_handler import BaseHandler
 from handlers.pattern_handler import PatternHandler
 
@@ -26,11 +26,12 @@ class TestHandleAdmitadLinks(unittest.IsolatedAsyncioTestCase):
     ) -> None:
         """Test AliExpress link when AliExpress is NOT in the Admitad list and discount codes should NOT be added."""
         mock_selected_users = {
-            "admitad": {"publisher_id": "my_admitad_id", "advertisers": {}}
+            "admitad": build_user_config(
+                {"publisher_id": "my_admitad_id", "advertisers": {}}
+            )
         }
         mock_config_manager = MagicMock(spec=ConfigurationManager)
         admitad_handler = PatternHandler(mock_config_manager)
-        admitad_handler.selected_users = mock_selected_users
 
         mock_message = AsyncMock()
         mock_message.text = "Here is a product: https://www.aliexpress.com/item/1005002958205071.html I hope you like it"
@@ -43,6 +44,7 @@ class TestHandleAdmitadLinks(unittest.IsolatedAsyncioTestCase):
         }
 
         result = await admitad_handler.handle_links(context)
+        await admitad_handler.apply_edits(context)
 
         # Verify that no message was modified or sent
         mock_message.chat.send_message.assert_not_called()
@@ -54,16 +56,19 @@ class TestHandleAdmitadLinks(unittest.IsolatedAsyncioTestCase):
     async def test_admitad_link_in_list(self, mock_process: AsyncMock) -> None:
         """Test Admitad link conversion when in the list."""
         mock_selected_users: dict = {
-            "giftmio.com": {
-                "admitad": {
-                    "publisher_id": "my_admitad_id",
-                    "advertisers": {"giftmio.com": "93fd4vbk6c873a1e3014d68450d763"},
+            "giftmio.com": build_user_config(
+                {
+                    "admitad": {
+                        "publisher_id": "my_admitad_id",
+                        "advertisers": {
+                            "giftmio.com": "93fd4vbk6c873a1e3014d68450d763"
+                        },
+                    }
                 }
-            }
+            )
         }
         mock_config_manager = MagicMock(spec=ConfigurationManager)
         admitad_handler = PatternHandler(mock_config_manager)
-        admitad_handler.selected_users = mock_selected_users
 
         mock_message = AsyncMock()
         mock_message.text = (
@@ -80,10 +85,11 @@ class TestHandleAdmitadLinks(unittest.IsolatedAsyncioTestCase):
         }
 
         result = await admitad_handler.handle_links(context)
+        await admitad_handler.apply_edits(context)
 
         expected_message = "Check this out: https://wextap.com/g/93fd4vbk6c873a1e3014d68450d763/?ulp=https://www.giftmio.com/some-product I hope you like it"
 
-        mock_process.assert_called_with(mock_message, expected_message)
+        mock_process.assert_called_with(mock_message, expected_message, None)
         self.assertTrue(result)
 
     @patch("handlers.base_handler.BaseHandler._process_message")
@@ -92,16 +98,19 @@ class TestHandleAdmitadLinks(unittest.IsolatedAsyncioTestCase):
     ) -> None:
         """Test if an existing Admitad affiliate link is modified when the store is in our list of Admitad advertisers."""
         mock_selected_users: dict = {
-            "giftmio.com": {
-                "admitad": {
-                    "publisher_id": "my_admitad_id",
-                    "advertisers": {"giftmio.com": "93fd4vbk6c873a1e3014d68450d763"},
+            "giftmio.com": build_user_config(
+                {
+                    "admitad": {
+                        "publisher_id": "my_admitad_id",
+                        "advertisers": {
+                            "giftmio.com": "93fd4vbk6c873a1e3014d68450d763"
+                        },
+                    }
                 }
-            }
+            )
         }
         mock_config_manager = MagicMock(spec=ConfigurationManager)
         admitad_handler = PatternHandler(mock_config_manager)
-        admitad_handler.selected_users = mock_selected_users
 
         mock_message = AsyncMock()
         mock_message.text = "Here is a product: https://wextap.com/g/other_id_not_mine/?ulp=https://www.giftmio.com/some-product I hope you like it"
@@ -115,9 +124,10 @@ class TestHandleAdmitadLinks(unittest.IsolatedAsyncioTestCase):
         }
 
         result = await admitad_handler.handle_links(context)
+        await admitad_handler.apply_edits(context)
 
         expected_message = "Here is a product: https://wextap.com/g/93fd4vbk6c873a1e3014d68450d763/?ulp=https://www.giftmio.com/some-product I hope you like it"
-        mock_process.assert_called_with(mock_message, expected_message)
+        mock_process.assert_called_with(mock_message, expected_message, None)
         self.assertTrue(result)
 
     @patch("handlers.base_handler.BaseHandler._process_message")
@@ -126,16 +136,19 @@ class TestHandleAdmitadLinks(unittest.IsolatedAsyncioTestCase):
     ) -> None:
         """Test that an existing Admitad affiliate link is NOT modified when the store is NOT in our list of Admitad advertisers."""
         mock_selected_users = {
-            "giftmio.com": {
-                "admitad": {
-                    "publisher_id": "my_admitad_id",
-                    "advertisers": {"giftmio.com": "93fd4vbk6c873a1e3014d68450d763"},
+            "giftmio.com": build_user_config(
+                {
+                    "admitad": {
+                        "publisher_id": "my_admitad_id",
+                        "advertisers": {
+                            "giftmio.com": "93fd4vbk6c873a1e3014d68450d763"
+                        },
+                    }
                 }
-            }
+            )
         }
         mock_config_manager = MagicMock(spec=ConfigurationManager)
         admitad_handler = PatternHandler(mock_config_manager)
-        admitad_handler.selected_users = mock_selected_users
 
         mock_message = AsyncMock()
         mock_message.text = "Here is a product: https://wextap.com/g/other_id_not_mine/?ulp=https://www.unknownstore.com/product I hope you like it"
@@ -148,6 +161,7 @@ class TestHandleAdmitadLinks(unittest.IsolatedAsyncioTestCase):
         }
 
         result = await admitad_handler.handle_links(context)
+        await admitad_handler.apply_edits(context)
 
         mock_process.assert_not_called()
         self.assertFalse(result)
@@ -158,16 +172,17 @@ class TestHandleAdmitadLinks(unittest.IsolatedAsyncioTestCase):
     ) -> None:
         """Test AliExpress link in Admitad list, no discount code added."""
         mock_selected_users = {
-            "aliexpress.com": {
-                "admitad": {
-                    "publisher_id": "my_admitad_id",
-                    "advertisers": {"aliexpress.com": "11640"},
+            "aliexpress.com": build_user_config(
+                {
+                    "admitad": {
+                        "publisher_id": "my_admitad_id",
+                        "advertisers": {"aliexpress.com": "11640"},
+                    }
                 }
-            }
+            )
         }
         mock_config_manager = MagicMock(spec=ConfigurationManager)
         admitad_handler = PatternHandler(mock_config_manager)
-        admitad_handler.selected_users = mock_selected_users
         mock_message = AsyncMock()
         mock_message.text = "Check this out: https://www.aliexpress.com/item/1005002958205071.html I hope you like it"
         mock_message.message_id = 5
@@ -182,8 +197,9 @@ class TestHandleAdmitadLinks(unittest.IsolatedAsyncioTestCase):
         }
 
         result = await admitad_handler.handle_links(context)
+        await admitad_handler.apply_edits(context)
 
-        mock_process.assert_called_with(mock_message, expected_message)
+        mock_process.assert_called_with(mock_message, expected_message, None)
         self.assertTrue(result)
 
     @patch("handlers.base_handler.BaseHandler._process_message")
@@ -192,17 +208,18 @@ class TestHandleAdmitadLinks(unittest.IsolatedAsyncioTestCase):
     ) -> None:
         """Test AliExpress link in Admitad list, adding discount codes when applicable."""
         mock_selected_users = {
-            "aliexpress.com": {
-                "admitad": {
-                    "publisher_id": "my_admitad",
-                    "advertisers": {"aliexpress.com": "11640"},
-                },
-                "aliexpress": {"discount_codes": "Here is your discount code!"},
-            }
+            "aliexpress.com": build_user_config(
+                {
+                    "admitad": {
+                        "publisher_id": "my_admitad",
+                        "advertisers": {"aliexpress.com": "11640"},
+                    },
+                    "aliexpress": {"discount_codes": "Here is your discount code!"},
+                }
+            )
         }
         mock_config_manager = MagicMock(spec=ConfigurationManager)
         admitad_handler = PatternHandler(mock_config_manager)
-        admitad_handler.selected_users = mock_selected_users
 
         mock_message = AsyncMock()
         mock_message.text = "Here is a product: https://www.aliexpress.com/item/1005002958205071.html I hope you like it"
@@ -223,8 +240,9 @@ class TestHandleAdmitadLinks(unittest.IsolatedAsyncioTestCase):
         }
 
         result = await admitad_handler.handle_links(context)
+        await admitad_handler.apply_edits(context)
 
-        mock_process.assert_called_with(mock_message, expected_message)
+        mock_process.assert_called_with(mock_message, expected_message, None)
         self.assertTrue(result)
 
     @patch("handlers.base_handler.BaseHandler._process_message")
@@ -233,16 +251,19 @@ class TestHandleAdmitadLinks(unittest.IsolatedAsyncioTestCase):
     ) -> None:
         """Test AliExpress link when AliExpress is NOT in the Admitad list and discount codes should NOT be added."""
         mock_selected_users = {
-            "aliexpress.com": {
-                "admitad": {
-                    "publisher_id": "my_admitad_id",
-                    "advertisers": {"giftmio.com": "93fd4vbk6c873a1e3014d68450d763"},
+            "aliexpress.com": build_user_config(
+                {
+                    "admitad": {
+                        "publisher_id": "my_admitad_id",
+                        "advertisers": {
+                            "giftmio.com": "93fd4vbk6c873a1e3014d68450d763"
+                        },
+                    }
                 }
-            }
+            )
         }
         mock_config_manager = MagicMock(spec=ConfigurationManager)
         admitad_handler = PatternHandler(mock_config_manager)
-        admitad_handler.selected_users = mock_selected_users
 
         mock_message = AsyncMock()
         mock_message.text = "Here is a product: https://www.aliexpress.com/item/1005002958205071.html I hope you like it"
@@ -255,6 +276,7 @@ class TestHandleAdmitadLinks(unittest.IsolatedAsyncioTestCase):
         }
 
         result = await admitad_handler.handle_links(context)
+        await admitad_handler.apply_edits(context)
 
         mock_process.assert_not_called()
         self.assertFalse(result)
@@ -265,17 +287,18 @@ class TestHandleAdmitadLinks(unittest.IsolatedAsyncioTestCase):
     ) -> None:
         """Test No AliExpress link in Admitad list, the discount should not be applied."""
         mock_selected_users = {
-            "pccomponentes.com": {
-                "admitad": {
-                    "publisher_id": "my_admitad_id",
-                    "advertisers": {"pccomponentes.com": "11640"},
-                },
-                "aliexpress": {"discount_codes": "Here is your discount code!"},
-            }
+            "pccomponentes.com": build_user_config(
+                {
+                    "admitad": {
+                        "publisher_id": "my_admitad_id",
+                        "advertisers": {"pccomponentes.com": "11640"},
+                    },
+                    "aliexpress": {"discount_codes": "Here is your discount code!"},
+                }
+            )
         }
         mock_config_manager = MagicMock(spec=ConfigurationManager)
         admitad_handler = PatternHandler(mock_config_manager)
-        admitad_handler.selected_users = mock_selected_users
 
         mock_message = AsyncMock()
         mock_message.text = "Here is a product: https://www.pccomponentes.com/item/1005002958205071.html I hope you like it"
@@ -292,8 +315,9 @@ class TestHandleAdmitadLinks(unittest.IsolatedAsyncioTestCase):
         }
 
         result = await admitad_handler.handle_links(context)
+        await admitad_handler.apply_edits(context)
 
-        mock_process.assert_called_with(mock_message, expected_message)
+        mock_process.assert_called_with(mock_message, expected_message, None)
         self.assertTrue(result)
 
 
@@ -0,0 +1,73 @@
+"""Tests for the AdvertiserIndex class."""
+
+import unittest
+
+from config import build_user_config
+from links.advertisers import AdvertiserIndex, build_advertiser_index
+
+
+class TestAdvertiserIndex(unittest.TestCase):
+    """Tests for AdvertiserIndex."""
+
+    def setUp(self) -> None:
+        """Set up an index with stores of two platforms."""
+        self.index = AdvertiserIndex()
+        self.index.add("pccomponentes.com", "awin", "main", "20982")
+        self.index.add("amazon.co.uk", "amazon", "main", "uk-21")
+        self.index.add("amazon.co.uk", "amazon", "creator", "creator-21")
+
+    def test_find_store_by_host(self) -> None:
+        """Test: Stores are found from their hosts, including subdomains."""
+        self.assertEqual(
+            self.index.find("www.pccomponentes.com", "awin"), "pccomponentes.com"
+        )
+        self.assertEqual(self.index.find("WWW.Amazon.co.uk", "amazon"), "amazon.co.uk")
+        self.assertEqual(len(self.index), 2)
+
+    def test_find_only_platform_stores(self) -> None:
+        """Test: Stores of other platforms and unknown hosts are not found."""
+        self.assertIsNone(self.index.find("www.pccomponentes.com", "admitad"))
+        self.assertIsNone(self.index.find("co.uk", "amazon"))
+        self.assertIsNone(self.index.find("example.com", "awin"))
+        self.assertIsNone(self.index.find(None, "awin"))
+
+    def test_find_url(self) -> None:
+        """Test: Store links are found from URLs, and anything else is ignored."""
+        self.assertEqual(
+            self.index.find_url("https://www.pccomponentes.com/p", "awin"),
+            "pccomponentes.com",
+        )
+        self.assertIsNone(self.index.find_url("pccomponentes.com/p", "awin"))
+        self.assertIsNone(self.index.find_url("https://[::1/p", "awin"))
+
+    def test_has_platform(self) -> None:
+        """Test: Only platforms with advertisers are reported."""
+        self.assertTrue(self.index.has_platform("awin"))
+        self.assertFalse(self.index.has_platform("tradedoubler"))
+
+    def test_build_from_users(self) -> None:
+        """Test: The index is built from the advertisers of user configurations."""
+        index = build_advertiser_index(
+            [
+                build_user_config(
+                    {
+                        "user": "main",
+                        "percentage": 90,
+                        "admitad": {
+                            "publisher_id": "pub",
+                            "advertisers": {
+                                "example1.com": "123",
+                                "example2.com": None,
+                            },
+                        },
+                    }
+                )
+            ]
+        )
+
+        self.assertEqual(index.find("www.example1.com", "admitad"), "example1.com")
+        self.assertIsNone(index.find("www.example2.com", "admitad"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+"""Tests for the compiled affiliate URL templates."""
+
+import unittest
+
+from links.parser import parse_message
+from links.templates import AffiliateTemplate, compile_template
+
+
+class TestAffiliateTemplate(unittest.TestCase):
+    """Tests for AffiliateTemplate and PrefilledTemplate."""
+
+    def test_prefilled_ids(self) -> None:
+        """Test: The affiliate IDs are filled in before any link is rendered."""
+        template = AffiliateTemplate(
+            "https://clk.tradedoubler.com/click?p={advertiser_id}&a={affiliate_id}&url={full_url}"
+        ).prefill("a", "publisher-1", "advertiser-1")
+
+        self.assertEqual(
+            template.render("https://www.example.com/product/1?color=red#top"),
+            "https://clk.tradedoubler.com/click?p=advertiser-1&a=publisher-1"
+            "&url=https://www.example.com/product/1",
+        )
+
+    def test_render_parsed_url(self) -> None:
+        """Test: A parsed URL renders as its text without splitting it again."""
+        template = compile_template("{domain}{path_before_query}?tag={advertiser_id}")
+        prefilled = template.prefill(None, None, "store-21")
+        (parsed_url,) = parse_message("Look https://www.amazon.es/dp/B01?th=1").urls
+
+        self.assertEqual(
+            prefilled.render_parts(parsed_url.parts, parsed_url.query),
+            prefilled.render(parsed_url.url),
+        )
+        self.assertEqual(
+            prefilled.render(parsed_url.url),
+            "https://www.amazon.es/dp/B01?tag=store-21",
+        )
+
+    def test_query_placeholder(self) -> None:
+        """Test: Placeholders of other names take the query parameter of the link."""
+        template = AffiliateTemplate(
+            "https://go.example.com?to={url}&id={affiliate_id}"
+        )
+
+        self.assertEqual(
+            template.prefill("id", "me", None).render(
+                "https://short.example.com/r?url=https://shop.example.com/item"
+            ),
+            "https://go.example.com?to=https://shop.example.com/item&id=me",
+        )
+
+    def test_affiliate_ids_not_taken_from_link(self) -> None:
+        """Test: A query parameter of the link does not replace the affiliate ID."""
+        template = AffiliateTemplate("{domain}{path_before_query}?aff={affiliate_id}")
+
+        self.assertEqual(
+            template.prefill("aff", "me", None).render(
+                "https://shop.example.com/item?affiliate_id=someone-else"
+            ),
+            "https://shop.example.com/item?aff=me",
+        )
+
+    def test_compiled_once(self) -> None:
+        """Test: The same format template is compiled only once."""
+        self.assertIs(compile_template("{full_url}"), compile_template("{full_url}"))
+
+
+if __name__ == "__main__":
+    unittest.main()
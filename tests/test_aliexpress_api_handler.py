@@ -3,7 +3,7 @@
 import unittest
 from unittest.mock import AsyncMock, MagicMock, patch
 
-from config import ConfigurationManager
+from config import ConfigurationManager, build_user_config
 from handlers.aliexpress_api_handler import AliexpressAPIHandler
 
 
@@ -17,9 +17,8 @@ class TestHandleAliExpressAPILinks(unittest.IsolatedAsyncioTestCase):
         mock_config_manager = MagicMock(spec=ConfigurationManager)
 
         # Mock selected_users without AliExpress app_key
-        mock_selected_users = {"aliexpress": {"app_key": None}}
+        mock_selected_users = {"aliexpress": build_user_config({"app_key": None})}
         aliexpress_handler = AliexpressAPIHandler(mock_config_manager)
-        aliexpress_handler.selected_users = mock_selected_users
 
         mock_message = AsyncMock()
         mock_message.text = (
@@ -34,6 +33,7 @@ class TestHandleAliExpressAPILinks(unittest.IsolatedAsyncioTestCase):
         }
 
         result = await aliexpress_handler.handle_links(context)
+        await aliexpress_handler.apply_edits(context)
 
         # Ensure no action is taken when the app_key is empty
         mock_process.assert_not_called()
@@ -45,9 +45,10 @@ class TestHandleAliExpressAPILinks(unittest.IsolatedAsyncioTestCase):
         # Mock ConfigurationManager
         mock_config_manager = MagicMock(spec=ConfigurationManager)
 
-        mock_selected_users = {"aliexpress": {"app_key": "some_app_key"}}
+        mock_selected_users = {
+            "aliexpress": build_user_config({"app_key": "some_app_key"})
+        }
         aliexpress_handler = AliexpressAPIHandler(mock_config_manager)
-        aliexpress_handler.selected_users = mock_selected_users
 
         mock_message = AsyncMock()
         mock_message.text = "This is a random message with no AliExpress links."
@@ -61,6 +62,7 @@ class TestHandleAliExpressAPILinks(unittest.IsolatedAsyncioTestCase):
         }
 
         result = await aliexpress_handler.handle_links(context)
+        await aliexpress_handler.apply_edits(context)
 
         # Ensure no actions are taken
         mock_process.assert_not_called()
@@ -79,14 +81,15 @@ class TestHandleAliExpressAPILinks(unittest.IsolatedAsyncioTestCase):
 
         aliexpress_handler = AliexpressAPIHandler(mock_config_manager)
         mock_selected_users = {
-            "aliexpress.com": {
-                "aliexpress": {
-                    "app_key": "some_app_key",
-                    "discount_codes": "Here is your discount code!",
+            "aliexpress.com": build_user_config(
+                {
+                    "aliexpress": {
+                        "app_key": "some_app_key",
+                        "discount_codes": "Here is your discount code!",
+                    }
                 }
-            }
+            )
         }
-        aliexpress_handler.selected_users = mock_selected_users
 
         mock_convert.return_value = (
             "https://www.aliexpress.com/item/1005002958205071.html?aff_id=affiliate_21"
@@ -105,13 +108,14 @@ class TestHandleAliExpressAPILinks(unittest.IsolatedAsyncioTestCase):
         }
 
         result = await aliexpress_handler.handle_links(context)
+        await aliexpress_handler.apply_edits(context)
 
         expected_message = (
             "Here is a product: https://www.aliexpress.com/item/1005002958205071.html?aff_id=affiliate_21\n\n"
             "Here is your discount code!"
         )
 
-        mock_process.assert_called_with(mock_message, expected_message)
+        mock_process.assert_called_with(mock_message, expected_message, None)
         self.assertTrue(result)
 
 
@@ -3,7 +3,7 @@
 import unittest
 from unittest.mock import AsyncMock, MagicMock
 
-from config import ConfigurationManager
+from config import ConfigurationManager, build_user_config
 from handlers.aliexpress_handler import AliexpressHandler
 
 
@@ -24,16 +24,17 @@ class TestHandleAliExpressLinks(unittest.IsolatedAsyncioTestCase):
         handler = AliexpressHandler(mock_config_manager)
 
         mock_selected_users = {
-            "aliexpress.com": {
-                "aliexpress": {
-                    "discount_codes": "💥 AliExpress discount codes: 💰 5% off!",
-                    "app_key": "",
-                    "app_secret": None,
-                    "tracking_id": None,
+            "aliexpress.com": build_user_config(
+                {
+                    "aliexpress": {
+                        "discount_codes": "💥 AliExpress discount codes: 💰 5% off!",
+                        "app_key": "",
+                        "app_secret": None,
+                        "tracking_id": None,
+                    }
                 }
-            }
+            )
         }
-        handler.selected_users = mock_selected_users
 
         context = {
             "message": mock_message,
@@ -63,16 +64,17 @@ class TestHandleAliExpressLinks(unittest.IsolatedAsyncioTestCase):
         handler = AliexpressHandler(mock_config_manager)
 
         mock_selected_users = {
-            "aliexpress.com": {
-                "aliexpress": {
-                    "discount_codes": "",
-                    "app_key": "",
-                    "app_secret": None,
-                    "tracking_id": None,
+            "aliexpress.com": build_user_config(
+                {
+                    "aliexpress": {
+                        "discount_codes": "",
+                        "app_key": "",
+                        "app_secret": None,
+                        "tracking_id": None,
+                    }
                 }
-            }
+            )
         }
-        handler.selected_users = mock_selected_users
 
         context = {
             "message": mock_message,
@@ -97,16 +99,17 @@ class TestHandleAliExpressLinks(unittest.IsolatedAsyncioTestCase):
         handler = AliexpressHandler(mock_config_manager)
 
         mock_selected_users = {
-            "aliexpress.com": {
-                "aliexpress": {
-                    "discount_codes": "💥 AliExpress discount codes: 💰 5% off!",
-                    "app_key": "",
-                    "app_secret": None,
-                    "tracking_id": None,
+            "aliexpress.com": build_user_config(
+                {
+                    "aliexpress": {
+                        "discount_codes": "💥 AliExpress discount codes: 💰 5% off!",
+                        "app_key": "",
+                        "app_secret": None,
+                        "tracking_id": None,
+                    }
                 }
-            }
+            )
         }
-        handler.selected_users = mock_selected_users
 
         context = {
             "message": mock_message,
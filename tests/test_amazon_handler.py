@@ -4,8 +4,9 @@ import re
 import unittest
 from unittest.mock import AsyncMock, MagicMock, patch
 
-from config import ConfigurationManager
+from config import ConfigurationManager, build_user_config
 from handlers.pattern_handler import PatternHandler
+from links.parser import parse_message
 
 
 class TestHandleAmazonLinks(unittest.IsolatedAsyncioTestCase):
@@ -15,15 +16,15 @@ class TestHandleAmazonLinks(unittest.IsolatedAsyncioTestCase):
     async def test_no_amazon_link(self, mock_process: AsyncMock) -> None:
         """Test that no action is taken if there are no Amazon links in the message."""
         mock_selected_users = {
-            "amazon.es": {"amazon": {"affiliate_id": "our_affiliate_id"}}
+            "amazon.es": build_user_config(
+                {"amazon": {"affiliate_id": "our_affiliate_id"}}
+            )
         }
 
         # Mock ConfigurationManager
         mock_config_manager = MagicMock(spec=ConfigurationManager)
         amazon_handler = PatternHandler(mock_config_manager)
 
-        amazon_handler.selected_users = mock_selected_users
-
         mock_message = AsyncMock()
         mock_message.text = "This is a random message without Amazon links."
         mock_message.message_id = 4
@@ -36,6 +37,7 @@ class TestHandleAmazonLinks(unittest.IsolatedAsyncioTestCase):
         }
 
         result = await amazon_handler.handle_links(context)
+        await amazon_handler.apply_edits(context)
 
         mock_message.delete.assert_not_called()
         mock_message.chat.send_message.assert_not_called()
@@ -47,7 +49,9 @@ class TestHandleAmazonLinks(unittest.IsolatedAsyncioTestCase):
         self, mock_process: AsyncMock
     ) -> None:
         """Test that no action is taken if AMAZON_AFFILIATE_ID is None."""
-        mock_selected_users = {"amazon.es": {"amazon": {"affiliate_id": None}}}
+        mock_selected_users = {
+            "amazon.es": build_user_config({"amazon": {"affiliate_id": None}})
+        }
 
         # Mock ConfigurationManager
         mock_config_manager = MagicMock(spec=ConfigurationManager)
@@ -67,6 +71,7 @@ class TestHandleAmazonLinks(unittest.IsolatedAsyncioTestCase):
         }
 
         result = await amazon_handler.handle_links(context)
+        await amazon_handler.apply_edits(context)
 
         mock_message.delete.assert_not_called()
         mock_message.chat.send_message.assert_not_called()
@@ -80,22 +85,22 @@ class TestHandleAmazonLinks(unittest.IsolatedAsyncioTestCase):
     ) -> None:
         """Test if long Amazon links without affiliate ID are converted to include the affiliate ID."""
         mock_selected_users = {
-            "amazon.com": {
-                "amazon": {
-                    "advertisers": {
-                        "amazon.com": "com_affiliate_id",
-                        "amazon.es": "es_affiliate_id",
+            "amazon.com": build_user_config(
+                {
+                    "amazon": {
+                        "advertisers": {
+                            "amazon.com": "com_affiliate_id",
+                            "amazon.es": "es_affiliate_id",
+                        }
                     }
                 }
-            }
+            )
         }
 
         # Mock ConfigurationManager
         mock_config_manager = MagicMock(spec=ConfigurationManager)
         amazon_handler = PatternHandler(mock_config_manager)
 
-        amazon_handler.selected_users = mock_selected_users
-
         mock_message = AsyncMock()
         mock_message.text = "Here is a product: https://www.amazon.com/dp/B08N5WRWNW"
         mock_message.message_id = 2
@@ -108,11 +113,13 @@ class TestHandleAmazonLinks(unittest.IsolatedAsyncioTestCase):
         }
 
         result = await amazon_handler.handle_links(context)
+        await amazon_handler.apply_edits(context)
 
         mock_expand.assert_not_called()
         mock_process.assert_called_with(
             mock_message,
             "Here is a product: https://www.amazon.com/dp/B08N5WRWNW?tag=com_affiliate_id",
+            None,
         )
         self.assertTrue(result)
 
@@ -120,17 +127,15 @@ class TestHandleAmazonLinks(unittest.IsolatedAsyncioTestCase):
     async def test_amazon_link_with_affiliate(self, mock_process: AsyncMock) -> None:
         """Test if Amazon links with an existing affiliate ID are modified to use ours."""
         mock_selected_users = {
-            "amazon.com": {
-                "amazon": {"advertisers": {"amazon.com": "our_affiliate_id"}}
-            }
+            "amazon.com": build_user_config(
+                {"amazon": {"advertisers": {"amazon.com": "our_affiliate_id"}}}
+            )
         }
 
         # Mock ConfigurationManager
         mock_config_manager = MagicMock(spec=ConfigurationManager)
         amazon_handler = PatternHandler(mock_config_manager)
 
-        amazon_handler.selected_users = mock_selected_users
-
         mock_message = AsyncMock()
         mock_message.text = "Here is a product: https://www.amazon.com/dp/B08N5WRWNW?tag=another_affiliate"
         mock_message.message_id = 3
@@ -143,10 +148,12 @@ class TestHandleAmazonLinks(unittest.IsolatedAsyncioTestCase):
         }
 
         result = await amazon_handler.handle_links(context)
+        await amazon_handler.apply_edits(context)
 
         mock_process.assert_called_with(
             mock_message,
             "Here is a product: https://www.amazon.com/dp/B08N5WRWNW?tag=our_affiliate_id",
+            None,
         )
         self.assertTrue(result)
 
@@ -156,15 +163,15 @@ class TestHandleAmazonLinks(unittest.IsolatedAsyncioTestCase):
     ) -> None:
         """Test explicit case where a shortened Amazon link is expanded and the correct affiliate ID is added."""
         mock_selected_users = {
-            "amazon.es": {"amazon": {"advertisers": {"amazon.es": "our_affiliate_id"}}}
+            "amazon.es": build_user_config(
+                {"amazon": {"advertisers": {"amazon.es": "our_affiliate_id"}}}
+            )
         }
 
         # Mock ConfigurationManager
         mock_config_manager = MagicMock(spec=ConfigurationManager)
         amazon_handler = PatternHandler(mock_config_manager)
 
-        amazon_handler.selected_users = mock_selected_users
-
         mock_message = AsyncMock()
         mock_message.text = "Check this out: https://www.amazon.es/dp/B01M9ATDY7?ref=cm_sw_r_apan_dp_ZYAS38F4N8NR5FHPH886&ref_=cm_sw_r_apan_dp_ZYAS38F4N8NR5FHPH886&social_share=cm_sw_r_apan_dp_ZYAS38F4N8NR5FHPH886&starsLeft=1&skipTwisterOG=1"
         mock_message.message_id = 1
@@ -177,6 +184,7 @@ class TestHandleAmazonLinks(unittest.IsolatedAsyncioTestCase):
         }
 
         result = await amazon_handler.handle_links(context)
+        await amazon_handler.apply_edits(context)
 
         actual_call_args = mock_process.call_args[0][1]
         expected_pattern = r"Check this out: https://www\.amazon\.es(?:/[\w\-]*)?/dp/B01M9ATDY7\?tag=our_affiliate_id"
@@ -186,6 +194,39 @@ class TestHandleAmazonLinks(unittest.IsolatedAsyncioTestCase):
         )
         self.assertTrue(result)
 
+    @patch("handlers.base_handler.parse_message")
+    @patch("handlers.base_handler.BaseHandler._process_message")
+    async def test_parsed_message_reused(
+        self, mock_process: AsyncMock, mock_parse: MagicMock
+    ) -> None:
+        """Test: The message parsed while preparing it is reused instead of parsing it again."""
+        mock_selected_users = {
+            "amazon.com": build_user_config(
+                {"amazon": {"advertisers": {"amazon.com": "our_affiliate_id"}}}
+            )
+        }
+        amazon_handler = PatternHandler(MagicMock(spec=ConfigurationManager))
+
+        mock_message = AsyncMock()
+        mock_message.text = "Here is a product: https://www.amazon.com/dp/B08N5WRWNW"
+        context = {
+            "message": mock_message,
+            "modified_message": mock_message.text,
+            "parsed_message": parse_message(mock_message.text),
+            "selected_users": mock_selected_users,
+        }
+
+        result = await amazon_handler.handle_links(context)
+        await amazon_handler.apply_edits(context)
+
+        mock_parse.assert_not_called()
+        mock_process.assert_called_with(
+            mock_message,
+            "Here is a product: https://www.amazon.com/dp/B08N5WRWNW?tag=our_affiliate_id",
+            None,
+        )
+        self.assertTrue(result)
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -3,7 +3,7 @@
 import unittest
 from unittest.mock import AsyncMock, MagicMock, patch
 
-from config import ConfigurationManager
+from config import ConfigurationManager, build_user_config
 from handlers.pattern_handler import PatternHandler
 
 
@@ -23,12 +23,14 @@ class TestHandleAwinLinks(unittest.IsolatedAsyncioTestCase):
         mock_message.from_user.username = "testuser1"
 
         mock_selected_users = {
-            "pccomponentes.com": {
-                "awin": {
-                    "publisher_id": None,
-                    "advertisers": {"pccomponentes.com": "20982"},
+            "pccomponentes.com": build_user_config(
+                {
+                    "awin": {
+                        "publisher_id": None,
+                        "advertisers": {"pccomponentes.com": "20982"},
+                    }
                 }
-            }
+            )
         }
         context = {
             "message": mock_message,
@@ -36,6 +38,7 @@ class TestHandleAwinLinks(unittest.IsolatedAsyncioTestCase):
             "selected_users": mock_selected_users,
         }
         result = await self.handler.handle_links(context)
+        await self.handler.apply_edits(context)
 
         mock_message.chat.send_message.assert_not_called()
         self.assertFalse(result)
@@ -48,12 +51,14 @@ class TestHandleAwinLinks(unittest.IsolatedAsyncioTestCase):
         mock_message.from_user.username = "testuser2"
 
         mock_selected_users = {
-            "pccomponentes.com": {
-                "awin": {
-                    "publisher_id": "my_awin_id",
-                    "advertisers": {},
+            "pccomponentes.com": build_user_config(
+                {
+                    "awin": {
+                        "publisher_id": "my_awin_id",
+                        "advertisers": {},
+                    }
                 }
-            }
+            )
         }
         context = {
             "message": mock_message,
@@ -61,6 +66,7 @@ class TestHandleAwinLinks(unittest.IsolatedAsyncioTestCase):
             "selected_users": mock_selected_users,
         }
         result = await self.handler.handle_links(context)
+        await self.handler.apply_edits(context)
         self.assertFalse(result)
 
     @patch("handlers.base_handler.BaseHandler._process_message")
@@ -77,12 +83,14 @@ class TestHandleAwinLinks(unittest.IsolatedAsyncioTestCase):
         mock_message.reply_to_message.message_id = 10
 
         mock_selected_users = {
-            "giftmio.com": {
-                "awin": {
-                    "publisher_id": "my_awin_id",
-                    "advertisers": {"giftmio.com": "20982"},
+            "giftmio.com": build_user_config(
+                {
+                    "awin": {
+                        "publisher_id": "my_awin_id",
+                        "advertisers": {"giftmio.com": "20982"},
+                    }
                 }
-            }
+            )
         }
         context = {
             "message": mock_message,
@@ -90,10 +98,49 @@ class TestHandleAwinLinks(unittest.IsolatedAsyncioTestCase):
             "selected_users": mock_selected_users,
         }
         result = await self.handler.handle_links(context)
+        await self.handler.apply_edits(context)
 
         expected_message = "Check this out: https://www.awin1.com/cread.php?awinmid=20982&awinaffid=my_awin_id&ued=https://www.giftmio.com/some-product I hope you like it"
 
-        mock_process.assert_called_with(mock_message, expected_message)
+        mock_process.assert_called_with(mock_message, expected_message, None)
+        self.assertTrue(result)
+
+    @patch("handlers.base_handler.BaseHandler._process_message")
+    async def test_links_of_several_platforms_sent_once(
+        self, mock_process: AsyncMock
+    ) -> None:
+        """Test: Amazon and Awin links in the same message are rewritten in a single message."""
+        mock_message = AsyncMock()
+        mock_message.text = (
+            "Amazon: https://www.amazon.es/dp/B01 and https://www.giftmio.com/p"
+        )
+
+        mock_selected_users = {
+            "amazon.es": build_user_config(
+                {"amazon": {"advertisers": {"amazon.es": "es-21"}}}
+            ),
+            "giftmio.com": build_user_config(
+                {
+                    "awin": {
+                        "publisher_id": "my_awin_id",
+                        "advertisers": {"giftmio.com": "20982"},
+                    }
+                }
+            ),
+        }
+        context = {
+            "message": mock_message,
+            "modified_message": mock_message.text,
+            "selected_users": mock_selected_users,
+        }
+        result = await self.handler.handle_links(context)
+        await self.handler.apply_edits(context)
+
+        mock_process.assert_called_once_with(
+            mock_message,
+            "Amazon: https://www.amazon.es/dp/B01?tag=es-21 and https://www.awin1.com/cread.php?awinmid=20982&awinaffid=my_awin_id&ued=https://www.giftmio.com/p",
+            None,
+        )
         self.assertTrue(result)
 
     @patch("handlers.base_handler.BaseHandler._process_message")
@@ -105,12 +152,14 @@ class TestHandleAwinLinks(unittest.IsolatedAsyncioTestCase):
         mock_message.from_user.username = "testuser3"
 
         mock_selected_users = {
-            "giftmio.com": {
-                "awin": {
-                    "publisher_id": "my_awin_id",
-                    "advertisers": {"giftmio.com": "20982"},
+            "giftmio.com": build_user_config(
+                {
+                    "awin": {
+                        "publisher_id": "my_awin_id",
+                        "advertisers": {"giftmio.com": "20982"},
+                    }
                 }
-            }
+            )
         }
         context = {
             "message": mock_message,
@@ -118,10 +167,11 @@ class TestHandleAwinLinks(unittest.IsolatedAsyncioTestCase):
             "selected_users": mock_selected_users,
         }
         result = await self.handler.handle_links(context)
+        await self.handler.apply_edits(context)
 
         expected_message = "Here is a product: https://www.awin1.com/cread.php?awinmid=20982&awinaffid=my_awin_id&ued=https://www.giftmio.com/some-product I hope you like it"
 
-        mock_process.assert_called_with(mock_message, expected_message)
+        mock_process.assert_called_with(mock_message, expected_message, None)
         self.assertTrue(result)
 
     async def test_awin_affiliate_link_not_in_list(self) -> None:
@@ -132,12 +182,14 @@ class TestHandleAwinLinks(unittest.IsolatedAsyncioTestCase):
         mock_message.from_user.username = "testuser4"
 
         mock_selected_users = {
-            "giftmio.com": {
-                "awin": {
-                    "publisher_id": "my_awin_id",
-                    "advertisers": {"giftmio.com": "20982"},
+            "giftmio.com": build_user_config(
+                {
+                    "awin": {
+                        "publisher_id": "my_awin_id",
+                        "advertisers": {"giftmio.com": "20982"},
+                    }
                 }
-            }
+            )
         }
         context = {
             "message": mock_message,
@@ -145,6 +197,7 @@ class TestHandleAwinLinks(unittest.IsolatedAsyncioTestCase):
             "selected_users": mock_selected_users,
         }
         result = await self.handler.handle_links(context)
+        await self.handler.apply_edits(context)
 
         mock_message.chat.send_message.assert_not_called()
         self.assertFalse(result)
@@ -161,15 +214,17 @@ class TestHandleAwinLinks(unittest.IsolatedAsyncioTestCase):
         mock_message.reply_to_message = None
 
         mock_selected_users = {
-            "aliexpress.com": {
-                "awin": {
-                    "publisher_id": "my_awin_id",
-                    "advertisers": {"aliexpress.com": "11640"},
-                },
-                "aliexpress": {
-                    "discount_codes": None,
-                },
-            }
+            "aliexpress.com": build_user_config(
+                {
+                    "awin": {
+                        "publisher_id": "my_awin_id",
+                        "advertisers": {"aliexpress.com": "11640"},
+                    },
+                    "aliexpress": {
+                        "discount_codes": None,
+                    },
+                }
+            )
         }
         context = {
             "message": mock_message,
@@ -177,10 +232,11 @@ class TestHandleAwinLinks(unittest.IsolatedAsyncioTestCase):
             "selected_users": mock_selected_users,
         }
         result = await self.handler.handle_links(context)
+        await self.handler.apply_edits(context)
 
         expected_message = "Check this out: https://www.awin1.com/cread.php?awinmid=11640&awinaffid=my_awin_id&ued=https://www.aliexpress.com/item/1005002958205071.html I hope you like it"
 
-        mock_process.assert_called_with(mock_message, expected_message)
+        mock_process.assert_called_with(mock_message, expected_message, None)
         self.assertTrue(result)
 
     @patch("handlers.base_handler.BaseHandler._process_message")
@@ -195,15 +251,17 @@ class TestHandleAwinLinks(unittest.IsolatedAsyncioTestCase):
         mock_message.reply_to_message = None
 
         mock_selected_users = {
-            "aliexpress.com": {
-                "awin": {
-                    "publisher_id": "my_awin_id",
-                    "advertisers": {"aliexpress.com": "11640"},
-                },
-                "aliexpress": {
-                    "discount_codes": "Here is your discount code!",
-                },
-            }
+            "aliexpress.com": build_user_config(
+                {
+                    "awin": {
+                        "publisher_id": "my_awin_id",
+                        "advertisers": {"aliexpress.com": "11640"},
+                    },
+                    "aliexpress": {
+                        "discount_codes": "Here is your discount code!",
+                    },
+                }
+            )
         }
         context = {
             "message": mock_message,
@@ -211,13 +269,14 @@ class TestHandleAwinLinks(unittest.IsolatedAsyncioTestCase):
             "selected_users": mock_selected_users,
         }
         result = await self.handler.handle_links(context)
+        await self.handler.apply_edits(context)
 
         expected_message = (
             "Here is a product: https://www.awin1.com/cread.php?awinmid=11640&awinaffid=my_awin_id&ued=https://www.aliexpress.com/item/1005002958205071.html I hope you like it\n\n"
             "Here is your discount code!"
         )
 
-        mock_process.assert_called_with(mock_message, expected_message)
+        mock_process.assert_called_with(mock_message, expected_message, None)
         self.assertTrue(result)
 
     async def test_awin_aliexpress_link_no_awin_config(self) -> None:
@@ -228,15 +287,17 @@ class TestHandleAwinLinks(unittest.IsolatedAsyncioTestCase):
         mock_message.from_user.username = "testuser2"
 
         mock_selected_users = {
-            "aliexpress.com": {
-                "awin": {
-                    "publisher_id": "my_awin_id",
-                    "advertisers": {"pccomponentes.com": "20982"},
-                },
-                "aliexpress": {
-                    "discount_codes": "Here is your discount code!",
-                },
-            }
+            "aliexpress.com": build_user_config(
+                {
+                    "awin": {
+                        "publisher_id": "my_awin_id",
+                        "advertisers": {"pccomponentes.com": "20982"},
+                    },
+                    "aliexpress": {
+                        "discount_codes": "Here is your discount code!",
+                    },
+                }
+            )
         }
         context = {
             "message": mock_message,
@@ -244,6 +305,7 @@ class TestHandleAwinLinks(unittest.IsolatedAsyncioTestCase):
             "selected_users": mock_selected_users,
         }
         result = await self.handler.handle_links(context)
+        await self.handler.apply_edits(context)
 
         mock_message.chat.send_message.assert_not_called()
         self.assertFalse(result)
@@ -262,15 +324,17 @@ class TestHandleAwinLinks(unittest.IsolatedAsyncioTestCase):
         expected_message = "Here is a product: https://www.awin1.com/cread.php?awinmid=20982&awinaffid=my_awin_id&ued=https://www.pccomponentes.com/item/1005002958205071.html I hope you like it"
 
         mock_selected_users = {
-            "pccomponentes.com": {
-                "awin": {
-                    "publisher_id": "my_awin_id",
-                    "advertisers": {"pccomponentes.com": "20982"},
-                },
-                "aliexpress": {
-                    "discount_codes": "Here is your discount code!",
-                },
-            }
+            "pccomponentes.com": build_user_config(
+                {
+                    "awin": {
+                        "publisher_id": "my_awin_id",
+                        "advertisers": {"pccomponentes.com": "20982"},
+                    },
+                    "aliexpress": {
+                        "discount_codes": "Here is your discount code!",
+                    },
+                }
+            )
         }
         context = {
             "message": mock_message,
@@ -278,8 +342,9 @@ class TestHandleAwinLinks(unittest.IsolatedAsyncioTestCase):
             "selected_users": mock_selected_users,
         }
         result = await self.handler.handle_links(context)
+        await self.handler.apply_edits(context)
 
-        mock_process.assert_called_with(mock_message, expected_message)
+        mock_process.assert_called_with(mock_message, expected_message, None)
         self.assertTrue(result)
 
 
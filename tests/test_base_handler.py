@@ -4,7 +4,7 @@
 import unittest
 from unittest.mock import AsyncMock, Mock
 
-from handlers.base_handler import PATTERN_AFFILIATE_URL_QUERY, BaseHandler
+from handlers.base_handler import BaseHandler
 
 
 class TestHandler(BaseHandler):
@@ -263,6 +263,25 @@ class TestProcessMessage(unittest.IsolatedAsyncioTestCase):
             text=expected_message, reply_to_message_id=mock_message.message_id
         )
 
+    async def test_send_message_with_update_config(self) -> None:
+        """Test the configuration of the update is used instead of the current one."""
+        mock_message = AsyncMock()
+        mock_message.from_user.username = "john_doe"
+        mock_message.message_id = 100
+        config = Mock(
+            delete_messages=False,
+            msg_reply_provided_by_user="Shared by",
+            msg_affiliate_link_modified="Link changed",
+        )
+
+        await self.handler._process_message(mock_message, "New text", config)
+
+        mock_message.delete.assert_not_called()
+        mock_message.chat.send_message.assert_called_once_with(
+            text="Shared by @john_doe:\n\nNew text\n\nLink changed",
+            reply_to_message_id=mock_message.message_id,
+        )
+
     async def test_send_message_without_username(self) -> None:
         """Test when the user has no username, use the first name instead."""
         mock_message = AsyncMock()
@@ -290,106 +309,6 @@ class TestProcessMessage(unittest.IsolatedAsyncioTestCase):
         )
 
 
-class TestBuildAffiliateUrlPattern(unittest.TestCase):
-    """Tests for the method _build_affiliate_url_pattern."""
-
-    def setUp(self) -> None:
-        """Set up the ConfigurationManager mock and a TestHandler instance for each test."""
-        self.config_manager = Mock()
-        self.base_handler = TestHandler(self.config_manager)
-
-    def test_admitad_url_pattern(self) -> None:
-        """Test: Verify that admitad_url_pattern is correctly generated from multiple users' domains."""
-        self.base_handler.selected_users = {
-            "example.com": {
-                "admitad": {
-                    "advertisers": {
-                        "example1.com": "12345",
-                        "example2.com": "67890",
-                    }
-                }
-            }
-        }
-        # Generate Admitad URL pattern
-        admitad_url_pattern = self.base_handler._build_affiliate_url_pattern("admitad")
-
-        # The expected regex should match example1.com and example2.com
-        expected_pattern1 = (
-            r"(https?://(?:[\w\-]+\.)?(example1\.com|example2\.com)"
-            + PATTERN_AFFILIATE_URL_QUERY
-            + ")"
-        )
-        expected_pattern2 = (
-            r"(https?://(?:[\w\-]+\.)?(example2\.com|example1\.com)"
-            + PATTERN_AFFILIATE_URL_QUERY
-            + ")"
-        )
-        self.assertTrue(
-            admitad_url_pattern in (expected_pattern1, expected_pattern2),
-            f"Pattern '{admitad_url_pattern}' does not match either of the expected patterns",
-        )
-
-    def test_admitad_no_domains(self) -> None:
-        """Test: Verify that None is returned when no Admitad advertisers exist across users."""
-        self.base_handler.selected_users = {
-            "example3.com": {
-                "admitad": {"advertisers": {}},
-                "awin": {"advertisers": {"example3.com": "affiliate-id-3"}},
-            }
-        }
-
-        admitad_url_pattern = self.base_handler._build_affiliate_url_pattern("admitad")
-        self.assertIsNone(admitad_url_pattern)
-
-    def test_awin_url_pattern(self) -> None:
-        """Test: Verify that awin_url_pattern is correctly generated from multiple users' domains."""
-        self.base_handler.selected_users = {
-            "example3.com": {
-                "admitad": {
-                    "advertisers": {
-                        "example1.com": "affiliate-id-1",
-                        "example2.com": "affiliate-id-2",
-                    }
-                },
-                "awin": {
-                    "advertisers": {
-                        "example3.com": "affiliate-id-3",
-                        "example4.com": "affiliate-id-4",
-                    }
-                },
-            }
-        }
-
-        awin_url_pattern = self.base_handler._build_affiliate_url_pattern("awin")
-
-        # The expected regex should match example3.com and example4.com
-        expected_pattern1 = (
-            r"(https?://(?:[\w\-]+\.)?(example3\.com|example4\.com)"
-            + PATTERN_AFFILIATE_URL_QUERY
-            + ")"
-        )
-        expected_pattern2 = (
-            r"(https?://(?:[\w\-]+\.)?(example4\.com|example3\.com)"
-            + PATTERN_AFFILIATE_URL_QUERY
-            + ")"
-        )
-        self.assertTrue(
-            awin_url_pattern in (expected_pattern1, expected_pattern2),
-            f"Pattern '{awin_url_pattern}' does not match either of the expected patterns",
-        )
-
-    def test_no_users_in_configuration(self) -> None:
-        """Test: Verify that None is returned when there are no users in the configuration."""
-        self.base_handler.selected_users = {
-            "amazon.es": {"amazon": {"affiliate_id": "affiliate-21"}}
-        }
-
-        admitad_url_pattern = self.base_handler._build_affiliate_url_pattern(
-            "admitad_advertisers"
-        )
-        self.assertIsNone(admitad_url_pattern)
-
-
 if __name__ == "__main__":
     unittest.main()
 
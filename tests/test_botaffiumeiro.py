@@ -1,49 +1,85 @@
 """Tests for the main botaffiumeiro functions."""
+# ruff: noqa: SLF001
 
 from __future__ import annotations
 
+import asyncio
 from datetime import datetime, timezone
+import secrets
 import unittest
-from unittest.mock import ANY, AsyncMock, Mock, patch
+from unittest.mock import AsyncMock, Mock, patch
 
-from telegram import Chat, Message, Update, User
+from config import (
+    ConfigSnapshot,
+    ConfigurationManager,
+    build_domain_users,
+    build_user_config,
+)
+import httpx
+from links.advertisers import AdvertiserIndex
+from links.expander import URLExpander
+from links.parser import parse_message
+from telegram import Chat, Message, MessageEntity, Update, User
 from telegram.ext import CallbackContext
 
 from botaffiumeiro import (
+    LINK_MESSAGES,
+    detect_domains,
+    detect_platforms,
+    expand_message_urls,
     expand_shortened_url,
     extract_domains_from_message,
-    extract_embedded_url,
     is_user_excluded,
     modify_link,
     prepare_message,
+    process_link_handlers,
     select_user_for_domain,
 )
 
 
+def redirect_transport(
+    redirects: dict[str, str], requested: list[str] | None = None
+) -> httpx.MockTransport:
+    """Build a transport answering every URL in redirects with a redirect to its target."""
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        if requested is not None:
+            requested.append(str(request.url))
+        target = redirects.get(str(request.url))
+        if target:
+            return httpx.Response(301, headers={"Location": target})
+        return httpx.Response(200)
+
+    return httpx.MockTransport(handler)
+
+
+def build_expander(transport: httpx.MockTransport) -> URLExpander:
+    """Build a URLExpander answering through the given mock transport."""
+    return URLExpander(ConfigurationManager(), transport=transport)
+
+
 class TestIsUserExcluded(unittest.TestCase):
     """Tests for is_user_excluded function."""
 
-    @patch("botaffiumeiro.config_manager", autospec=True)
-    def test_is_user_excluded_in_list(self, mock_config_manager: AsyncMock) -> None:
+    def test_is_user_excluded_in_list(self) -> None:
         """Test is_user_excluded when a user is in the excluded list."""
-        mock_config_manager.excluded_users = [12345, "excluded_user"]
+        config = Mock(excluded_users=(12345, "excluded_user"))
 
         user = User(
             id=12345, is_bot=False, username="fake_user_01", first_name="TestUser"
         )
-        result = is_user_excluded(user)
+        result = is_user_excluded(user, config)
 
         self.assertTrue(result)
 
-    @patch("botaffiumeiro.config_manager", autospec=True)
-    def test_is_user_excluded_not_in_list(self, mock_config_manager: AsyncMock) -> None:
+    def test_is_user_excluded_not_in_list(self) -> None:
         """Test is_user_excluded when a user isn't in the excluded list."""
-        mock_config_manager.excluded_users = [12345, "excluded_user"]
+        config = Mock(excluded_users=(12345, "excluded_user"))
 
         user = User(
             id=67890, is_bot=False, username="non_excluded_user", first_name="TestUser"
         )
-        result = is_user_excluded(user)
+        result = is_user_excluded(user, config)
 
         self.assertFalse(result)
 
@@ -105,7 +141,8 @@ class TestModifyLink(unittest.IsolatedAsyncioTestCase):
                 date=datetime.now(timezone.utc),
                 from_user=User(id=12345, is_bot=False, first_name="TestUser"),
                 chat=Chat(id=1, type="group"),
-                text="Test message",
+                text="Test message https://amzn.to/abc123",
+                entities=[MessageEntity(type="url", offset=13, length=22)],
             ),
         )
 
@@ -130,7 +167,8 @@ class TestModifyLink(unittest.IsolatedAsyncioTestCase):
                 date=datetime.now(timezone.utc),
                 from_user=User(id=67890, is_bot=False, first_name="TestUser"),
                 chat=Chat(id=1, type="group"),
-                text="Test message",
+                text="Test message https://amzn.to/abc123",
+                entities=[MessageEntity(type="url", offset=13, length=22)],
             ),
         )
 
@@ -140,6 +178,58 @@ class TestModifyLink(unittest.IsolatedAsyncioTestCase):
         mock_is_user_excluded.assert_called_once()
         mock_process_link_handlers.assert_called_once()
 
+    @patch("botaffiumeiro.is_user_excluded", return_value=False)
+    @patch("botaffiumeiro.process_link_handlers", new_callable=AsyncMock)
+    async def test_modify_link_message_without_links(
+        self,
+        mock_process_link_handlers: AsyncMock,
+        mock_is_user_excluded: AsyncMock,
+    ) -> None:
+        """Test modify_link when the message has no link entities."""
+        update = Update(
+            update_id=1,
+            message=Message(
+                message_id=1,
+                date=datetime.now(timezone.utc),
+                from_user=User(id=67890, is_bot=False, first_name="TestUser"),
+                chat=Chat(id=1, type="group"),
+                text="Test message with bold text",
+                entities=[MessageEntity(type="bold", offset=18, length=4)],
+            ),
+        )
+
+        mock_context = CallbackContext(application=None)
+        await modify_link(update, mock_context)
+
+        mock_is_user_excluded.assert_not_called()
+        mock_process_link_handlers.assert_not_called()
+
+    @patch("botaffiumeiro.is_user_excluded", return_value=False)
+    @patch("botaffiumeiro.process_link_handlers", new_callable=AsyncMock)
+    async def test_modify_link_message_without_handled_domains(
+        self,
+        mock_process_link_handlers: AsyncMock,
+        mock_is_user_excluded: AsyncMock,
+    ) -> None:
+        """Test modify_link when the links of the message are not of any store, platform or shortener."""
+        update = Update(
+            update_id=1,
+            message=Message(
+                message_id=1,
+                date=datetime.now(timezone.utc),
+                from_user=User(id=67890, is_bot=False, first_name="TestUser"),
+                chat=Chat(id=1, type="group"),
+                text="Read https://example.org/news",
+                entities=[MessageEntity(type="url", offset=5, length=24)],
+            ),
+        )
+
+        mock_context = CallbackContext(application=None)
+        await modify_link(update, mock_context)
+
+        mock_is_user_excluded.assert_not_called()
+        mock_process_link_handlers.assert_not_called()
+
     @patch("botaffiumeiro.is_user_excluded")
     @patch("botaffiumeiro.process_link_handlers", new_callable=AsyncMock)
     async def test_modify_link_without_user(
@@ -165,40 +255,83 @@ class TestModifyLink(unittest.IsolatedAsyncioTestCase):
         mock_process_link_handlers.assert_not_called()
 
 
-class TestExtractDomainsFromMessage(unittest.TestCase):
+class TestLinkMessagesFilter(unittest.TestCase):
+    """Tests for the filter of the updates handled by modify_link."""
+
+    def _update(self, chat_type: str, entities: list[MessageEntity]) -> Update:
+        """Build an update with a message of a chat type and entities."""
+        return Update(
+            update_id=1,
+            message=Message(
+                message_id=1,
+                date=datetime.now(timezone.utc),
+                chat=Chat(id=1, type=chat_type),
+                text="Test message https://amzn.to/abc123",
+                entities=entities,
+            ),
+        )
+
+    def test_group_messages_with_links(self) -> None:
+        """Test: Only group messages with url or text_link entities are handled."""
+        url = MessageEntity(type="url", offset=13, length=22)
+        text_link = MessageEntity(
+            type="text_link", offset=0, length=4, url="https://amzn.to/abc123"
+        )
+        bold = MessageEntity(type="bold", offset=0, length=4)
+
+        self.assertTrue(LINK_MESSAGES.check_update(self._update("group", [url])))
+        self.assertTrue(
+            LINK_MESSAGES.check_update(self._update("supergroup", [text_link]))
+        )
+        self.assertFalse(LINK_MESSAGES.check_update(self._update("group", [bold])))
+        self.assertFalse(LINK_MESSAGES.check_update(self._update("private", [url])))
+
+
+class TestExtractDomainsFromMessage(unittest.IsolatedAsyncioTestCase):
     """Tests for extract_domains_from_message function."""
 
-    def test_direct_domain_extraction(self) -> None:
+    def setUp(self) -> None:
+        """Answer the expansion requests through a mock transport, never the network."""
+        self.url_expander = build_expander(redirect_transport({}))
+        patcher = patch("botaffiumeiro.url_expander", self.url_expander)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    async def asyncTearDown(self) -> None:
+        """Close the client of the patched expander."""
+        await self.url_expander.aclose()
+
+    async def test_direct_domain_extraction(self) -> None:
         """Test: Extract domains directly from the message without embedded URLs."""
         message_text = "Check out this link: https://www.amazon.com/someproduct and this: https://aliexpress.com/item/12345"
-        domains, modified_message = extract_domains_from_message(message_text)
+        domains, modified_message = await extract_domains_from_message(message_text)
 
         self.assertIn("amazon.com", domains)
         self.assertIn("aliexpress.com", domains)
         self.assertEqual(len(domains), 2)  # Should find 2 unique domains
 
-    def test_embedded_url_excludes_main_domain(self) -> None:
+    async def test_embedded_url_excludes_main_domain(self) -> None:
         """Test: If there are embedded URLs, the main domain should be excluded."""
         message_text = (
             "Visit https://awin1.com/cread.php?ulp=https://aliexpress.com/item/12345"
         )
 
-        domains, modified_message = extract_domains_from_message(message_text)
+        domains, modified_message = await extract_domains_from_message(message_text)
 
         self.assertIn(
             "aliexpress.com", domains
         )  # Only the embedded domain should be included
         self.assertNotIn("awin1.com", domains)  # The main domain should be excluded
 
-    def test_no_embedded_urls(self) -> None:
+    async def test_no_embedded_urls(self) -> None:
         """Test: No embedded URLs, only direct domain extraction."""
         message_text = "Check out https://amazon.com/product123"
-        domains, modified_message = extract_domains_from_message(message_text)
+        domains, modified_message = await extract_domains_from_message(message_text)
 
         self.assertIn("amazon.com", domains)  # Should extract only amazon.com
         self.assertEqual(len(domains), 1)  # Only one domain should be found
 
-    def test_multiple_direct_and_embedded_urls(self) -> None:
+    async def test_multiple_direct_and_embedded_urls(self) -> None:
         """Test: Extract multiple direct and embedded URLs."""
         message_text = (
             "Check this product on Amazon: https://www.amazon.com/product?ref=123 "
@@ -207,25 +340,25 @@ class TestExtractDomainsFromMessage(unittest.TestCase):
         )
 
         # Here, we mock the embedded URL extraction to return amazon.com from awin's ulp parameter
-        domains, modified_message = extract_domains_from_message(message_text)
+        domains, modified_message = await extract_domains_from_message(message_text)
 
         self.assertIn("amazon.com", domains)
         self.assertIn("aliexpress.com", domains)
         self.assertEqual(len(domains), 2)  # Should find 3 unique domains
 
-    def test_no_matching_patterns(self) -> None:
+    async def test_no_matching_patterns(self) -> None:
         """Test: No matching domains or patterns in the message."""
         message_text = "There are no valid links in this message."
-        domains, modified_message = extract_domains_from_message(message_text)
+        domains, modified_message = await extract_domains_from_message(message_text)
 
         self.assertEqual(
             domains, set()
         )  # Should return an empty set since no domains are matched
 
-    def test_invalid_urls(self) -> None:
+    async def test_invalid_urls(self) -> None:
         """Test: Handle invalid URLs that should not be extracted."""
         message_text = "Visit this: ftp://invalid-url.com and this invalid scheme: invalid://nope.com"
-        domains, modified_message = extract_domains_from_message(message_text)
+        domains, modified_message = await extract_domains_from_message(message_text)
 
         self.assertEqual(
             domains, set()
@@ -233,16 +366,17 @@ class TestExtractDomainsFromMessage(unittest.TestCase):
 
     @patch(
         "botaffiumeiro.expand_shortened_url",
+        new_callable=AsyncMock,
         return_value="https://www.amazon.com/dp/product123",
     )
-    def test_amazon_shortened_url(self, mock_expand: AsyncMock) -> None:
+    async def test_amazon_shortened_url(self, mock_expand: AsyncMock) -> None:
         """Test: Handle shortened Amazon URL (amzn.to) and expand it."""
         message_text = "Check out this product: https://amzn.to/abc123"
 
         # Simulate the expansion of the shortened URL
         Mock(return_value="https://www.amazon.com/dp/product123")
 
-        domains, modified_message = extract_domains_from_message(message_text)
+        domains, modified_message = await extract_domains_from_message(message_text)
         mock_expand.assert_called_once_with("https://amzn.to/abc123")
 
         self.assertIn(
@@ -258,15 +392,16 @@ class TestExtractDomainsFromMessage(unittest.TestCase):
 
     @patch(
         "botaffiumeiro.expand_shortened_url",
+        new_callable=AsyncMock,
         return_value="https://www.aliexpress.com/item/1005001234567890.html",
     )
-    def test_aliexpress_shortened_url(self, mock_expand: AsyncMock) -> None:
+    async def test_aliexpress_shortened_url(self, mock_expand: AsyncMock) -> None:
         """Test: Handle shortened AliExpress URL (s.click.aliexpress.com) and expand it."""
         message_text = (
             "Check out this deal: https://s.click.aliexpress.com/e/buyproduct"
         )
 
-        domains, modified_message = extract_domains_from_message(message_text)
+        domains, modified_message = await extract_domains_from_message(message_text)
         mock_expand.assert_called_once_with(
             "https://s.click.aliexpress.com/e/buyproduct"
         )
@@ -284,8 +419,8 @@ class TestExtractDomainsFromMessage(unittest.TestCase):
             "https://www.aliexpress.com/item/1005001234567890.html", modified_message
         )
 
-    @patch("botaffiumeiro.expand_shortened_url")
-    def test_mixed_full_and_shortened_urls(self, mock_expand: AsyncMock) -> None:
+    @patch("botaffiumeiro.expand_shortened_url", new_callable=AsyncMock)
+    async def test_mixed_full_and_shortened_urls(self, mock_expand: AsyncMock) -> None:
         """Test: Handle a mixture of full and shortened URLs for both platforms."""
         message_text = (
             "Check out this Amazon deal: https://www.amazon.com/dp/product123 "
@@ -301,7 +436,7 @@ class TestExtractDomainsFromMessage(unittest.TestCase):
         ]
 
         # Call the function that processes the message and expands shortened URLs
-        domains, modified_message = extract_domains_from_message(message_text)
+        domains, modified_message = await extract_domains_from_message(message_text)
 
         # Check that the expand_shortened_url function was called twice with correct URLs
         mock_expand.assert_any_call("https://www.amazon.com/dp/product123")
@@ -322,28 +457,26 @@ class TestExtractDomainsFromMessage(unittest.TestCase):
             "https://www.aliexpress.com/item/1005001234567890.html", modified_message
         )
 
-    def test_amazon_full_url_uk(self) -> None:
+    async def test_amazon_full_url_uk(self) -> None:
         """Test: Handle full Amazon URL with amazon.co.uk."""
         message_text = "Check out this product on Amazon UK: https://www.amazon.co.uk/dp/product123"
-        domains, modified_message = extract_domains_from_message(message_text)
+        domains, modified_message = await extract_domains_from_message(message_text)
 
         self.assertIn(
             "amazon.co.uk", domains
         )  # The amazon.co.uk domain should be extracted
         self.assertEqual(len(domains), 1)  # Should only find one domain
 
-    @patch("requests.get")
-    def test_expand_amazon_short_url_and_replace_in_message(
-        self, mock_get: AsyncMock
-    ) -> None:
+    async def test_expand_amazon_short_url_and_replace_in_message(self) -> None:
         """Test: Expands a shortened Amazon URL and replaces it in the message."""
-        mock_response = Mock()
-        mock_response.url = "https://www.amazon.com/dp/B08XYZ123"
-        mock_get.return_value = mock_response
+        transport = redirect_transport(
+            {"https://amzn.to/abc123": "https://www.amazon.com/dp/B08XYZ123"}
+        )
 
         message_text = "Check out this Amazon link: https://amzn.to/abc123"
 
-        domains, modified_message = extract_domains_from_message(message_text)
+        with patch("botaffiumeiro.url_expander", build_expander(transport)):
+            domains, modified_message = await extract_domains_from_message(message_text)
 
         self.assertIn("amazon.com", domains)
         self.assertEqual(
@@ -351,20 +484,18 @@ class TestExtractDomainsFromMessage(unittest.TestCase):
             "Check out this Amazon link: https://www.amazon.com/dp/B08XYZ123",
         )
 
-    @patch("requests.get")
-    def test_expand_multiple_short_urls_and_replace_in_message(
-        self, mock_get: AsyncMock
-    ) -> None:
+    async def test_expand_multiple_short_urls_and_replace_in_message(self) -> None:
         """Test: Expands multiple shortened URLs and replaces them in the message."""
-        mock_response_amazon = Mock()
-        mock_response_amazon.url = "https://www.amazon.com/dp/B08XYZ123"
-        mock_response_aliexpress = Mock()
-        mock_response_aliexpress.url = "https://www.aliexpress.com/item/12345.html"
-
-        mock_get.side_effect = [mock_response_amazon, mock_response_aliexpress]
+        transport = redirect_transport(
+            {
+                "https://amzn.to/abc123": "https://www.amazon.com/dp/B08XYZ123",
+                "https://s.click.aliexpress.com/e/xyz789": "https://www.aliexpress.com/item/12345.html",
+            }
+        )
 
         message_text = "Check out this Amazon link: https://amzn.to/abc123 and this AliExpress link: https://s.click.aliexpress.com/e/xyz789"
-        domains, modified_message = extract_domains_from_message(message_text)
+        with patch("botaffiumeiro.url_expander", build_expander(transport)):
+            domains, modified_message = await extract_domains_from_message(message_text)
 
         self.assertIn("amazon.com", domains)
         self.assertIn("aliexpress.com", domains)
@@ -373,43 +504,36 @@ class TestExtractDomainsFromMessage(unittest.TestCase):
             "Check out this Amazon link: https://www.amazon.com/dp/B08XYZ123 and this AliExpress link: https://www.aliexpress.com/item/12345.html",
         )
 
-    @patch("requests.get")
-    def test_extract_domains_with_short_urls(self, mock_get: AsyncMock) -> None:
+    async def test_extract_domains_with_short_urls(self) -> None:
         """Test: Extract domains after expanding shortened URLs."""
-        # Simula las respuestas de las cabeceras para las URLs cortas
-        mock_response_amazon = Mock()
-        mock_response_amazon.url = (
-            "https://www.amazon.com/dp/B08XYZ123"  # URL expandida de Amazon
-        )
-        mock_response_aliexpress = Mock()
-        mock_response_aliexpress.url = (
-            "https://www.aliexpress.com/item/12345.html"  # URL expandida de AliExpress
+        transport = redirect_transport(
+            {
+                "https://amzn.to/abc123": "https://www.amazon.com/dp/B08XYZ123",
+                "https://s.click.aliexpress.com/e/buyproduct": "https://www.aliexpress.com/item/12345.html",
+            }
         )
 
-        # Configura el mock para devolver las respuestas simuladas en secuencia
-        mock_get.side_effect = [mock_response_amazon, mock_response_aliexpress]
-
-        # Texto con URLs acortadas
+        # Text with shortened URLs
         message_text = "Check out this Amazon deal: https://amzn.to/abc123 and this AliExpress: https://s.click.aliexpress.com/e/buyproduct"
 
-        # Llama a la función a probar
-        domains, modified_message = extract_domains_from_message(message_text)
+        with patch("botaffiumeiro.url_expander", build_expander(transport)):
+            domains, modified_message = await extract_domains_from_message(message_text)
 
-        # Verifica que los dominios correctos fueron extraídos
-        self.assertIn("amazon.com", domains)  # Debería encontrar amazon.com
-        self.assertIn("aliexpress.com", domains)  # Debería encontrar aliexpress.com
+        # Check the right domains were extracted
+        self.assertIn("amazon.com", domains)
+        self.assertIn("aliexpress.com", domains)
 
-        # Verifica que las URLs acortadas hayan sido reemplazadas con las URLs expandidas
+        # Check the shortened URLs were replaced by the expanded ones
         self.assertIn("https://www.amazon.com/dp/B08XYZ123", modified_message)
         self.assertIn("https://www.aliexpress.com/item/12345.html", modified_message)
 
-        # Verifica que las URLs cortas ya no estén en el mensaje modificado
+        # Check the shortened URLs are no longer in the modified message
         self.assertNotIn("https://amzn.to/abc123", modified_message)
         self.assertNotIn(
             "https://s.click.aliexpress.com/e/buyproduct", modified_message
         )
 
-    def test_extract_domains_with_long_urls(self) -> None:
+    async def test_extract_domains_with_long_urls(self) -> None:
         """Test: Extract domains from long Amazon and AliExpress URLs."""
         # Text with long URLs already expanded
         message_text = (
@@ -418,7 +542,7 @@ class TestExtractDomainsFromMessage(unittest.TestCase):
         )
 
         # Call the function that processes the message
-        domains, modified_message = extract_domains_from_message(message_text)
+        domains, modified_message = await extract_domains_from_message(message_text)
 
         # Verify that the correct domains were extracted
         self.assertIn("amazon.com", domains)  # Should find amazon.com
@@ -434,80 +558,120 @@ class TestExtractDomainsFromMessage(unittest.TestCase):
         self.assertEqual(message_text, modified_message)
 
 
-class TestExtractEmbeddedUrl(unittest.TestCase):
-    """Tests for extract_embedded_url function."""
+class TestExpandMessageUrls(unittest.IsolatedAsyncioTestCase):
+    """Tests for expand_message_urls function."""
 
-    def test_no_embedded_urls(self) -> None:
-        """Test: No embedded URLs in the query parameters."""
-        query_params = {"param1": ["value1"], "param2": ["value2"]}
-        result = extract_embedded_url(query_params)
-        self.assertEqual(result, set())  # Should return an empty set
+    @patch("botaffiumeiro.config_manager", autospec=True)
+    async def test_urls_expanded_concurrently(
+        self, mock_config_manager: AsyncMock
+    ) -> None:
+        """Test: All the URLs of a message are expanded at the same time."""
+        mock_config_manager.expansion_message_deadline = 5
+        in_flight = 0
+        max_in_flight = 0
+
+        async def slow_expand(url: str) -> str:
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            in_flight -= 1
+            return f"{url}/expanded"
+
+        with patch("botaffiumeiro.expand_shortened_url", side_effect=slow_expand):
+            result = await expand_message_urls(
+                ["https://amzn.to/a", "https://amzn.to/b", "https://amzn.to/c"]
+            )
+
+        self.assertEqual(max_in_flight, 3)
+        self.assertEqual(result["https://amzn.to/b"], "https://amzn.to/b/expanded")
 
-    def test_single_embedded_url(self) -> None:
-        """Test: A single embedded URL inside the query parameters."""
-        query_params = {"param1": ["https://example.com/path?query=123"]}
-        result = extract_embedded_url(query_params)
-        self.assertIn("example.com", result)  # Should contain the domain 'example.com'
+    @patch("botaffiumeiro.config_manager", autospec=True)
+    async def test_urls_missing_deadline_are_not_expanded(
+        self, mock_config_manager: AsyncMock
+    ) -> None:
+        """Test: URLs not expanded before the message deadline keep their original form."""
+        mock_config_manager.expansion_message_deadline = 0.05
 
-    def test_multiple_embedded_urls(self) -> None:
-        """Test: Multiple embedded URLs in different query parameters."""
-        query_params = {
-            "param1": ["https://example.com/path"],
-            "param2": ["https://another.com/resource"],
-        }
-        result = extract_embedded_url(query_params)
-        self.assertIn("example.com", result)
-        self.assertIn("another.com", result)
-        self.assertEqual(len(result), 2)  # There should be two unique domains
-
-    def test_invalid_urls(self) -> None:
-        """Test: Invalid URLs in the query parameters should not be considered."""
-        query_params = {
-            "param1": ["ftp://invalid.com/file"],  # Not http/https
-            "param2": ["invalid://notvalid"],
-        }
-        result = extract_embedded_url(query_params)
-        self.assertEqual(result, set())  # Should return an empty set
-
-    def test_mixed_valid_and_invalid_urls(self) -> None:
-        """Test: A mix of valid and invalid URLs in the query parameters."""
-        query_params = {
-            "param1": ["https://valid.com/resource"],
-            "param2": ["ftp://invalid.com/file"],  # Invalid scheme
-            "param3": ["invalid://notvalid"],
-        }
-        result = extract_embedded_url(query_params)
-        self.assertIn("valid.com", result)  # Only valid.com should be included
-        self.assertEqual(len(result), 1)  # There should be only one valid domain
-
-    def test_multiple_values_for_single_param(self) -> None:
-        """Test: A single query parameter with multiple values (some valid URLs)."""
-        query_params = {
-            "param1": ["https://valid.com/resource", "https://another.com/path"]
-        }
-        result = extract_embedded_url(query_params)
-        self.assertIn("valid.com", result)
-        self.assertIn("another.com", result)
-        self.assertEqual(len(result), 2)  # Two valid domains should be extracted
+        async def expand(url: str) -> str:
+            if "slow" in url:
+                await asyncio.sleep(10)
+            return f"{url}/expanded"
+
+        with patch("botaffiumeiro.expand_shortened_url", side_effect=expand):
+            result = await expand_message_urls(
+                ["https://amzn.to/fast", "https://bit.ly/slow"]
+            )
+
+        self.assertEqual(
+            result,
+            {
+                "https://amzn.to/fast": "https://amzn.to/fast/expanded",
+                "https://bit.ly/slow": "https://bit.ly/slow",
+            },
+        )
+
+    @patch("botaffiumeiro.expand_shortened_url", new_callable=AsyncMock)
+    async def test_repeated_urls_expanded_once(self, mock_expand: AsyncMock) -> None:
+        """Test: A URL repeated in the message is only expanded once."""
+        mock_expand.return_value = "https://www.amazon.es/dp/B08N5WRWNW"
 
+        result = await expand_message_urls(["https://amzn.to/a", "https://amzn.to/a"])
 
-class TestPrepareMessage(unittest.TestCase):
+        mock_expand.assert_called_once_with("https://amzn.to/a")
+        self.assertEqual(len(result), 1)
+
+    async def test_no_urls(self) -> None:
+        """Test: A message without URLs expands nothing."""
+        self.assertEqual(await expand_message_urls([]), {})
+
+
+class TestPrepareMessage(unittest.IsolatedAsyncioTestCase):
     """Tests for prepare_message function."""
 
-    @patch("botaffiumeiro.extract_domains_from_message")
+    @patch("botaffiumeiro.expand_shortened_url", new_callable=AsyncMock)
+    async def test_prepare_message_with_link_entities(
+        self, mock_expand: AsyncMock
+    ) -> None:
+        """Test: URLs are taken from the entities, including hyperlinks hidden behind text."""
+        mock_expand.side_effect = lambda url: url
+        message = Mock()
+        message.text = "🔥 Deal https://amzn.to/abc and this one"
+        message.entities = (
+            MessageEntity(type="url", offset=8, length=19),
+            MessageEntity(
+                type="text_link",
+                offset=32,
+                length=8,
+                url="https://www.amazon.es/dp/B01",
+            ),
+        )
+
+        context = await prepare_message(message)
+
+        self.assertEqual(
+            context["modified_message"],
+            "🔥 Deal https://amzn.to/abc and this one (https://www.amazon.es/dp/B01)",
+        )
+        self.assertEqual(
+            [parsed_url.url for parsed_url in context["parsed_message"].urls],
+            ["https://amzn.to/abc", "https://www.amazon.es/dp/B01"],
+        )
+
+    @patch("botaffiumeiro.expand_and_detect_domains", new_callable=AsyncMock)
     @patch("botaffiumeiro.select_user_for_domain")
-    def test_prepare_message_with_valid_domains(
-        self, mock_select_user: AsyncMock, mock_extract_domains: AsyncMock
+    async def test_prepare_message_with_valid_domains(
+        self, mock_select_user: AsyncMock, mock_expand_and_detect: AsyncMock
     ) -> None:
         """Test: Simulate a message with valid domains and ensure users are selected correctly."""
         # Mock the domains extracted from the message
-        mock_extract_domains.return_value = (
+        mock_expand_and_detect.return_value = (
             {"amazon.com", "aliexpress.com"},
-            "Modified message with expanded URLs",
+            parse_message("Modified message with expanded URLs"),
         )
 
         # Define a function for side_effect to return users based on the domain
-        def select_user_side_effect(domain: str) -> dict | None:
+        def select_user_side_effect(domain: str, _: ConfigSnapshot) -> dict | None:
             if domain == "amazon.com":
                 return {"user": "user1", "amazon_affiliate_id": "id_user1"}
             if domain == "aliexpress.com":
@@ -519,10 +683,11 @@ class TestPrepareMessage(unittest.TestCase):
 
         # Simulate a message object with text
         message = Mock()
+        message.entities = ()
         message.text = "Check out this Amazon link: https://amzn.to/abc123 and this AliExpress link: https://s.click.aliexpress.com/e/xyz789"
 
         # Call prepare_message to get the context
-        context = prepare_message(message)
+        context = await prepare_message(message)
 
         # Check the returned context structure
         self.assertIsNotNone(context)
@@ -536,21 +701,25 @@ class TestPrepareMessage(unittest.TestCase):
         self.assertIn("aliexpress.com", context["selected_users"])
         self.assertEqual(context["selected_users"]["aliexpress.com"]["user"], "user2")
 
-    @patch("botaffiumeiro.extract_domains_from_message")
+    @patch("botaffiumeiro.expand_and_detect_domains", new_callable=AsyncMock)
     @patch("botaffiumeiro.select_user_for_domain")
-    def test_prepare_message_with_no_domains(
-        self, mock_select_user: AsyncMock, mock_extract_domains: AsyncMock
+    async def test_prepare_message_with_no_domains(
+        self, mock_select_user: AsyncMock, mock_expand_and_detect: AsyncMock
     ) -> None:
         """Test: Handle a case where no valid domains are found in the message."""
         # Mock the domains extracted from the message (empty set and message unchanged)
-        mock_extract_domains.return_value = (set(), "This message contains no links.")
+        mock_expand_and_detect.return_value = (
+            set(),
+            parse_message("This message contains no links."),
+        )
 
         # Simulate a message object with text
         message = Mock()
+        message.entities = ()
         message.text = "This message contains no links."
 
         # Call the method to get the context
-        context = prepare_message(message)
+        context = await prepare_message(message)
 
         # No domains, so the selected_users should be empty
         self.assertEqual(context["selected_users"], {})
@@ -561,23 +730,23 @@ class TestPrepareMessage(unittest.TestCase):
         # Check that the message text was not changed
         self.assertEqual(context["modified_message"], "This message contains no links.")
 
-    @patch("botaffiumeiro.extract_domains_from_message")
+    @patch("botaffiumeiro.expand_and_detect_domains", new_callable=AsyncMock)
     @patch("botaffiumeiro.select_user_for_domain")
-    def test_prepare_message_with_mixed_domains(
-        self, mock_select_user: AsyncMock, mock_extract_domains: AsyncMock
+    async def test_prepare_message_with_mixed_domains(
+        self, mock_select_user: AsyncMock, mock_expand_and_detect: AsyncMock
     ) -> None:
         """Test: Simulate a message where one domain has a user and another domain does not."""
         # Mock the domains extracted from the message
-        mock_extract_domains.return_value = (
+        mock_expand_and_detect.return_value = (
             {
                 "amazon.com",
                 "unknown.com",
             },
-            "Modified message with expanded URLs",
+            parse_message("Modified message with expanded URLs"),
         )
 
         # Define a function for side_effect to return users based on the domain
-        def select_user_side_effect(domain: str) -> dict | None:
+        def select_user_side_effect(domain: str, _: ConfigSnapshot) -> dict | None:
             if domain == "amazon.com":
                 return {"user": "user1", "amazon_affiliate_id": "id_user1"}
             if domain == "unknown.com":
@@ -589,12 +758,13 @@ class TestPrepareMessage(unittest.TestCase):
 
         # Simulate a message object with text
         message = Mock()
+        message.entities = ()
         message.text = (
             "Check out this Amazon link: https://amzn.to/abc123 and some unknown link."
         )
 
         # Call the method to get the context
-        context = prepare_message(message)
+        context = await prepare_message(message)
 
         # Amazon should have a user selected
         self.assertIn("amazon.com", context["selected_users"])
@@ -608,16 +778,16 @@ class TestPrepareMessage(unittest.TestCase):
             context["modified_message"], "Modified message with expanded URLs"
         )
 
-    @patch("botaffiumeiro.extract_domains_from_message")
+    @patch("botaffiumeiro.expand_and_detect_domains", new_callable=AsyncMock)
     @patch("botaffiumeiro.select_user_for_domain")
-    def test_prepare_message_with_only_unknown_domains(
-        self, mock_select_user: AsyncMock, mock_extract_domains: AsyncMock
+    async def test_prepare_message_with_only_unknown_domains(
+        self, mock_select_user: AsyncMock, mock_expand_and_detect: AsyncMock
     ) -> None:
         """Test: Simulate a message where all domains are unknown."""
         # Mock the domains extracted from the message
-        mock_extract_domains.return_value = (
+        mock_expand_and_detect.return_value = (
             {"unknown.com"},
-            "Modified message with expanded URLs",
+            parse_message("Modified message with expanded URLs"),
         )
 
         # Mock the user selection for the unknown domain
@@ -625,39 +795,41 @@ class TestPrepareMessage(unittest.TestCase):
 
         # Simulate a message object with text
         message = Mock()
+        message.entities = ()
         message.text = "This message contains an unknown domain link."
+        config = ConfigurationManager().snapshot
 
         # Call the method to get the context
-        context = prepare_message(message)
+        context = await prepare_message(message, config=config)
 
         # Since there's no valid user for unknown.com, selected_users should be empty
         self.assertEqual(context["selected_users"], {})
 
         # Ensure the select_user_for_domain function was called once for the unknown domain
-        mock_select_user.assert_called_once_with("unknown.com")
+        mock_select_user.assert_called_once_with("unknown.com", config)
 
         # Verify the modified message
         self.assertEqual(
             context["modified_message"], "Modified message with expanded URLs"
         )
 
-    @patch("botaffiumeiro.extract_domains_from_message")
+    @patch("botaffiumeiro.expand_and_detect_domains", new_callable=AsyncMock)
     @patch("botaffiumeiro.select_user_for_domain")
-    def test_prepare_message_with_expanded_urls(
-        self, mock_select_user: AsyncMock, mock_extract_domains: AsyncMock
+    async def test_prepare_message_with_expanded_urls(
+        self, mock_select_user: AsyncMock, mock_expand_and_detect: AsyncMock
     ) -> None:
         """Test: Ensure that prepare_message returns both the selected users and the modified message."""
-        # Mock the domains and the modified message returned by extract_domains_from_message
-        mock_extract_domains.return_value = (
+        # Mock the domains and the modified message returned by expand_and_detect_domains
+        mock_expand_and_detect.return_value = (
             {
                 "amazon.com",
                 "aliexpress.com",
             },
-            "Modified message with expanded URLs",
+            parse_message("Modified message with expanded URLs"),
         )
 
         # Define a function for side_effect to return users based on the domain
-        def select_user_side_effect(domain: str) -> dict | None:
+        def select_user_side_effect(domain: str, _: ConfigSnapshot) -> dict | None:
             if domain == "amazon.com":
                 return {"user": "user1", "amazon_affiliate_id": "id_user1"}
             if domain == "aliexpress.com":
@@ -669,14 +841,16 @@ class TestPrepareMessage(unittest.TestCase):
 
         # Simulate a message object with text
         message = Mock()
+        message.entities = ()
         message.text = "Check out this Amazon link: https://amzn.to/abc123 and this AliExpress link: https://s.click.aliexpress.com/e/xyz789"
+        config = ConfigurationManager().snapshot
 
         # Call the method to get the context
-        context = prepare_message(message)
+        context = await prepare_message(message, config=config)
 
         # Ensure select_user_for_domain was called with the correct domains
-        mock_select_user.assert_any_call("amazon.com")
-        mock_select_user.assert_any_call("aliexpress.com")
+        mock_select_user.assert_any_call("amazon.com", config)
+        mock_select_user.assert_any_call("aliexpress.com", config)
 
         # Verify selected users
         self.assertIn("amazon.com", context["selected_users"])
@@ -690,14 +864,15 @@ class TestPrepareMessage(unittest.TestCase):
             context["modified_message"], "Modified message with expanded URLs"
         )
 
-    def test_prepare_message_with_no_text(self) -> None:
+    async def test_prepare_message_with_no_text(self) -> None:
         """Test: Ensure that prepare_message returns an empty dictionary and None for the modified message when there is no text."""
         # Simulate an empty message
         message = Mock()
+        message.entities = ()
         message.text = None
 
         # Call the method to get the context
-        context = prepare_message(message)
+        context = await prepare_message(message)
 
         # Verify that no users were selected and the modified message is None
         self.assertEqual(context["selected_users"], {})
@@ -716,16 +891,20 @@ class TestSelectUserForDomain(unittest.TestCase):
                 {"user": "user2", "percentage": 40},
             ]
         }
+        mock_config_manager.domain_users = build_domain_users(
+            mock_config_manager.domain_percentage_table
+        )
+        mock_config_manager.user_random = secrets.SystemRandom()
         mock_config_manager.all_users_configurations = {
             "user1": {"amazon_affiliate_id": "user1-affiliate-id"},
             "user2": {"amazon_affiliate_id": "user2-affiliate-id"},
         }
 
         with (
-            patch("secrets.SystemRandom.uniform", return_value=50),
+            patch.object(mock_config_manager.user_random, "uniform", return_value=50),
             patch("botaffiumeiro.config_manager", mock_config_manager),
         ):
-            selected_user = select_user_for_domain("amazon")
+            selected_user = select_user_for_domain("amazon", mock_config_manager)
 
         if selected_user is None:
             self.fail("select_user_for_domain returned None, but a user was expected.")
@@ -740,16 +919,20 @@ class TestSelectUserForDomain(unittest.TestCase):
                 {"user": "user2", "percentage": 40},
             ]
         }
+        mock_config_manager.domain_users = build_domain_users(
+            mock_config_manager.domain_percentage_table
+        )
+        mock_config_manager.user_random = secrets.SystemRandom()
         mock_config_manager.all_users_configurations = {
             "user1": {"amazon_affiliate_id": "user1-affiliate-id"},
             "user2": {"amazon_affiliate_id": "user2-affiliate-id"},
         }
 
         with (
-            patch("secrets.SystemRandom.uniform", return_value=80),
+            patch.object(mock_config_manager.user_random, "uniform", return_value=80),
             patch("botaffiumeiro.config_manager", mock_config_manager),
         ):
-            selected_user = select_user_for_domain("amazon")
+            selected_user = select_user_for_domain("amazon", mock_config_manager)
 
         if selected_user is None:
             self.fail("select_user_for_domain returned None, but a user was expected.")
@@ -761,9 +944,11 @@ class TestSelectUserForDomain(unittest.TestCase):
     )
     def test_no_users_in_domain(self, mock_config_manager: AsyncMock) -> None:
         """Test: No users are available for the given domain. Should return None."""
-        mock_config_manager.domain_percentage_table = {}
+        mock_config_manager.domain_users = build_domain_users({})
 
-        selected_user = select_user_for_domain("nonexistent_domain")
+        selected_user = select_user_for_domain(
+            "nonexistent_domain", mock_config_manager
+        )
         self.assertIsNone(selected_user)
 
     @patch(
@@ -775,11 +960,15 @@ class TestSelectUserForDomain(unittest.TestCase):
         mock_config_manager.domain_percentage_table = {
             "amazon": [{"user": "user1", "percentage": 100}]
         }
+        mock_config_manager.domain_users = build_domain_users(
+            mock_config_manager.domain_percentage_table
+        )
+        mock_config_manager.user_random = secrets.SystemRandom()
         mock_config_manager.all_users_configurations = {
             "user1": {"amazon_affiliate_id": "user1-affiliate-id"}
         }
 
-        selected_user = select_user_for_domain("amazon")
+        selected_user = select_user_for_domain("amazon", mock_config_manager)
         if selected_user is None:
             self.fail("select_user_for_domain returned None, but a user was expected.")
         self.assertEqual(selected_user["amazon_affiliate_id"], "user1-affiliate-id")
@@ -796,12 +985,16 @@ class TestSelectUserForDomain(unittest.TestCase):
                 {"user": "user2", "percentage": 100},
             ]
         }
+        mock_config_manager.domain_users = build_domain_users(
+            mock_config_manager.domain_percentage_table
+        )
+        mock_config_manager.user_random = secrets.SystemRandom()
         mock_config_manager.all_users_configurations = {
             "user1": {"amazon_affiliate_id": "user1-affiliate-id"},
             "user2": {"amazon_affiliate_id": "user2-affiliate-id"},
         }
 
-        selected_user = select_user_for_domain("amazon")
+        selected_user = select_user_for_domain("amazon", mock_config_manager)
         if selected_user is None:
             self.fail("select_user_for_domain returned None, but a user was expected.")
         self.assertEqual(selected_user["amazon_affiliate_id"], "user2-affiliate-id")
@@ -818,61 +1011,213 @@ class TestSelectUserForDomain(unittest.TestCase):
                 {"user": "user2", "percentage": 40},
             ]
         }
+        mock_config_manager.domain_users = build_domain_users(
+            mock_config_manager.domain_percentage_table
+        )
+        mock_config_manager.user_random = secrets.SystemRandom()
         mock_config_manager.all_users_configurations = {
             "user1": {"amazon_affiliate_id": "user1-affiliate-id"},
             "user2": {"amazon_affiliate_id": "user2-affiliate-id"},
         }
 
-        with patch("secrets.SystemRandom.uniform", return_value=150):
-            selected_user = select_user_for_domain("amazon")
+        with patch.object(mock_config_manager.user_random, "uniform", return_value=150):
+            selected_user = select_user_for_domain("amazon", mock_config_manager)
         if selected_user is None:
             self.fail("select_user_for_domain returned None, but a user was expected.")
         self.assertEqual(selected_user["amazon_affiliate_id"], "user1-affiliate-id")
 
 
-class TestExpandShortenedUrl(unittest.TestCase):
+class TestExpandShortenedUrl(unittest.IsolatedAsyncioTestCase):
     """Tests for the expand_shortened_url function."""
 
-    @patch("botaffiumeiro.requests.get")
-    def test_url_with_trailing_period(self, mock_get: AsyncMock) -> None:
+    async def test_url_with_trailing_period(self) -> None:
         """Test: Handle URLs with a trailing period."""
-        mock_response = Mock()
-        mock_response.url = "https://www.example.com/full-url"
-        mock_get.return_value = mock_response
+        requested: list[str] = []
+        transport = redirect_transport(
+            {"https://short.url/example": "https://www.example.com/full-url"},
+            requested,
+        )
 
         # URL with a trailing period
         url = "https://short.url/example."
 
-        expanded_url = expand_shortened_url(url)
+        with patch("botaffiumeiro.url_expander", build_expander(transport)):
+            expanded_url = await expand_shortened_url(url)
 
-        # Ensure requests.get is called with the stripped URL
-        mock_get.assert_called_once_with(
-            "https://short.url/example", allow_redirects=True, timeout=ANY
-        )
+        # Ensure the stripped URL is the one requested
+        self.assertEqual(requested[0], "https://short.url/example")
 
         # Check that the expanded URL is correct
         self.assertEqual(expanded_url, "https://www.example.com/full-url")
 
-    @patch("botaffiumeiro.requests.get")
-    def test_url_with_trailing_comma(self, mock_get: AsyncMock) -> None:
+    async def test_url_with_trailing_comma(self) -> None:
         """Test: Handle URLs with a trailing comma."""
-        mock_response = Mock()
-        mock_response.url = "https://www.example.com/full-url"
-        mock_get.return_value = mock_response
+        requested: list[str] = []
+        transport = redirect_transport(
+            {"https://short.url/example": "https://www.example.com/full-url"},
+            requested,
+        )
 
         # URL with a trailing comma
         url = "https://short.url/example,"
 
-        expanded_url = expand_shortened_url(url)
+        with patch("botaffiumeiro.url_expander", build_expander(transport)):
+            expanded_url = await expand_shortened_url(url)
 
-        # Ensure requests.get is called with the stripped URL
-        mock_get.assert_called_once_with(
-            "https://short.url/example", allow_redirects=True, timeout=ANY
-        )
+        # Ensure the stripped URL is the one requested
+        self.assertEqual(requested[0], "https://short.url/example")
 
         # Check that the expanded URL is correct
         self.assertEqual(expanded_url, "https://www.example.com/full-url")
 
+    async def test_url_expansion_error(self) -> None:
+        """Test: Return the original URL when the expansion request fails."""
+
+        def failing_handler(request: httpx.Request) -> httpx.Response:
+            message = "unreachable"
+            raise httpx.ConnectError(message, request=request)
+
+        transport = httpx.MockTransport(failing_handler)
+
+        with patch("botaffiumeiro.url_expander", build_expander(transport)):
+            expanded_url = await expand_shortened_url("https://short.url/example")
+
+        self.assertEqual(expanded_url, "https://short.url/example")
+
+
+class TestDetectDomains(unittest.IsolatedAsyncioTestCase):
+    """Tests for detect_domains function."""
+
+    def setUp(self) -> None:
+        """Set up an advertiser index with an Awin store."""
+        self.advertiser_index = AdvertiserIndex()
+        self.advertiser_index.add("pccomponentes.com", "awin", "main", "20982")
+        self.text = (
+            "Wrapped https://www.awin1.com/cread.php?awinmid=1&awinaffid=2"
+            "&p=https://www.pccomponentes.com/x"
+        )
+
+    def test_store_link_in_parameter_without_unwrap_rule(self) -> None:
+        """Test: A store link in a wrapper parameter that is not unwrapped adds its domain."""
+        domains = detect_domains(parse_message(self.text), self.advertiser_index)
+
+        self.assertIn("pccomponentes.com", domains)
+
+    def test_embedded_links_to_other_sites_ignored(self) -> None:
+        """Test: Links in query parameters add no domain if they are not indexed stores."""
+        domains = detect_domains(
+            parse_message("https://example.com/?next=https://example.org/a"),
+            self.advertiser_index,
+        )
+
+        self.assertNotIn("example.org", domains)
+
+    @patch("botaffiumeiro.expand_message_urls", new_callable=AsyncMock)
+    async def test_user_selected_for_embedded_store(
+        self, mock_expand: AsyncMock
+    ) -> None:
+        """Test: A user is selected for the store of a link embedded in a wrapper."""
+        mock_expand.return_value = {}
+        config_manager = ConfigurationManager()
+        config_manager.advertiser_index = self.advertiser_index
+        config_manager.domain_users = build_domain_users(
+            {"pccomponentes.com": [{"user": "main", "percentage": 100}]}
+        )
+        config_manager.all_users_configurations = {
+            "main": build_user_config(
+                {
+                    "user": "main",
+                    "awin": {
+                        "publisher_id": "pub",
+                        "advertisers": {"pccomponentes.com": "20982"},
+                    },
+                }
+            )
+        }
+        message = Mock(spec=Message)
+        message.text = self.text
+        message.entities = ()
+
+        context = await prepare_message(message, config=config_manager._take_snapshot())
+
+        self.assertIn("pccomponentes.com", context["selected_users"])
+        self.assertEqual(context["platforms"], {"awin"})
+
+
+class TestDetectPlatforms(unittest.TestCase):
+    """Tests for detect_platforms function."""
+
+    def setUp(self) -> None:
+        """Set up an advertiser index with stores of two platforms."""
+        self.advertiser_index = AdvertiserIndex()
+        self.advertiser_index.add("amazon.es", "amazon", "main", "es-21")
+        self.advertiser_index.add("giftmio.com", "awin", "main", "20982")
+
+    def test_platforms_of_store_links(self) -> None:
+        """Test: The platforms of the store links of the message are detected."""
+        parsed_message = parse_message(
+            "https://www.amazon.es/dp/B01 https://www.aliexpress.com/item/1.html"
+        )
+
+        self.assertEqual(
+            detect_platforms(parsed_message, self.advertiser_index),
+            {"amazon", "aliexpress"},
+        )
+
+    def test_platform_of_embedded_store_link(self) -> None:
+        """Test: Store links embedded in query parameters are detected."""
+        parsed_message = parse_message(
+            "https://www.awin1.com/cread.php?awinmid=1&ued=https://www.giftmio.com/p"
+        )
+
+        self.assertEqual(
+            detect_platforms(parsed_message, self.advertiser_index), {"awin"}
+        )
+
+    def test_no_platforms(self) -> None:
+        """Test: Links to other sites have no platform."""
+        parsed_message = parse_message("https://example.com/a")
+
+        self.assertEqual(detect_platforms(parsed_message, self.advertiser_index), set())
+
+
+class TestProcessLinkHandlers(unittest.IsolatedAsyncioTestCase):
+    """Tests for process_link_handlers function."""
+
+    async def test_only_handlers_of_detected_platforms_run(self) -> None:
+        """Test: A message with only Amazon links never reaches the AliExpress handlers."""
+        pattern_handler = Mock(return_value=AsyncMock())
+        pattern_handler.return_value.handle_links.return_value = True
+        aliexpress_api_handler = Mock()
+        context = {"platforms": {"amazon"}}
+
+        with (
+            patch("botaffiumeiro.prepare_message", return_value=context),
+            patch.dict(
+                "botaffiumeiro.PLATFORM_HANDLERS",
+                {"amazon": pattern_handler, "aliexpress": aliexpress_api_handler},
+            ),
+            patch("botaffiumeiro.AliexpressHandler") as aliexpress_handler,
+        ):
+            await process_link_handlers(Mock())
+
+        pattern_handler.return_value.handle_links.assert_awaited_once_with(context)
+        pattern_handler.return_value.apply_edits.assert_awaited_once_with(context)
+        aliexpress_api_handler.assert_not_called()
+        aliexpress_handler.assert_not_called()
+
+    async def test_no_handlers_without_platforms(self) -> None:
+        """Test: No handler runs for messages without links of any platform."""
+        pattern_handler = Mock()
+
+        with (
+            patch("botaffiumeiro.prepare_message", return_value={"platforms": set()}),
+            patch.dict("botaffiumeiro.PLATFORM_HANDLERS", {"amazon": pattern_handler}),
+        ):
+            await process_link_handlers(Mock())
+
+        pattern_handler.assert_not_called()
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -3,9 +3,25 @@
 
 from __future__ import annotations
 
+from datetime import timedelta
+from pathlib import Path
+import tempfile
+import threading
+from types import MappingProxyType
 import unittest
+from unittest.mock import Mock, patch
 
-from config import ConfigurationManager
+from config import (
+    ConfigurationManager,
+    DomainUsers,
+    PlatformConfig,
+    UserConfig,
+    build_domain_users,
+    build_platform_config,
+    build_user_config,
+)
+import requests  # type: ignore[import-untyped]
+import yaml  # type: ignore[import-untyped]
 
 
 class TestAddToDomainTable(unittest.TestCase):
@@ -171,6 +187,20 @@ class TestAddAffiliateStoresDomains(unittest.TestCase):
             50,
         )
 
+    def test_advertiser_indexed(self) -> None:
+        """Test: The advertiser is added to the advertiser index of its platform."""
+        self.config_manager._add_affiliate_stores_domains(
+            "main", {"example.com": "affiliate-id"}, "awin", 50
+        )
+
+        self.assertEqual(
+            self.config_manager.advertiser_index.find("www.example.com", "awin"),
+            "example.com",
+        )
+        self.assertIsNone(
+            self.config_manager.advertiser_index.find("www.example.com", "admitad")
+        )
+
     def test_multiple_advertisers(self) -> None:
         """Test: Add multiple advertisers to the domain_percentage_table."""
         user_id = "main"
@@ -299,12 +329,14 @@ class TestAddUserToDomainPercentageTable(unittest.TestCase):
     def test_no_affiliate_ids(self) -> None:
         """Test: No affiliate IDs provided for the user. The table should remain empty."""
         user_id = "user"
-        user_data = {
-            "amazon": {"advertisers": {}},
-            "aliexpress": {"app_key": None},
-            "awin": {"advertisers": {}},
-            "admitad": {"advertisers": {}},
-        }
+        user_data = build_user_config(
+            {
+                "amazon": {"advertisers": {}},
+                "aliexpress": {"app_key": None},
+                "awin": {"advertisers": {}},
+                "admitad": {"advertisers": {}},
+            }
+        )
         self.config_manager._add_user_to_domain_percentage_table(user_id, user_data, 50)
 
         self.assertEqual(len(self.config_manager.domain_percentage_table), 0)
@@ -312,12 +344,14 @@ class TestAddUserToDomainPercentageTable(unittest.TestCase):
     def test_amazon_affiliate_id(self) -> None:
         """Test: The user has an Amazon affiliate ID. The table should be updated with Amazon."""
         user_id = "main"
-        user_data = {
-            "amazon": {"advertisers": {"amazon.es": "amazon-affiliate-id"}},
-            "aliexpress": {"app_key": None},
-            "awin": {"advertisers": {}},
-            "admitad": {"advertisers": {}},
-        }
+        user_data = build_user_config(
+            {
+                "amazon": {"advertisers": {"amazon.es": "amazon-affiliate-id"}},
+                "aliexpress": {"app_key": None},
+                "awin": {"advertisers": {}},
+                "admitad": {"advertisers": {}},
+            }
+        )
         self.config_manager._add_user_to_domain_percentage_table(user_id, user_data, 50)
 
         self.assertIn("amazon.es", self.config_manager.domain_percentage_table)
@@ -332,12 +366,16 @@ class TestAddUserToDomainPercentageTable(unittest.TestCase):
     def test_multiple_affiliate_ids(self) -> None:
         """Test: The user has IDs for Amazon, AliExpress, and advertisers in Awin and Admitad."""
         user_id = "main"
-        user_data = {
-            "amazon": {"advertisers": {"amazon.es": "amazon-affiliate-id"}},
-            "aliexpress": {"app_key": "aliexpress-app-key"},
-            "awin": {"advertisers": {"awin-example.com": "awin-affiliate-id"}},
-            "admitad": {"advertisers": {"admitad-example.com": "admitad-affiliate-id"}},
-        }
+        user_data = build_user_config(
+            {
+                "amazon": {"advertisers": {"amazon.es": "amazon-affiliate-id"}},
+                "aliexpress": {"app_key": "aliexpress-app-key"},
+                "awin": {"advertisers": {"awin-example.com": "awin-affiliate-id"}},
+                "admitad": {
+                    "advertisers": {"admitad-example.com": "admitad-affiliate-id"}
+                },
+            }
+        )
         self.config_manager._add_user_to_domain_percentage_table(user_id, user_data, 50)
 
         # Amazon
@@ -375,20 +413,24 @@ class TestAddUserToDomainPercentageTable(unittest.TestCase):
         """Test: Multiple users with affiliate data for the same domains."""
         # First user
         user_id_1 = "user1"
-        user_data_1 = {
-            "amazon": {"advertisers": {"amazon.es": "amazon-affiliate-id"}},
-            "aliexpress": {"app_key": "aliexpress-app-key-1"},
-        }
+        user_data_1 = build_user_config(
+            {
+                "amazon": {"advertisers": {"amazon.es": "amazon-affiliate-id"}},
+                "aliexpress": {"app_key": "aliexpress-app-key-1"},
+            }
+        )
         self.config_manager._add_user_to_domain_percentage_table(
             user_id_1, user_data_1, 60
         )
 
         # Second user
         user_id_2 = "user2"
-        user_data_2 = {
-            "amazon": {"advertisers": {"amazon.es": "amazon-affiliate-id-2"}},
-            "aliexpress": {"app_key": "aliexpress-app-key-2"},
-        }
+        user_data_2 = build_user_config(
+            {
+                "amazon": {"advertisers": {"amazon.es": "amazon-affiliate-id-2"}},
+                "aliexpress": {"app_key": "aliexpress-app-key-2"},
+            }
+        )
         self.config_manager._add_user_to_domain_percentage_table(
             user_id_2, user_data_2, 40
         )
@@ -407,9 +449,13 @@ class TestAddUserToDomainPercentageTable(unittest.TestCase):
 
     def test_multiple_users_with_shared_and_unique_domains(self) -> None:
         """Test: Multiple users where some domains overlap and others are unique."""
-        user_1 = {"amazon": {"advertisers": {"amazon.es": "id1"}}, "awin": {}}
-        user_2 = {"aliexpress": {"app_key": "key2"}}
-        user_3 = {"amazon": {"advertisers": {"amazon.es": "id3"}}, "awin": {}}
+        user_1 = build_user_config(
+            {"amazon": {"advertisers": {"amazon.es": "id1"}}, "awin": {}}
+        )
+        user_2 = build_user_config({"aliexpress": {"app_key": "key2"}})
+        user_3 = build_user_config(
+            {"amazon": {"advertisers": {"amazon.es": "id3"}}, "awin": {}}
+        )
 
         self.config_manager._add_user_to_domain_percentage_table("user1", user_1, 70)
         self.config_manager._add_user_to_domain_percentage_table("user2", user_2, 30)
@@ -420,9 +466,13 @@ class TestAddUserToDomainPercentageTable(unittest.TestCase):
 
     def test_multiple_users_with_aliexpress_on_different_platforms(self) -> None:
         """Test: Multiple users with AliExpress affiliate IDs from different platforms."""
-        user_1 = {"aliexpress": {"app_key": "api-key"}}
-        user_2 = {"awin": {"advertisers": {"aliexpress.com": "awin-id"}}}
-        user_3 = {"admitad": {"advertisers": {"aliexpress.com": "admitad-id"}}}
+        user_1 = build_user_config({"aliexpress": {"app_key": "api-key"}})
+        user_2 = build_user_config(
+            {"awin": {"advertisers": {"aliexpress.com": "awin-id"}}}
+        )
+        user_3 = build_user_config(
+            {"admitad": {"advertisers": {"aliexpress.com": "admitad-id"}}}
+        )
 
         self.config_manager._add_user_to_domain_percentage_table("user1", user_1, 50)
         self.config_manager._add_user_to_domain_percentage_table("user2", user_2, 30)
@@ -624,5 +674,321 @@ class TestAdjustDomainAffiliatePercentages(unittest.TestCase):
         self.assertEqual(total_percentage, 100)
 
 
+class TestBuildDomainUsers(unittest.TestCase):
+    """Tests for build_domain_users function."""
+
+    def test_cumulative_percentages(self) -> None:
+        """Test: The percentages of the users of each domain are accumulated in order."""
+        domain_users = build_domain_users(
+            {
+                "amazon.es": [
+                    {"user": "main", "percentage": 90},
+                    {"user": "creator1", "percentage": 6},
+                    {"user": "creator2", "percentage": 4},
+                ],
+                "empty.com": [],
+            }
+        )
+
+        self.assertEqual(
+            domain_users["amazon.es"],
+            DomainUsers(("main", "creator1", "creator2"), (90, 96, 100)),
+        )
+        self.assertNotIn("empty.com", domain_users)
+
+
+class TestUserConfig(unittest.TestCase):
+    """Tests for the typed user configuration."""
+
+    def test_load_user_configuration(self) -> None:
+        """Test: The YAML configuration of a user is loaded into a typed configuration."""
+        user_config = ConfigurationManager()._load_user_configuration(
+            "creator",
+            10,
+            {
+                "amazon": {"amazon.es": "tag-21"},
+                "awin": {"publisher_id": "pub", "advertisers": {"a.com": "1"}},
+                "aliexpress": {"discount_codes": "CODE"},
+            },
+        )
+
+        self.assertEqual(user_config.user, "creator")
+        self.assertEqual(user_config.percentage, 10)
+        self.assertEqual(user_config.amazon.advertisers, {"amazon.es": "tag-21"})
+        self.assertEqual(user_config.platform("awin").publisher_id, "pub")
+        self.assertEqual(user_config.admitad, PlatformConfig())
+        self.assertEqual(user_config.aliexpress.discount_codes, "CODE")
+        self.assertIsNone(user_config.aliexpress.app_key)
+
+    def test_unknown_platform(self) -> None:
+        """Test: An unknown platform has an empty configuration."""
+        user_config = build_user_config({"user": "main"})
+
+        self.assertEqual(user_config.platform("aliexpress"), PlatformConfig())
+        self.assertEqual(
+            [name for name, _ in user_config.platforms()],
+            ["amazon", "awin", "admitad", "tradedoubler"],
+        )
+
+    def test_advertisers_read_only(self) -> None:
+        """Test: The advertisers are a read-only copy of the loaded ones."""
+        advertisers = {"a.com": "1"}
+        platform_config = build_platform_config({"advertisers": advertisers})
+        advertisers["b.com"] = "2"
+
+        self.assertEqual(platform_config.advertisers, {"a.com": "1"})
+        self.assertIsInstance(platform_config.advertisers, MappingProxyType)
+
+
+class TestLoadCreatorsConfigurations(unittest.TestCase):
+    """Tests for _load_creators_configurations function."""
+
+    def setUp(self) -> None:
+        """Set up a fresh ConfigurationManager instance for each test."""
+        self.config_manager = ConfigurationManager()
+        self.creators = [
+            {"id": "creator1", "percentage": 10, "url": "https://a.com/1.yaml"},
+            {"id": "creator2", "percentage": 20, "url": "https://a.com/2.yaml"},
+            {"id": "no_url", "percentage": 30},
+        ]
+
+    def test_creators_loaded_in_order(self) -> None:
+        """Test: The creators are loaded in the order of the file, with their timings."""
+        with patch.object(
+            self.config_manager,
+            "_load_user_configuration_from_url",
+            side_effect=lambda user, percentage, _: UserConfig(user, percentage),
+        ) as mock_load:
+            self.config_manager._load_creators_configurations(self.creators)
+
+        self.assertEqual(mock_load.call_count, 2)
+        self.assertEqual(
+            list(self.config_manager.all_users_configurations),
+            ["creator1", "creator2"],
+        )
+        self.assertEqual(
+            self.config_manager.all_users_configurations["creator2"].percentage, 20
+        )
+        self.assertEqual(
+            set(self.config_manager.creator_load_times), {"creator1", "creator2"}
+        )
+
+    def test_deadline(self) -> None:
+        """Test: A creator not loaded before the deadline is left out."""
+        release = threading.Event()
+
+        def load(user: str, percentage: int, _: str) -> UserConfig:
+            if user == "creator2":
+                release.wait()
+            return UserConfig(user, percentage)
+
+        self.config_manager.creators_deadline = 0.05
+        with patch.object(
+            self.config_manager, "_load_user_configuration_from_url", side_effect=load
+        ):
+            self.config_manager._load_creators_configurations(self.creators)
+            release.set()
+
+        self.assertEqual(
+            list(self.config_manager.all_users_configurations), ["creator1"]
+        )
+        self.assertNotIn("creator2", self.config_manager.creator_load_times)
+
+
+class TestLoadUserConfigurationFromUrl(unittest.TestCase):
+    """Tests for _load_user_configuration_from_url function."""
+
+    def setUp(self) -> None:
+        """Set up a fresh ConfigurationManager instance for each test."""
+        self.config_manager = ConfigurationManager()
+        self.url = "https://gist.githubusercontent.com/creator/raw/config.yaml"
+
+    @patch("config.requests.get")
+    def test_user_configuration_loaded(self, mock_get: Mock) -> None:
+        """Test: The creator configuration is downloaded and its latency recorded."""
+        mock_get.return_value.text = "configuration:\n  amazon:\n    amazon.es: tag-21"
+        mock_get.return_value.elapsed = timedelta(seconds=0.2)
+        mock_get.return_value.headers = {}
+
+        user_data = self.config_manager._load_user_configuration_from_url(
+            "creator", 50, self.url
+        )
+
+        self.assertEqual(user_data.amazon.advertisers, {"amazon.es": "tag-21"})
+        mock_get.assert_called_once_with(
+            self.url, headers={}, timeout=ConfigurationManager.TIMEOUT
+        )
+        self.assertEqual(
+            self.config_manager.host_limiter._latencies["gist.githubusercontent.com"][
+                0
+            ],
+            0.2,
+        )
+
+    @patch("config.requests.get")
+    def test_adaptive_timeout_used(self, mock_get: Mock) -> None:
+        """Test: The timeout of the request is adapted to the latency of the host."""
+        for _ in range(10):
+            self.config_manager.host_limiter.record("gist.githubusercontent.com", 1)
+        mock_get.side_effect = requests.Timeout()
+
+        user_data = self.config_manager._load_user_configuration_from_url(
+            "creator", 50, self.url
+        )
+
+        self.assertIsNone(user_data)
+        mock_get.assert_called_once_with(self.url, headers={}, timeout=2)
+
+    @patch("config.yaml.safe_load", wraps=yaml.safe_load)
+    @patch("config.requests.get")
+    def test_not_modified_configuration_reused(
+        self, mock_get: Mock, mock_safe_load: Mock
+    ) -> None:
+        """Test: A configuration not modified since the last download is not parsed again."""
+        downloaded = Mock(
+            status_code=200,
+            text="configuration:\n  amazon:\n    amazon.es: tag-21",
+            elapsed=timedelta(seconds=0.2),
+            headers={"ETag": '"v1"', "Last-Modified": "Mon, 05 Oct 2026 10:00:00 GMT"},
+        )
+        not_modified = Mock(
+            status_code=304, text="", elapsed=timedelta(seconds=0.1), headers={}
+        )
+        mock_get.side_effect = [downloaded, not_modified]
+
+        self.config_manager._load_user_configuration_from_url("creator", 50, self.url)
+        user_data = self.config_manager._load_user_configuration_from_url(
+            "creator", 40, self.url
+        )
+
+        self.assertEqual(user_data.amazon.advertisers, {"amazon.es": "tag-21"})
+        self.assertEqual(user_data.percentage, 40)
+        self.assertEqual(
+            mock_get.call_args.kwargs["headers"],
+            {
+                "If-None-Match": '"v1"',
+                "If-Modified-Since": "Mon, 05 Oct 2026 10:00:00 GMT",
+            },
+        )
+        mock_safe_load.assert_called_once()
+
+
+class TestLoadConfiguration(unittest.TestCase):
+    """Tests for load_configuration function."""
+
+    def test_expansion_settings_loaded(self) -> None:
+        """Test: The link expansion settings are read from the configuration file."""
+        config_manager = ConfigurationManager()
+        with tempfile.TemporaryDirectory() as directory:
+            config_manager.CONFIG_PATH = Path(directory) / "config.yaml"
+            config_manager.CONFIG_PATH.write_text(
+                "expansion:\n"
+                "  cache_size: 10\n"
+                "  max_hops: 3\n"
+                "  shorteners: ['acortar.link']\n"
+                "  hedging: True\n"
+                "  hedge_budget: 0.2\n",
+                encoding="utf-8",
+            )
+            config_manager.CREATORS_CONFIG_PATH = Path(directory) / "creators.yaml"
+            config_manager.CREATORS_CONFIG_PATH.write_text("users: []\n")
+
+            config_manager.load_configuration()
+
+        self.assertEqual(config_manager.expansion_cache_size, 10)
+        self.assertEqual(config_manager.expansion_max_hops, 3)
+        self.assertEqual(config_manager.expansion_shorteners, ["acortar.link"])
+        self.assertTrue(config_manager.expansion_hedging)
+        self.assertEqual(config_manager.expansion_hedge_budget, 0.2)
+        self.assertEqual(config_manager.expansion_hedge_percentile, 0.9)
+
+    def test_snapshot_swapped_after_reload(self) -> None:
+        """Test: A reload publishes a new snapshot at the end and leaves the previous one intact."""
+        config_manager = ConfigurationManager()
+        with tempfile.TemporaryDirectory() as directory:
+            config_manager.CONFIG_PATH = Path(directory) / "config.yaml"
+            config_manager.CONFIG_PATH.write_text(
+                "amazon:\n  amazon.es: first-21\n", encoding="utf-8"
+            )
+            config_manager.CREATORS_CONFIG_PATH = Path(directory) / "creators.yaml"
+            config_manager.CREATORS_CONFIG_PATH.write_text("users: []\n")
+            config_manager.load_configuration()
+            pinned = config_manager.snapshot
+
+            published_while_loading = []
+            config_manager.CONFIG_PATH.write_text(
+                "amazon:\n  amazon.es: second-21\n", encoding="utf-8"
+            )
+            config_manager.last_load_time = None
+            with patch.object(
+                config_manager,
+                "_load_creators_configurations",
+                side_effect=lambda _: published_while_loading.append(
+                    config_manager.snapshot
+                ),
+            ):
+                config_manager.load_configuration()
+
+        self.assertIs(published_while_loading[0], pinned)
+        self.assertIsNot(config_manager.snapshot, pinned)
+        self.assertEqual(
+            pinned.all_users_configurations["main"].amazon.advertisers,
+            {"amazon.es": "first-21"},
+        )
+        self.assertEqual(
+            config_manager.snapshot.all_users_configurations["main"].amazon.advertisers,
+            {"amazon.es": "second-21"},
+        )
+        self.assertIn("amazon.es", pinned.domain_users)
+
+    def test_seeded_user_selection(self) -> None:
+        """Test: With a random seed, every load selects the same users in the same order."""
+        selections = []
+        with tempfile.TemporaryDirectory() as directory:
+            for _ in range(2):
+                config_manager = ConfigurationManager()
+                config_manager.CONFIG_PATH = Path(directory) / "config.yaml"
+                config_manager.CONFIG_PATH.write_text(
+                    "affiliate_settings:\n"
+                    "  creator_affiliate_percentage: 50\n"
+                    "  random_seed: 7\n",
+                    encoding="utf-8",
+                )
+                config_manager.CREATORS_CONFIG_PATH = Path(directory) / "creators.yaml"
+                config_manager.CREATORS_CONFIG_PATH.write_text("users: []\n")
+                config_manager.load_configuration()
+                domain_users = DomainUsers(("main", "creator"), (50, 100))
+                selections.append(
+                    [domain_users.select(config_manager.user_random) for _ in range(20)]
+                )
+
+        self.assertEqual(selections[0], selections[1])
+        self.assertEqual(set(selections[0]), {"main", "creator"})
+
+    def test_affiliate_templates_prefilled(self) -> None:
+        """Test: The affiliate templates are prefilled for each user and store at load."""
+        config_manager = ConfigurationManager()
+        with tempfile.TemporaryDirectory() as directory:
+            config_manager.CONFIG_PATH = Path(directory) / "config.yaml"
+            config_manager.CONFIG_PATH.write_text(
+                "awin:\n"
+                "  publisher_id: 'publisher-1'\n"
+                "  advertisers:\n"
+                "    Example.com: '12345'\n",
+                encoding="utf-8",
+            )
+            config_manager.CREATORS_CONFIG_PATH = Path(directory) / "creators.yaml"
+            config_manager.CREATORS_CONFIG_PATH.write_text("users: []\n")
+
+            config_manager.load_configuration()
+
+        template = config_manager.affiliate_templates[("awin", "main", "example.com")]
+        self.assertEqual(
+            template.render("https://www.example.com/product?ref=1"),
+            "https://www.awin1.com/cread.php?awinmid=12345&awinaffid=publisher-1"
+            "&ued=https://www.example.com/product",
+        )
+
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,32 @@
+"""Tests for the registrable domain resolver."""
+
+import unittest
+
+from links.domains import registrable_domain
+
+
+class TestRegistrableDomain(unittest.TestCase):
+    """Tests for registrable_domain."""
+
+    def test_registrable_domain(self) -> None:
+        """Test: The registrable domain handles multi label public suffixes."""
+        self.assertEqual(registrable_domain("www.amazon.co.uk"), "amazon.co.uk")
+        self.assertEqual(registrable_domain("s.click.aliexpress.com"), "aliexpress.com")
+        self.assertEqual(registrable_domain("amzn.to"), "amzn.to")
+
+    def test_no_host(self) -> None:
+        """Test: There is no registrable domain without a host."""
+        self.assertIsNone(registrable_domain(None))
+        self.assertIsNone(registrable_domain(""))
+
+    def test_repeated_hosts_memoized(self) -> None:
+        """Test: Repeated hosts are served from the memo cache."""
+        registrable_domain.cache_clear()
+        registrable_domain("www.amazon.es")
+        registrable_domain("www.amazon.es")
+
+        self.assertEqual(registrable_domain.cache_info().hits, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
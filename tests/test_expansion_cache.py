@@ -0,0 +1,93 @@
+"""Tests for the ExpansionCache class."""
+
+import unittest
+
+from links.cache import ExpansionCache
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self) -> None:
+        """Start the clock at zero."""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """Return the current time."""
+        return self.now
+
+
+class TestExpansionCache(unittest.TestCase):
+    """Tests for ExpansionCache."""
+
+    def setUp(self) -> None:
+        """Set up a small cache driven by a fake clock."""
+        self.clock = FakeClock()
+        self.cache = ExpansionCache(
+            max_size=2, ttl=100, negative_ttl=10, clock=self.clock
+        )
+
+    def test_miss_and_hit(self) -> None:
+        """Test: Lookups count misses until the URL is stored, and hits afterwards."""
+        self.assertEqual(self.cache.lookup("https://amzn.to/a"), (False, None))
+
+        self.cache.store("https://amzn.to/a", "https://www.amazon.es/dp/A")
+
+        self.assertEqual(
+            self.cache.lookup("https://amzn.to/a"),
+            (True, "https://www.amazon.es/dp/A"),
+        )
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 1, "size": 1})
+
+    def test_entries_expire(self) -> None:
+        """Test: Entries are not returned after their TTL."""
+        self.cache.store("https://amzn.to/a", "https://www.amazon.es/dp/A")
+        self.clock.now = 100
+
+        self.assertEqual(self.cache.lookup("https://amzn.to/a"), (False, None))
+        self.assertEqual(len(self.cache), 0)
+
+    def test_negative_entries_use_negative_ttl(self) -> None:
+        """Test: Failed expansions are cached for the negative TTL only."""
+        self.cache.store("https://dead.link/a", None)
+
+        self.clock.now = 5
+        self.assertEqual(self.cache.lookup("https://dead.link/a"), (True, None))
+
+        self.clock.now = 10
+        self.assertEqual(self.cache.lookup("https://dead.link/a"), (False, None))
+
+    def test_partial_entries_use_negative_ttl(self) -> None:
+        """Test: Partial expansions are cached for the negative TTL only."""
+        self.cache.store("https://loop.link/a", "https://loop.link/b", partial=True)
+
+        self.clock.now = 5
+        self.assertEqual(
+            self.cache.lookup("https://loop.link/a"), (True, "https://loop.link/b")
+        )
+
+        self.clock.now = 10
+        self.assertEqual(self.cache.lookup("https://loop.link/a"), (False, None))
+
+    def test_least_recently_used_entry_evicted(self) -> None:
+        """Test: The least recently used entry is evicted when the cache is full."""
+        self.cache.store("https://amzn.to/a", "https://www.amazon.es/dp/A")
+        self.cache.store("https://amzn.to/b", "https://www.amazon.es/dp/B")
+        self.cache.lookup("https://amzn.to/a")
+
+        self.cache.store("https://amzn.to/c", "https://www.amazon.es/dp/C")
+
+        self.assertTrue(self.cache.lookup("https://amzn.to/a")[0])
+        self.assertFalse(self.cache.lookup("https://amzn.to/b")[0])
+        self.assertTrue(self.cache.lookup("https://amzn.to/c")[0])
+
+    def test_disabled_cache(self) -> None:
+        """Test: A cache with size zero stores nothing."""
+        cache = ExpansionCache(max_size=0, ttl=100, negative_ttl=10)
+        cache.store("https://amzn.to/a", "https://www.amazon.es/dp/A")
+
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+"""Tests for the ExpansionStore class."""
+
+from pathlib import Path
+import tempfile
+import unittest
+
+from links.store import ExpansionStore
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self) -> None:
+        """Start the clock at zero."""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """Return the current time."""
+        return self.now
+
+
+class TestExpansionStore(unittest.TestCase):
+    """Tests for ExpansionStore."""
+
+    def setUp(self) -> None:
+        """Set up a store in a temporary directory."""
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = Path(self.directory.name) / "cache" / "expansions.sqlite3"
+        self.clock = FakeClock()
+        self.store = ExpansionStore(self.path, ttl=100, clock=self.clock)
+
+    def tearDown(self) -> None:
+        """Close the store and remove the temporary directory."""
+        self.store.close()
+        self.directory.cleanup()
+
+    def test_put_and_get(self) -> None:
+        """Test: A stored expansion is returned."""
+        self.store.put("https://amzn.to/a", "https://www.amazon.es/dp/A")
+
+        self.assertEqual(
+            self.store.get("https://amzn.to/a"), "https://www.amazon.es/dp/A"
+        )
+        self.assertIsNone(self.store.get("https://amzn.to/b"))
+
+    def test_expansions_survive_reopening(self) -> None:
+        """Test: Expansions are kept when the store is opened again."""
+        self.store.put("https://amzn.to/a", "https://www.amazon.es/dp/A")
+        self.store.close()
+
+        self.store = ExpansionStore(self.path, ttl=100, clock=self.clock)
+
+        self.assertEqual(
+            self.store.get("https://amzn.to/a"), "https://www.amazon.es/dp/A"
+        )
+
+    def test_expired_expansions_ignored_and_compacted(self) -> None:
+        """Test: Expired expansions are not returned and are removed on compaction."""
+        self.store.put("https://amzn.to/a", "https://www.amazon.es/dp/A")
+        self.clock.now = 50
+        self.store.put("https://amzn.to/b", "https://www.amazon.es/dp/B")
+        self.clock.now = 100
+
+        self.assertIsNone(self.store.get("https://amzn.to/a"))
+        self.assertEqual(self.store.compact(), 1)
+        self.assertEqual(
+            self.store.get("https://amzn.to/b"), "https://www.amazon.es/dp/B"
+        )
+
+
+class TestExpansionStoreAsync(unittest.IsolatedAsyncioTestCase):
+    """Tests for the event loop access to ExpansionStore."""
+
+    async def test_aput_and_aget(self) -> None:
+        """Test: Expansions are stored and read from the event loop through a worker thread."""
+        with tempfile.TemporaryDirectory() as directory:
+            store = ExpansionStore(Path(directory) / "expansions.sqlite3", ttl=100)
+            await store.aput("https://amzn.to/a", "https://www.amazon.es/dp/A")
+            expanded_url = await store.aget("https://amzn.to/a")
+            store.close()
+
+        self.assertEqual(expanded_url, "https://www.amazon.es/dp/A")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+"""Tests for the HandlerRegistry class."""
+
+from datetime import datetime, timezone
+import unittest
+
+from config import ConfigurationManager
+from handlers.aliexpress_handler import AliexpressHandler
+from handlers.pattern_handler import PatternHandler
+from handlers.registry import HandlerRegistry
+
+
+class TestHandlerRegistry(unittest.TestCase):
+    """Tests for HandlerRegistry."""
+
+    def setUp(self) -> None:
+        """Set up a registry over a fresh configuration."""
+        self.config_manager = ConfigurationManager()
+        self.registry = HandlerRegistry(self.config_manager)
+
+    def test_handlers_shared(self) -> None:
+        """Test: The same handler instance is returned for every update."""
+        handler = self.registry.get(PatternHandler)
+
+        self.assertIsInstance(handler, PatternHandler)
+        self.assertIs(self.registry.get(PatternHandler), handler)
+        self.assertIsInstance(self.registry.get(AliexpressHandler), AliexpressHandler)
+
+    def test_handlers_rebuilt_after_reload(self) -> None:
+        """Test: Handlers are built again once the configuration is reloaded."""
+        handler = self.registry.get(PatternHandler)
+
+        self.config_manager.last_load_time = datetime.now(timezone.utc)
+
+        self.assertIsNot(self.registry.get(PatternHandler), handler)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""Tests for hedged requests."""
+
+import asyncio
+import unittest
+
+from links.hedging import HedgeBudget, hedged
+
+
+class TestHedgeBudget(unittest.TestCase):
+    """Tests for HedgeBudget."""
+
+    def test_hedges_limited_to_ratio(self) -> None:
+        """Test: No more than the configured share of requests are hedged."""
+        budget = HedgeBudget(0.1)
+        for _ in range(100):
+            budget.record_request()
+            budget.try_acquire()
+
+        self.assertEqual(budget.requests, 100)
+        self.assertLessEqual(budget.hedges, 10)
+        self.assertGreater(budget.hedges, 0)
+
+    def test_no_hedge_without_requests(self) -> None:
+        """Test: Hedges are not allowed before enough requests were made."""
+        budget = HedgeBudget(0.5)
+        budget.record_request()
+
+        self.assertFalse(budget.try_acquire())
+
+
+class TestHedged(unittest.IsolatedAsyncioTestCase):
+    """Tests for hedged."""
+
+    def setUp(self) -> None:
+        """Set up a budget that always allows a hedge."""
+        self.budget = HedgeBudget(1)
+        self.budget.record_request()
+
+    async def test_fast_call_not_hedged(self) -> None:
+        """Test: A call answering before the delay is made only once."""
+        calls = []
+
+        async def call() -> str:
+            calls.append(1)
+            return "result"
+
+        self.assertEqual(await hedged(call, 0.1, self.budget), "result")
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(self.budget.hedges, 0)
+
+    async def test_slow_call_hedged(self) -> None:
+        """Test: A slow call is sent again and the first answer is used."""
+        delays = [10, 0]
+        cancelled = []
+
+        async def call() -> int:
+            delay = delays.pop(0)
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                cancelled.append(delay)
+                raise
+            return delay
+
+        self.assertEqual(await hedged(call, 0.01, self.budget), 0)
+        await asyncio.sleep(0)
+        self.assertEqual(cancelled, [10])
+        self.assertEqual(self.budget.hedges, 1)
+
+    async def test_failed_hedge_waits_for_first_call(self) -> None:
+        """Test: If the hedge fails, the result of the first call is used."""
+        calls = []
+
+        async def call() -> str:
+            calls.append(1)
+            if len(calls) > 1:
+                message = "hedge failed"
+                raise ValueError(message)
+            await asyncio.sleep(0.05)
+            return "first"
+
+        self.assertEqual(await hedged(call, 0.01, self.budget), "first")
+
+    async def test_no_hedge_without_budget(self) -> None:
+        """Test: The call is not sent again when the budget is spent."""
+        calls = []
+
+        async def call() -> str:
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return "result"
+
+        self.assertEqual(await hedged(call, 0.01, HedgeBudget(0)), "result")
+        self.assertEqual(len(calls), 1)
+
+    async def test_error_returned_when_all_calls_fail(self) -> None:
+        """Test: The error of the last call is raised when every call fails."""
+
+        async def call() -> str:
+            await asyncio.sleep(0.02)
+            message = "failed"
+            raise ValueError(message)
+
+        task = asyncio.ensure_future(hedged(call, 0.01, self.budget))
+        await asyncio.wait({task})
+
+        self.assertIsInstance(task.exception(), ValueError)
+
+
+if __name__ == "__main__":
+    unittest.main()
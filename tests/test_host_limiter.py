@@ -0,0 +1,90 @@
+"""Tests for the HostLimiter class."""
+# ruff: noqa: SLF001
+
+import asyncio
+import unittest
+
+from links.limits import HostLimiter
+
+
+class TestHostLimiter(unittest.IsolatedAsyncioTestCase):
+    """Tests for HostLimiter."""
+
+    def setUp(self) -> None:
+        """Set up a limiter allowing two parallel requests per host."""
+        self.limiter = HostLimiter(max_per_host=2, min_timeout=1, max_timeout=10)
+
+    def test_unknown_host_uses_max_timeout(self) -> None:
+        """Test: Hosts without enough samples get the highest timeout."""
+        self.limiter.record("amzn.to", 0.1)
+
+        self.assertEqual(self.limiter.timeout_for("amzn.to"), 10)
+        self.assertEqual(self.limiter.timeout_for("bit.ly"), 10)
+
+    def test_timeout_adapted_to_latency(self) -> None:
+        """Test: The timeout follows the observed latency percentile."""
+        for _ in range(20):
+            self.limiter.record("bit.ly", 2)
+
+        self.assertEqual(self.limiter.timeout_for("bit.ly"), 4)
+
+    def test_timeout_clamped(self) -> None:
+        """Test: The adapted timeout stays between the floor and the ceiling."""
+        for _ in range(20):
+            self.limiter.record("amzn.to", 0.05)
+            self.limiter.record("slow.link", 30)
+
+        self.assertEqual(self.limiter.timeout_for("amzn.to"), 1)
+        self.assertEqual(self.limiter.timeout_for("slow.link"), 10)
+
+    def test_latency_percentile(self) -> None:
+        """Test: The latency percentile is only known after enough samples."""
+        self.assertIsNone(self.limiter.latency_percentile("bit.ly", 0.9))
+        for latency in range(1, 11):
+            self.limiter.record("bit.ly", latency)
+
+        self.assertEqual(self.limiter.latency_percentile("bit.ly", 0.9), 10)
+        self.assertEqual(self.limiter.latency_percentile("bit.ly", 0.5), 6)
+
+    async def test_parallel_requests_limited_per_host(self) -> None:
+        """Test: No more than max_per_host requests run at once for the same host."""
+        in_flight = {"amzn.to": 0, "bit.ly": 0}
+        max_in_flight = {"amzn.to": 0, "bit.ly": 0}
+
+        async def request(host: str) -> None:
+            async with self.limiter.limit(host):
+                in_flight[host] += 1
+                max_in_flight[host] = max(max_in_flight[host], in_flight[host])
+                await asyncio.sleep(0.01)
+                in_flight[host] -= 1
+
+        await asyncio.gather(
+            *(request("amzn.to") for _ in range(5)),
+            *(request("bit.ly") for _ in range(2)),
+        )
+
+        self.assertEqual(max_in_flight, {"amzn.to": 2, "bit.ly": 2})
+
+    async def test_limit_records_latency(self) -> None:
+        """Test: Requests made inside the limit are timed."""
+        for _ in range(5):
+            async with self.limiter.limit("amzn.to") as timeout:
+                self.assertEqual(timeout, 10)
+
+        self.assertEqual(self.limiter.timeout_for("amzn.to"), 1)
+
+    async def test_idle_hosts_forgotten(self) -> None:
+        """Test: Idle hosts keep no semaphore and only the recent hosts keep latencies."""
+        limiter = HostLimiter(max_hosts=2)
+        for host in ("a.link", "b.link", "c.link"):
+            async with limiter.limit(host):
+                self.assertIn(host, limiter._semaphores)
+        limiter.record("b.link", 1)
+        limiter.record("d.link", 1)
+
+        self.assertEqual(limiter._semaphores, {})
+        self.assertEqual(list(limiter._latencies), ["b.link", "d.link"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,74 @@
+"""Tests for the link prefilter."""
+
+import unittest
+
+from handlers.patterns import PLATFORM_DOMAINS
+from links.prefilter import LinkPrefilter
+from links.shorteners import DEFAULT_SHORTENER_HOSTS
+from telegram import MessageEntity
+
+
+class TestLinkPrefilter(unittest.TestCase):
+    """Tests for LinkPrefilter."""
+
+    def setUp(self) -> None:
+        """Set up a prefilter with a store, a platform and a shortener."""
+        self.prefilter = LinkPrefilter(
+            ["pccomponentes.com", "amazon.", "amazon.es", "amzn.to"]
+        )
+
+    def test_keywords_contained_in_shorter_ones_dropped(self) -> None:
+        """Test: Keywords matching only where a shorter keyword matches are not searched."""
+        self.assertEqual(
+            self.prefilter.keywords, ("amazon.", "amzn.to", "pccomponentes.com")
+        )
+
+    def test_matches(self) -> None:
+        """Test: Texts mentioning a domain match, in any case."""
+        self.assertTrue(self.prefilter.matches("Mira https://www.Amazon.es/dp/B01"))
+        self.assertTrue(self.prefilter.matches("https://amzn.to/abc"))
+        self.assertFalse(self.prefilter.matches("Read https://example.org/news"))
+        self.assertFalse(self.prefilter.matches(None))
+
+    def test_keywords_anchored_to_host_names(self) -> None:
+        """Test: Short domains only match whole parts of a host name."""
+        prefilter = LinkPrefilter(["t.co", "a.co", "t.ly", "bit.ly", "amazon."])
+
+        self.assertEqual(
+            prefilter.keywords, ("a.co", "t.co", "t.ly", "bit.ly", "amazon.")
+        )
+        self.assertFalse(prefilter.matches("https://www.reddit.com/r/deals"))
+        self.assertFalse(prefilter.matches("https://www.marca.com/news"))
+        self.assertTrue(prefilter.matches("https://t.co/abc"))
+        self.assertTrue(prefilter.matches("https://bit.ly/abc"))
+        self.assertTrue(prefilter.matches("https://www.amazon.es/dp/B01"))
+        self.assertFalse(prefilter.matches("https://www.myamazon.es/dp/B01"))
+
+    def test_default_domains_reject_other_sites(self) -> None:
+        """Test: The platform and shortener domains do not match common sites."""
+        prefilter = LinkPrefilter([*PLATFORM_DOMAINS, *DEFAULT_SHORTENER_HOSTS])
+
+        self.assertFalse(prefilter.matches("https://www.reddit.com/r/deals"))
+        self.assertTrue(prefilter.matches("https://bit.ly/abc"))
+
+    def test_matches_message_text_links(self) -> None:
+        """Test: Hyperlinks hidden behind text are checked too."""
+        entities = [
+            MessageEntity(
+                type="text_link",
+                offset=0,
+                length=4,
+                url="https://www.pccomponentes.com/item",
+            )
+        ]
+
+        self.assertTrue(self.prefilter.matches_message("Look", entities))
+        self.assertFalse(self.prefilter.matches_message("Look"))
+
+    def test_no_domains(self) -> None:
+        """Test: A prefilter without domains matches nothing."""
+        self.assertFalse(LinkPrefilter([]).matches("https://amzn.to/abc"))
+
+
+if __name__ == "__main__":
+    unittest.main()
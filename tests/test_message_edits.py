@@ -0,0 +1,44 @@
+"""Tests for the MessageEdits class."""
+
+import unittest
+
+from handlers.message_edits import MessageEdits
+
+
+class TestMessageEdits(unittest.TestCase):
+    """Tests for MessageEdits."""
+
+    def test_replacements_applied_once(self) -> None:
+        """Test: Replacements of several handlers are applied in a single pass."""
+        edits = MessageEdits("a https://x.com/1 b https://y.com/2 c")
+        edits.replace(20, 35, "Y")
+        edits.replace(2, 17, "X")
+
+        self.assertEqual(edits.apply(), "a X b Y c")
+
+    def test_overlapping_replacement_ignored(self) -> None:
+        """Test: A span that overlaps a replaced span is not replaced again."""
+        edits = MessageEdits("see https://x.com/1")
+
+        self.assertTrue(edits.replace(4, 19, "first"))
+        self.assertFalse(edits.replace(4, 19, "second"))
+        self.assertEqual(edits.apply(), "see first")
+
+    def test_footers_added_once(self) -> None:
+        """Test: The same footer added by several handlers appears once."""
+        edits = MessageEdits("text")
+        edits.add_footer("Discount codes")
+        edits.add_footer("Discount codes")
+
+        self.assertEqual(edits.apply(), "text\n\nDiscount codes")
+
+    def test_no_edits(self) -> None:
+        """Test: Edits without replacements nor footers are empty."""
+        edits = MessageEdits("text")
+
+        self.assertFalse(edits)
+        self.assertEqual(edits.apply(), "text")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,122 @@
+"""Tests for the message parser."""
+
+import unittest
+
+from links.parser import has_link_entities, parse_message, parse_message_entities
+from telegram import MessageEntity
+
+
+class TestParseMessage(unittest.TestCase):
+    """Tests for parse_message."""
+
+    def test_urls_parsed_with_position(self) -> None:
+        """Test: Every URL is found with its position, components and domain."""
+        text = "Look https://www.amazon.co.uk/dp/B01?th=1 and http://bit.ly/x"
+
+        parsed_message = parse_message(text)
+
+        first, second = parsed_message.urls
+        self.assertEqual(first.url, "https://www.amazon.co.uk/dp/B01?th=1")
+        self.assertEqual(text[first.start : first.end], first.url)
+        self.assertEqual(first.parts.path, "/dp/B01")
+        self.assertEqual(first.query, {"th": ["1"]})
+        self.assertEqual(first.domain, "amazon.co.uk")
+        self.assertEqual(second.domain, "bit.ly")
+        self.assertEqual(parsed_message.domains, {"amazon.co.uk", "bit.ly"})
+
+    def test_wrapper_target_unwrapped(self) -> None:
+        """Test: The target of wrapper URLs is the wrapped URL."""
+        parsed_message = parse_message(
+            "https://www.awin1.com/cread.php?awinmid=1&ued=https://www.pccomponentes.com/p"
+        )
+
+        self.assertEqual(
+            parsed_message.urls[0].target, "https://www.pccomponentes.com/p"
+        )
+
+    def test_invalid_urls_skipped(self) -> None:
+        """Test: URLs that cannot be parsed are left out."""
+        parsed_message = parse_message("Broken http://[::1 and ftp://files.com")
+
+        self.assertEqual(parsed_message.urls, ())
+
+    def test_replace_urls(self) -> None:
+        """Test: Replaced URLs are parsed again and the others are moved."""
+        parsed_message = parse_message(
+            "A https://amzn.to/abc then https://www.amazon.es/dp/B01 end"
+        )
+
+        replaced = parsed_message.replace_urls(
+            {"https://amzn.to/abc": "https://www.amazon.com/dp/B08XYZ123"}
+        )
+
+        self.assertEqual(
+            replaced.text,
+            "A https://www.amazon.com/dp/B08XYZ123 then https://www.amazon.es/dp/B01 end",
+        )
+        for parsed_url in replaced.urls:
+            self.assertEqual(
+                replaced.text[parsed_url.start : parsed_url.end], parsed_url.url
+            )
+        self.assertEqual(replaced.domains, {"amazon.com", "amazon.es"})
+
+
+class TestParseMessageEntities(unittest.TestCase):
+    """Tests for parse_message_entities."""
+
+    def test_utf16_offsets(self) -> None:
+        """Test: Entity offsets counted in UTF-16 units are mapped to the text."""
+        text = "😀😀 https://bit.ly/x"
+
+        parsed_message = parse_message_entities(
+            text, [MessageEntity(type="url", offset=5, length=16)]
+        )
+
+        (parsed_url,) = parsed_message.urls
+        self.assertEqual(parsed_url.url, "https://bit.ly/x")
+        self.assertEqual(text[parsed_url.start : parsed_url.end], parsed_url.url)
+
+    def test_text_link_written_out(self) -> None:
+        """Test: Hyperlinks hidden behind text are written after their text."""
+        parsed_message = parse_message_entities(
+            "Buy it here now",
+            [
+                MessageEntity(
+                    type="text_link", offset=4, length=7, url="https://amzn.to/abc"
+                )
+            ],
+        )
+
+        (parsed_url,) = parsed_message.urls
+        self.assertEqual(parsed_message.text, "Buy it here (https://amzn.to/abc) now")
+        self.assertEqual(
+            parsed_message.text[parsed_url.start : parsed_url.end], parsed_url.url
+        )
+
+    def test_links_without_scheme_ignored(self) -> None:
+        """Test: Links without an http scheme and other entities are ignored."""
+        text = "See amazon.es/dp/B01 now"
+
+        parsed_message = parse_message_entities(
+            text,
+            [
+                MessageEntity(type="url", offset=4, length=16),
+                MessageEntity(type="bold", offset=21, length=3),
+            ],
+        )
+
+        self.assertEqual(parsed_message.text, text)
+        self.assertEqual(parsed_message.urls, ())
+
+    def test_has_link_entities(self) -> None:
+        """Test: Only url and text_link entities are links."""
+        self.assertTrue(
+            has_link_entities([MessageEntity(type="url", offset=0, length=1)])
+        )
+        self.assertFalse(
+            has_link_entities([MessageEntity(type="mention", offset=0, length=1)])
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
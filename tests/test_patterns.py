@@ -0,0 +1,56 @@
+"""Tests for the platform patterns."""
+
+import unittest
+
+from handlers.patterns import detect_platform
+
+
+class TestDetectPlatform(unittest.TestCase):
+    """Tests for detect_platform."""
+
+    def test_platform_detected(self) -> None:
+        """Test: Each platform is detected from its links."""
+        cases = {
+            "https://www.aliexpress.com/item/1005001234567890.html": "aliexpress",
+            "https://es.aliexpress.com/item/1.html": "aliexpress",
+            "https://www.awin1.com/cread.php?awinmid=1&ued=https://shop.com": "awin",
+            "https://wextap.com/g/abc/?ulp=https://shop.com": "admitad",
+            "https://clk.tradedoubler.com/cread.php?p=1&url=https://shop.com": "tradedoubler",
+            "https://www.amazon.co.uk/dp/B01": "amazon",
+            "https://amzn.to/abc123": "amazon",
+        }
+
+        for url, platform in cases.items():
+            with self.subTest(url=url):
+                self.assertEqual(detect_platform(url), platform)
+
+    def test_no_platform_without_url(self) -> None:
+        """Test: Text that is not an http URL has no platform."""
+        self.assertIsNone(detect_platform("ftp://files.com/a"))
+        self.assertIsNone(detect_platform("not a link"))
+
+    def test_no_platform_for_other_sites(self) -> None:
+        """Test: Links to sites of no platform are not detected as Amazon links."""
+        self.assertIsNone(detect_platform("https://example.org/"))
+        self.assertIsNone(detect_platform("https://www.pccomponentes.com/product"))
+        self.assertIsNone(detect_platform("https://www.amazon.es.example.org/dp/A"))
+        self.assertEqual(detect_platform("https://www.amazon.es"), "amazon")
+
+    def test_no_platform_for_lookalike_hosts(self) -> None:
+        """Test: Hosts that only start like the host of a platform are not detected."""
+        urls = (
+            "https://aliexpress.comevil.net/item/1.html",
+            "https://es.aliexpress.com.evil.example/item/1.html",
+            "https://www.awin1.com.evil.example/cread.php?ued=https://shop.com",
+            "https://wextap.com.evil.example/g/abc/?ulp=https://shop.com",
+            "https://wextap.com/gx?ulp=https://shop.com",
+            "https://clk.tradedoubler.com/cread.phpx?url=https://shop.com",
+        )
+
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertIsNone(detect_platform(url))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,230 @@
+"""Tests for the redirect resolver."""
+# ruff: noqa: SLF001
+
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+import unittest
+
+import httpx
+from links.hedging import HedgeBudget, HedgePolicy
+from links.limits import HostLimiter
+from links.resolver import resolve_redirects
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+
+class TrackedStream(httpx.AsyncByteStream):
+    """Response body that records whether it was read."""
+
+    def __init__(self, size: int) -> None:
+        """Create a body of the given size."""
+        self.size = size
+        self.read = False
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        """Yield the body in 1 KiB chunks."""
+        self.read = True
+        for _ in range(0, self.size, 1024):
+            yield b"x" * 1024
+
+
+class LimitCheckedStream(httpx.AsyncByteStream):
+    """Redirect body that records whether the host slot is held while it is read."""
+
+    def __init__(self, limiter: HostLimiter, host: str) -> None:
+        """Create a body checking the slot of a host in a limiter."""
+        self.limiter = limiter
+        self.host = host
+        self.slot_held: bool | None = None
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        """Record whether the host slot is held, and yield a small body."""
+        semaphore = self.limiter._semaphores.get(self.host)
+        self.slot_held = semaphore is not None and semaphore.locked()
+        yield b"moved"
+
+
+class TestResolveRedirects(unittest.IsolatedAsyncioTestCase):
+    """Tests for resolve_redirects function."""
+
+    def setUp(self) -> None:
+        """Set up the request log and the final page body."""
+        self.methods: list[str] = []
+        self.page = TrackedStream(3 * 1024 * 1024)
+
+    def build_client(self, routes: dict[str, httpx.Response]) -> httpx.AsyncClient:
+        """Build a client answering each URL with a copy of the routed response."""
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.methods.append(request.method)
+            response = routes.get(str(request.url))
+            if response is None:
+                return httpx.Response(200, stream=self.page)
+            return httpx.Response(
+                response.status_code, headers=response.headers, stream=response.stream
+            )
+
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler))
+
+    async def test_chain_resolved_without_reading_final_page(self) -> None:
+        """Test: Every hop is returned and the destination page is never read."""
+        client = self.build_client(
+            {
+                "https://amzn.to/a": httpx.Response(
+                    301, headers={"Location": "https://www.amazon.es/gp/r/a"}
+                ),
+                "https://www.amazon.es/gp/r/a": httpx.Response(
+                    302, headers={"Location": "/dp/B08N5WRWNW"}
+                ),
+            }
+        )
+
+        chain = await resolve_redirects(
+            client, "https://amzn.to/a", max_hops=10, max_bytes=1024
+        )
+        await client.aclose()
+
+        self.assertEqual(
+            chain.urls,
+            (
+                "https://amzn.to/a",
+                "https://www.amazon.es/gp/r/a",
+                "https://www.amazon.es/dp/B08N5WRWNW",
+            ),
+        )
+        self.assertEqual(chain.final_url, "https://www.amazon.es/dp/B08N5WRWNW")
+        self.assertTrue(chain.complete)
+        self.assertEqual(self.methods, ["HEAD", "HEAD", "HEAD"])
+        self.assertFalse(self.page.read)
+
+    async def test_get_used_when_head_not_allowed(self) -> None:
+        """Test: A streamed GET is sent when the server rejects HEAD."""
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.methods.append(request.method)
+            if request.method == "HEAD":
+                return httpx.Response(405)
+            if request.url.host == "bit.ly":
+                return httpx.Response(
+                    301, headers={"Location": "https://www.amazon.es/dp/A"}
+                )
+            return httpx.Response(200, stream=self.page)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        chain = await resolve_redirects(
+            client, "https://bit.ly/a", max_hops=10, max_bytes=1024
+        )
+        await client.aclose()
+
+        self.assertEqual(chain.final_url, "https://www.amazon.es/dp/A")
+        self.assertEqual(self.methods, ["HEAD", "GET", "HEAD", "GET"])
+        self.assertFalse(self.page.read)
+
+    async def test_hop_limit(self) -> None:
+        """Test: Resolution stops when the maximum number of hops is reached."""
+        client = self.build_client(
+            {
+                f"https://loop.link/{hop}": httpx.Response(
+                    302, headers={"Location": f"https://loop.link/{hop + 1}"}
+                )
+                for hop in range(10)
+            }
+        )
+
+        chain = await resolve_redirects(
+            client, "https://loop.link/0", max_hops=3, max_bytes=1024
+        )
+        await client.aclose()
+
+        self.assertFalse(chain.complete)
+        self.assertEqual(len(chain.urls), 4)
+        self.assertEqual(chain.final_url, "https://loop.link/3")
+
+    async def test_byte_limit(self) -> None:
+        """Test: Resolution stops when redirect bodies exceed the byte limit."""
+        client = self.build_client(
+            {
+                "https://bit.ly/a": httpx.Response(
+                    301,
+                    headers={"Location": "https://bit.ly/b"},
+                    stream=TrackedStream(4096),
+                ),
+                "https://bit.ly/b": httpx.Response(
+                    301, headers={"Location": "https://www.amazon.es/dp/A"}
+                ),
+            }
+        )
+
+        chain = await resolve_redirects(
+            client, "https://bit.ly/a", max_hops=10, max_bytes=1024
+        )
+        await client.aclose()
+
+        self.assertFalse(chain.complete)
+        self.assertEqual(chain.final_url, "https://bit.ly/b")
+
+    async def test_host_slot_held_while_draining(self) -> None:
+        """Test: The per host slot is held until the redirect body is drained."""
+        limiter = HostLimiter(max_per_host=1)
+        body = LimitCheckedStream(limiter, "bit.ly")
+        client = self.build_client(
+            {
+                "https://bit.ly/a": httpx.Response(
+                    301,
+                    headers={"Location": "https://www.amazon.es/dp/A"},
+                    stream=body,
+                ),
+            }
+        )
+
+        chain = await resolve_redirects(
+            client, "https://bit.ly/a", max_hops=10, max_bytes=1024, limiter=limiter
+        )
+        await client.aclose()
+
+        self.assertEqual(chain.final_url, "https://www.amazon.es/dp/A")
+        self.assertTrue(body.slot_held)
+
+    async def test_slow_hop_hedged(self) -> None:
+        """Test: Each hop is hedged against the usual latency of its own host."""
+        limiter = HostLimiter()
+        for _ in range(5):
+            limiter.record("www.amazon.es", 0.01)
+        hedge = HedgePolicy(0.9, HedgeBudget(1))
+        requests: list[str] = []
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            requests.append(str(request.url))
+            if request.url.host == "bit.ly":
+                return httpx.Response(
+                    301, headers={"Location": "https://www.amazon.es/dp/A"}
+                )
+            if requests.count(str(request.url)) == 1:
+                await asyncio.sleep(1)
+            return httpx.Response(200)
+
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        chain = await asyncio.wait_for(
+            resolve_redirects(
+                client,
+                "https://bit.ly/a",
+                max_hops=10,
+                max_bytes=1024,
+                limiter=limiter,
+                hedge=hedge,
+            ),
+            timeout=0.5,
+        )
+        await client.aclose()
+
+        self.assertEqual(chain.final_url, "https://www.amazon.es/dp/A")
+        self.assertEqual(requests.count("https://bit.ly/a"), 1)
+        self.assertEqual(requests.count("https://www.amazon.es/dp/A"), 2)
+        self.assertEqual(hedge.budget.hedges, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+"""Tests for the ShortenerRegistry class."""
+
+import unittest
+
+from links.resolver import RedirectChain
+from links.shorteners import DEFAULT_SHORTENER_HOSTS, ShortenerRegistry
+
+
+class FakeClock:
+    """Manually advanced clock."""
+
+    def __init__(self) -> None:
+        """Start the clock at zero."""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """Return the current time."""
+        return self.now
+
+
+class TestShortenerRegistry(unittest.TestCase):
+    """Tests for ShortenerRegistry."""
+
+    def setUp(self) -> None:
+        """Set up a registry with the default shorteners and some store domains."""
+        self.clock = FakeClock()
+        self.registry = ShortenerRegistry(
+            DEFAULT_SHORTENER_HOSTS.union({"acortar.link"}),
+            learned_ttl=100,
+            direct_domains={"amazon.es", "aliexpress.com"},
+            clock=self.clock,
+        )
+
+    def test_shorteners_always_expanded(self) -> None:
+        """Test: Known and configured shortener hosts are expanded."""
+        self.assertTrue(self.registry.should_expand("https://amzn.to/abc123"))
+        self.assertTrue(
+            self.registry.should_expand("https://s.click.aliexpress.com/e/xyz")
+        )
+        self.assertTrue(self.registry.should_expand("https://acortar.link/xyz"))
+
+    def test_full_store_links_not_expanded(self) -> None:
+        """Test: Links to store domains are not expanded."""
+        self.assertFalse(
+            self.registry.should_expand("https://www.amazon.es/dp/B08N5WRWNW")
+        )
+        self.assertFalse(
+            self.registry.should_expand("https://es.aliexpress.com/item/1.html")
+        )
+
+    def test_unknown_hosts_expanded(self) -> None:
+        """Test: Hosts never seen before are expanded."""
+        self.assertTrue(self.registry.should_expand("https://blog.example.com/post"))
+
+    def test_invalid_urls_not_expanded(self) -> None:
+        """Test: URLs without host are not expanded."""
+        self.assertFalse(self.registry.should_expand("https://"))
+
+    def test_non_redirecting_hosts_learned_and_aged(self) -> None:
+        """Test: Hosts answering without redirect are skipped until the knowledge expires."""
+        self.registry.learn(RedirectChain(("https://blog.example.com/post",), 200))
+
+        self.assertFalse(self.registry.should_expand("https://blog.example.com/other"))
+
+        self.clock.now = 100
+        self.assertTrue(self.registry.should_expand("https://blog.example.com/other"))
+
+    def test_redirecting_hosts_forgotten(self) -> None:
+        """Test: A learned host that redirects again is expanded again."""
+        self.registry.learn(RedirectChain(("https://blog.example.com/post",), 200))
+        self.registry.learn(
+            RedirectChain(
+                ("https://blog.example.com/go", "https://www.amazon.es/dp/A"), 301
+            )
+        )
+
+        self.assertTrue(self.registry.should_expand("https://blog.example.com/post"))
+
+    def test_error_answers_not_learned(self) -> None:
+        """Test: A host answering with an error status is still expanded."""
+        self.registry.learn(RedirectChain(("https://tidd.ly/abc",), 503))
+
+        self.assertTrue(self.registry.should_expand("https://tidd.ly/def"))
+
+    def test_shorteners_never_learned(self) -> None:
+        """Test: A shortener answering without redirect is still expanded."""
+        self.registry.learn(RedirectChain(("https://bit.ly/",), 200))
+
+        self.assertTrue(self.registry.should_expand("https://bit.ly/abc"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+"""Tests for the SingleFlight class."""
+
+import asyncio
+import unittest
+
+from links.singleflight import SingleFlight
+
+
+class TestSingleFlight(unittest.IsolatedAsyncioTestCase):
+    """Tests for SingleFlight."""
+
+    def setUp(self) -> None:
+        """Set up the single flight and a call counter."""
+        self.flight: SingleFlight[str] = SingleFlight()
+        self.calls = 0
+        self.release = asyncio.Event()
+
+    async def call(self) -> str:
+        """Count the call and wait until released."""
+        self.calls += 1
+        await self.release.wait()
+        return "https://www.amazon.es/dp/A"
+
+    async def test_identical_calls_coalesced(self) -> None:
+        """Test: Concurrent calls with the same key share one call."""
+        waiters = [
+            asyncio.create_task(self.flight.do("https://amzn.to/a", self.call))
+            for _ in range(5)
+        ]
+        await asyncio.sleep(0)
+        self.release.set()
+
+        results = await asyncio.gather(*waiters)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(set(results), {"https://www.amazon.es/dp/A"})
+        self.assertEqual(len(self.flight), 0)
+
+    async def test_different_keys_not_coalesced(self) -> None:
+        """Test: Calls with different keys run separately."""
+        self.release.set()
+
+        await asyncio.gather(
+            self.flight.do("https://amzn.to/a", self.call),
+            self.flight.do("https://amzn.to/b", self.call),
+        )
+
+        self.assertEqual(self.calls, 2)
+
+    async def test_cancelled_caller_does_not_cancel_others(self) -> None:
+        """Test: A caller giving up does not cancel the shared call."""
+        first = asyncio.create_task(self.flight.do("https://amzn.to/a", self.call))
+        second = asyncio.create_task(self.flight.do("https://amzn.to/a", self.call))
+        await asyncio.sleep(0)
+
+        first.cancel()
+        self.release.set()
+
+        self.assertEqual(await second, "https://www.amazon.es/dp/A")
+        self.assertTrue(first.cancelled())
+
+    async def test_exceptions_shared(self) -> None:
+        """Test: An exception of the shared call is raised to every caller."""
+
+        async def failing_call() -> str:
+            await asyncio.sleep(0)
+            message = "shortener down"
+            raise RuntimeError(message)
+
+        results = await asyncio.gather(
+            self.flight.do("https://amzn.to/a", failing_call),
+            self.flight.do("https://amzn.to/a", failing_call),
+            return_exceptions=True,
+        )
+
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,243 @@
+"""Tests for the URLExpander class."""
+# ruff: noqa: SLF001
+
+from __future__ import annotations
+
+import asyncio
+from pathlib import Path
+import tempfile
+import unittest
+
+from config import ConfigurationManager
+import httpx
+from links.expander import URLExpander
+
+
+def redirect_handler(request: httpx.Request) -> httpx.Response:
+    """Redirect the short URLs to product pages and answer anything else directly."""
+    if request.url.host == "dead.link":
+        message = "unreachable"
+        raise httpx.ConnectError(message, request=request)
+    if request.url.host == "loop.link":
+        return httpx.Response(301, headers={"Location": str(request.url)})
+    if request.url.host == "down.link":
+        return httpx.Response(503)
+    if request.url.path == "/dp/BLOCKED":
+        return httpx.Response(503)
+    if str(request.url) == "https://amzn.to/blocked":
+        return httpx.Response(
+            301, headers={"Location": "https://www.amazon.es/dp/BLOCKED"}
+        )
+    if request.url.host == "amzn.to":
+        return httpx.Response(
+            301, headers={"Location": "https://www.amazon.es/dp/B08N5WRWNW"}
+        )
+    return httpx.Response(200)
+
+
+class TestURLExpander(unittest.IsolatedAsyncioTestCase):
+    """Tests for URLExpander."""
+
+    def setUp(self) -> None:
+        """Set up an expander answering through a mock transport."""
+        self.requests: list[str] = []
+
+        def handler(request: httpx.Request) -> httpx.Response:
+            self.requests.append(str(request.url))
+            return redirect_handler(request)
+
+        self.expander = URLExpander(
+            ConfigurationManager(), transport=httpx.MockTransport(handler)
+        )
+
+    async def asyncTearDown(self) -> None:
+        """Close the shared client after each test."""
+        await self.expander.aclose()
+
+    async def test_expand_follows_redirects(self) -> None:
+        """Test: The expanded URL is the final URL of the redirect chain."""
+        expanded_url = await self.expander.expand("https://amzn.to/abc123")
+
+        self.assertEqual(expanded_url, "https://www.amazon.es/dp/B08N5WRWNW")
+
+    async def test_client_is_shared_between_expansions(self) -> None:
+        """Test: The same pooled client is reused for every expansion."""
+        await self.expander.expand("https://amzn.to/abc123")
+        client = self.expander._client
+        await self.expander.expand("https://amzn.to/def456")
+
+        self.assertIsNotNone(client)
+        self.assertIs(self.expander._client, client)
+
+    async def test_aclose_releases_client(self) -> None:
+        """Test: Closing the expander closes the client and a new one is created on demand."""
+        await self.expander.expand("https://amzn.to/abc123")
+        client = self.expander._client
+
+        await self.expander.aclose()
+
+        self.assertTrue(client.is_closed)
+        self.assertIsNone(self.expander._client)
+        self.assertEqual(
+            await self.expander.expand("https://amzn.to/abc123"),
+            "https://www.amazon.es/dp/B08N5WRWNW",
+        )
+
+    async def test_cached_expansion_not_requested_again(self) -> None:
+        """Test: A URL expanded before is served from the cache."""
+        first = await self.expander.expand("https://amzn.to/abc123")
+        second = await self.expander.expand("https://amzn.to/abc123.")
+
+        self.assertEqual(first, second)
+        self.assertEqual(self.requests.count("https://amzn.to/abc123"), 1)
+        self.assertEqual(self.expander.cache.hits, 1)
+
+    async def test_failed_expansion_cached(self) -> None:
+        """Test: A failed expansion is cached and returns the original URL."""
+        first = await self.expander.expand("https://dead.link/a")
+        second = await self.expander.expand("https://dead.link/a,")
+
+        self.assertEqual(first, "https://dead.link/a")
+        self.assertEqual(second, "https://dead.link/a,")
+        self.assertEqual(self.requests, ["https://dead.link/a"])
+
+    async def test_error_status_not_stored(self) -> None:
+        """Test: An error status is a failed expansion, cached briefly and never stored."""
+        with tempfile.TemporaryDirectory() as directory:
+            config_manager = ConfigurationManager()
+            config_manager.expansion_store_path = str(
+                Path(directory) / "expansions.sqlite3"
+            )
+            self.expander.config_manager = config_manager
+            expanded_url = await self.expander.expand("https://down.link/a")
+            found, cached_url = self.expander.cache.lookup("https://down.link/a")
+            stored_url = self.expander.store.get("https://down.link/a")
+            await self.expander.aclose()
+
+        self.assertEqual(expanded_url, "https://down.link/a")
+        self.assertTrue(found)
+        self.assertIsNone(cached_url)
+        self.assertIsNone(stored_url)
+
+    async def test_error_status_after_redirect_expanded(self) -> None:
+        """Test: A redirect to a page answering with an error is still expanded."""
+        with tempfile.TemporaryDirectory() as directory:
+            config_manager = ConfigurationManager()
+            config_manager.expansion_store_path = str(
+                Path(directory) / "expansions.sqlite3"
+            )
+            self.expander.config_manager = config_manager
+            expanded_url = await self.expander.expand("https://amzn.to/blocked")
+            stored_url = self.expander.store.get("https://amzn.to/blocked")
+            await self.expander.aclose()
+
+        self.assertEqual(expanded_url, "https://www.amazon.es/dp/BLOCKED")
+        self.assertEqual(stored_url, "https://www.amazon.es/dp/BLOCKED")
+
+    async def test_incomplete_chain_not_stored(self) -> None:
+        """Test: A chain stopped at the hop limit is cached briefly and never stored."""
+        with tempfile.TemporaryDirectory() as directory:
+            config_manager = ConfigurationManager()
+            config_manager.expansion_store_path = str(
+                Path(directory) / "expansions.sqlite3"
+            )
+            self.expander.config_manager = config_manager
+            expanded_url = await self.expander.expand("https://loop.link/a")
+            expires_at, _ = self.expander.cache._entries["https://loop.link/a"]
+            stored_url = self.expander.store.get("https://loop.link/a")
+            await self.expander.aclose()
+
+        self.assertEqual(expanded_url, "https://loop.link/a")
+        self.assertIsNone(stored_url)
+        self.assertLessEqual(
+            expires_at,
+            self.expander.cache._clock() + config_manager.expansion_negative_cache_ttl,
+        )
+
+    async def test_store_serves_expansions_after_restart(self) -> None:
+        """Test: Expansions saved in the store are served by a new expander without requests."""
+        with tempfile.TemporaryDirectory() as directory:
+            config_manager = ConfigurationManager()
+            config_manager.expansion_store_path = str(
+                Path(directory) / "expansions.sqlite3"
+            )
+            self.expander.config_manager = config_manager
+            await self.expander.expand("https://amzn.to/abc123")
+            await self.expander.aclose()
+
+            restarted_requests: list[httpx.Request] = []
+            restarted = URLExpander(
+                config_manager,
+                transport=httpx.MockTransport(
+                    lambda request: restarted_requests.append(request)
+                    or redirect_handler(request)
+                ),
+            )
+            expanded_url = await restarted.expand("https://amzn.to/abc123")
+            await restarted.aclose()
+
+        self.assertEqual(expanded_url, "https://www.amazon.es/dp/B08N5WRWNW")
+        self.assertEqual(restarted_requests, [])
+
+    async def test_full_store_links_not_requested(self) -> None:
+        """Test: Links to configured store domains are returned without requests."""
+        config_manager = ConfigurationManager()
+        config_manager.domain_percentage_table = {
+            "amazon.es": [{"user": "main", "percentage": 100}]
+        }
+        expander = URLExpander(
+            config_manager, transport=httpx.MockTransport(redirect_handler)
+        )
+
+        expanded_url = await expander.expand("https://www.amazon.es/dp/B08N5WRWNW")
+
+        self.assertEqual(expanded_url, "https://www.amazon.es/dp/B08N5WRWNW")
+        self.assertIsNone(expander._client)
+
+    async def test_non_redirecting_host_requested_once(self) -> None:
+        """Test: A host seen not redirecting is not requested again."""
+        await self.expander.expand("https://blog.example.com/a")
+        await self.expander.expand("https://blog.example.com/b")
+
+        self.assertEqual(self.requests, ["https://blog.example.com/a"])
+
+    async def test_concurrent_expansions_coalesced(self) -> None:
+        """Test: Concurrent expansions of the same URL send a single request."""
+        results = await asyncio.gather(
+            *(self.expander.expand("https://amzn.to/abc123") for _ in range(5))
+        )
+
+        self.assertEqual(set(results), {"https://www.amazon.es/dp/B08N5WRWNW"})
+        self.assertEqual(self.requests.count("https://amzn.to/abc123"), 1)
+
+    async def test_wrapper_unwrapped_without_requests(self) -> None:
+        """Test: Known wrapper URLs of the configured stores are resolved locally."""
+        self.expander.config_manager.domain_percentage_table = {"pccomponentes.com": []}
+
+        expanded_url = await self.expander.expand(
+            "https://www.awin1.com/cread.php?awinmid=1&ued=https://www.pccomponentes.com/p."
+        )
+
+        self.assertEqual(expanded_url, "https://www.pccomponentes.com/p")
+        self.assertEqual(self.requests, [])
+
+    async def test_wrapped_short_url_expanded(self) -> None:
+        """Test: A short URL inside a wrapper is expanded too."""
+        expanded_url = await self.expander.expand(
+            "https://www.google.com/url?q=https://amzn.to/abc"
+        )
+
+        self.assertEqual(expanded_url, "https://www.amazon.es/dp/B08N5WRWNW")
+        self.assertEqual(self.requests[0], "https://amzn.to/abc")
+
+    async def test_malformed_wrapped_destination(self) -> None:
+        """Test: A wrapper with a malformed destination is expanded as a plain URL."""
+        url = "https://x.com/?ulp=http://[oops"
+
+        expanded_url = await self.expander.expand(url)
+
+        self.assertEqual(expanded_url, url)
+
+
+if __name__ == "__main__":
+    unittest.main()
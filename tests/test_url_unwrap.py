@@ -0,0 +1,90 @@
+"""Tests for the offline URL unwrapper."""
+
+import unittest
+
+from links.unwrap import unwrap_url
+
+
+class TestUnwrapUrl(unittest.TestCase):
+    """Tests for unwrap_url function."""
+
+    def test_not_a_wrapper(self) -> None:
+        """Test: URLs that are not wrappers are returned unchanged."""
+        url = "https://www.amazon.es/dp/B08N5WRWNW?ref=abc"
+        self.assertEqual(unwrap_url(url), url)
+
+    def test_aliexpress_redirect_url(self) -> None:
+        """Test: The 'redirectUrl' parameter is unwrapped on AliExpress hosts."""
+        url = "https://star.aliexpress.com/share/share.htm?redirectUrl=https%3A%2F%2Fes.aliexpress.com%2Fitem%2F1005.html"
+        self.assertEqual(unwrap_url(url), "https://es.aliexpress.com/item/1005.html")
+
+    def test_awin_ued(self) -> None:
+        """Test: Awin links are unwrapped to their 'ued' destination."""
+        url = "https://www.awin1.com/cread.php?awinmid=20982&awinaffid=1639881&ued=https://www.pccomponentes.com/product"
+        self.assertEqual(unwrap_url(url), "https://www.pccomponentes.com/product")
+
+    def test_admitad_ulp(self) -> None:
+        """Test: Admitad links are unwrapped to their 'ulp' destination."""
+        url = "https://wextap.com/g/93fd4vbk6c873a1e3014d68450d763/?ulp=https://giftmio.com/product"
+        self.assertEqual(unwrap_url(url), "https://giftmio.com/product")
+
+    def test_tradedoubler_url(self) -> None:
+        """Test: Tradedoubler links are unwrapped to their 'url' destination."""
+        url = "https://clk.tradedoubler.com/click?p=336358&a=3385366&url=https://www.mediamarkt.es/product"
+        self.assertEqual(unwrap_url(url), "https://www.mediamarkt.es/product")
+
+    def test_url_param_only_unwrapped_on_known_hosts(self) -> None:
+        """Test: Generic parameter names are only unwrapped on the hosts using them."""
+        url = "https://www.example.com/share?url=https://www.amazon.es/dp/A"
+        self.assertEqual(unwrap_url(url), url)
+
+    def test_redirect_url_only_unwrapped_on_aliexpress(self) -> None:
+        """Test: The 'redirectUrl' parameter of other hosts is not unwrapped."""
+        url = "https://www.example.com/login?redirectUrl=https://www.amazon.es/dp/A"
+        self.assertEqual(unwrap_url(url), url)
+
+    def test_google_redirect(self) -> None:
+        """Test: Google '/url' redirects are unwrapped."""
+        url = "https://www.google.com/url?q=https://www.amazon.es/dp/A&sa=D"
+        self.assertEqual(unwrap_url(url), "https://www.amazon.es/dp/A")
+
+    def test_google_search_not_unwrapped(self) -> None:
+        """Test: Google searches for a URL are not unwrapped."""
+        url = "https://www.google.com/search?q=https://example.com"
+        self.assertEqual(unwrap_url(url), url)
+
+    def test_nested_wrappers(self) -> None:
+        """Test: Nested wrappers are unwrapped down to the final destination."""
+        url = (
+            "https://l.facebook.com/l.php?u=https%3A%2F%2Fwww.awin1.com%2Fcread.php"
+            "%3Fawinmid%3D1%26ued%3Dhttps%253A%252F%252Fwww.leroymerlin.es%252Fp"
+        )
+        self.assertEqual(unwrap_url(url), "https://www.leroymerlin.es/p")
+
+    def test_depth_limit(self) -> None:
+        """Test: Unwrapping stops at the maximum depth."""
+        url = "https://www.leroymerlin.es/p"
+        for _ in range(3):
+            url = f"https://www.awin1.com/cread.php?ued={url}"
+
+        self.assertTrue(unwrap_url(url, max_depth=2).startswith("https://www.awin1"))
+        self.assertEqual(unwrap_url(url, max_depth=3), "https://www.leroymerlin.es/p")
+
+    def test_invalid_destinations_ignored(self) -> None:
+        """Test: Destinations that are not HTTP URLs are not unwrapped."""
+        url = "https://www.awin1.com/cread.php?ued=ftp://invalid-url.com"
+        self.assertEqual(unwrap_url(url), url)
+
+    def test_malformed_destinations_not_unwrapped(self) -> None:
+        """Test: Unwrapping stops before a destination that cannot be parsed."""
+        url = "https://x.com/?ulp=http://[oops"
+        self.assertEqual(unwrap_url(url), url)
+
+        url = (
+            "https://www.awin1.com/cread.php?ued=https://x.com/%3Fulp%3Dhttp://%5Boops"
+        )
+        self.assertEqual(unwrap_url(url), "https://x.com/?ulp=http://[oops")
+
+
+if __name__ == "__main__":
+    unittest.main()